@@ -1,32 +1,92 @@
 import os
+import secrets
+import time
 import jwt
 import datetime
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import OAuth2PasswordBearer
 
+from token_cache import VerifiedTokenCache, RevocationList
+
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecretkey")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+# One day, as before refresh tokens; with a shorter lifetime clients renew at /refresh without the password
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-def get_current_user(token: str = Security(oauth2_scheme)):
+verified_tokens = VerifiedTokenCache()
+# Revocations also refuse refresh tokens, so they are kept as long as either token type lives
+revocations = RevocationList(horizon=max(ACCESS_TOKEN_EXPIRE_MINUTES * 60, REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600))
+
+def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # Always return a dict with 'id' and 'role' keys
-        user_id = payload.get('user_id') or payload.get('id')
-        role = payload.get('role')
-        username = payload.get('sub')
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token: no user_id")
-        return {"id": user_id, "role": role, "username": username}
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get('type') == 'refresh':
+        raise HTTPException(status_code=401, detail="Invalid token: refresh token")
+    # Always return a dict with 'id' and 'role' keys
+    user_id = payload.get('user_id') or payload.get('id')
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token: no user_id")
+    return {"id": user_id, "role": payload.get('role'), "username": payload.get('sub'),
+            "exp": payload['exp'], "iat": payload.get('iat')}
+
+async def get_current_user(token: str = Security(oauth2_scheme)):
+    await revocations.sync_if_stale()
+    claims = verified_tokens.get(token)
+    if claims is None:
+        claims = decode_access_token(token)
+        verified_tokens.put(token, claims)
+    if revocations.is_revoked(claims['id'], claims['iat']):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return {"id": claims['id'], "role": claims['role'], "username": claims['username']}
 
 def create_access_token(data: dict, expires_delta: int = None):
     to_encode = data.copy()
     expire = datetime.datetime.utcnow() + datetime.timedelta(minutes=expires_delta or ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM) 
\ No newline at end of file
+    # Sub-second 'iat' so a token issued right after a revocation is not caught by it
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "type": "access"})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_refresh_token(data: dict):
+    # Only identifies the user; role and username are read again from the database on refresh
+    to_encode = {"sub": data.get('sub'), "user_id": data.get('user_id'), "type": "refresh",
+                 "iat": round(time.time(), 3), "jti": secrets.token_urlsafe(16)}
+    to_encode["exp"] = datetime.datetime.utcnow() + datetime.timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def create_tokens(user: dict):
+    """Access and refresh token for a users row (id, username, role)."""
+    data = {"sub": user['username'], "role": user['role'], "user_id": user['id']}
+    return {
+        "access_token": create_access_token(data),
+        "refresh_token": create_refresh_token(data),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def decode_refresh_token(token: str):
+    if not token:
+        raise HTTPException(status_code=400, detail="Refresh token required")
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Refresh token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get('type') != 'refresh' or not payload.get('user_id'):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    return payload
+
+async def verify_refresh_token(token: str):
+    """Claims of a refresh token that was not issued before a revocation of its user (e.g. a password change)."""
+    payload = decode_refresh_token(token)
+    await revocations.sync_if_stale()
+    if revocations.is_revoked(payload['user_id'], payload.get('iat')):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    return payload
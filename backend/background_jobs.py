@@ -0,0 +1,98 @@
+"""
+In-process background jobs with a pollable status.
+
+A route submits a coroutine function and answers with the job id at once; the work runs
+on the event loop and the client follows it with GET .../jobs/{job_id}. Jobs live in the
+memory of the worker process that accepted them and finished jobs are dropped after
+BACKGROUND_JOB_TTL seconds. Because of that the API has to run as a single uvicorn
+worker (or behind sticky routing): with several workers a poll can reach a process that
+never saw the job and gets a 404. A job submitted with an owner is only shown to that
+user and to admins. Settings (env):
+- BACKGROUND_JOB_TTL: seconds a finished job stays queryable (default 3600)
+"""
+import asyncio
+import logging
+import os
+import secrets
+import time
+
+BACKGROUND_JOB_TTL = float(os.getenv("BACKGROUND_JOB_TTL", "3600"))
+
+
+class JobFailed(Exception):
+    """Expected failure of a job; the message is shown to the client as it is."""
+    pass
+
+
+class Job:
+    def __init__(self, kind, info, owner=None):
+        self.id = secrets.token_urlsafe(16)
+        self.kind = kind
+        self.owner = owner
+        self.info = info
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def as_dict(self):
+        data = {"job_id": self.id, "kind": self.kind, "status": self.status, **self.info}
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobRegistry:
+    def __init__(self, ttl=BACKGROUND_JOB_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._tasks = set()
+
+    def submit(self, kind, work, owner=None, **info):
+        """Start work(job) in the background; it may set job.status to report progress."""
+        self._prune()
+        job = Job(kind, info, owner)
+        self._jobs[job.id] = job
+        task = asyncio.get_running_loop().create_task(self._run(job, work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job, work):
+        try:
+            job.result = await work(job)
+            job.status = "done"
+        except JobFailed as e:
+            job.error = str(e)
+            job.status = "failed"
+        except Exception as e:
+            logging.exception(f"Background job {job.kind} {job.id} failed")
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id, user=None):
+        """The job, or None if it is unknown or belongs to another user (admins see every job)."""
+        self._prune()
+        job = self._jobs.get(job_id)
+        if job is None or job.owner is None or user is None:
+            return job
+        if user.get('role') != 'admin' and str(user.get('id')) != str(job.owner):
+            return None
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+
+jobs = JobRegistry()
@@ -0,0 +1,97 @@
+"""
+Time payslip field extraction on the sample PDFs in this folder, before and after.
+
+    python benchmark_extraction.py [pdf ...] [--repeat N] [--baseline REV]
+
+The baseline is pdf_extract_utils.py as it was at git revision REV, by default the
+revision before this script was added (the last one with the old line-by-line rules).
+Reports per document the median time to read the text layer and word boxes of all
+pages (pdfplumber), to run the current field rules on them, and the end-to-end
+extraction with the baseline and with the current code, which stops decoding pages
+once no missing field can follow. Both must return identical fields; the script exits
+with status 1 if they do not.
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+from pdf_extract_utils import read_pdf_document, extract_fields_from_lines, extract_einkommensbescheinigung_fields
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _git(*args):
+    return subprocess.run(['git', *args], cwd=HERE, check=True, capture_output=True, text=True).stdout
+
+
+def default_baseline():
+    added = _git('log', '--diff-filter=A', '--format=%H', '--', os.path.basename(__file__)).split()
+    if not added:
+        raise SystemExit("benchmark_extraction.py is not committed yet; pass --baseline REV")
+    return added[-1] + '^'
+
+
+def load_baseline(rev):
+    """pdf_extract_utils as of a git revision, imported as its own module."""
+    try:
+        source = _git('show', f'{rev}:./pdf_extract_utils.py')
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise SystemExit(f"Cannot read pdf_extract_utils.py at {rev}: {getattr(e, 'stderr', '') or e}")
+    module = types.ModuleType('legacy_pdf_extract_utils')
+    module.__file__ = f'{rev}:pdf_extract_utils.py'
+    exec(compile(source, module.__file__, 'exec'), module.__dict__)
+    return module
+
+
+def _median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('pdfs', nargs='*')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--baseline', help="git revision of the old extractor (default: before this script)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    baseline_rev = args.baseline or default_baseline()
+    legacy = load_baseline(baseline_rev)
+    print(f"baseline: pdf_extract_utils.py at {baseline_rev}")
+
+    pdfs = args.pdfs or sorted(glob.glob(os.path.join(HERE, '*.pdf')))
+    print(f"{'document':<45} {'lines':>6} {'read ms':>9} {'rules ms':>9} {'before ms':>10} {'after ms':>9} {'same':>5}")
+    mismatches = []
+    for path in pdfs:
+        read_ms, (lines, page_words) = _median_ms(lambda: read_pdf_document(path), args.repeat)
+        rules_ms, _ = _median_ms(lambda: extract_fields_from_lines(lines, page_words), args.repeat * 20)
+        before_ms, before = _median_ms(lambda: legacy.extract_einkommensbescheinigung_fields(path), args.repeat)
+        after_ms, after = _median_ms(lambda: extract_einkommensbescheinigung_fields(path), args.repeat)
+        same = before == after
+        if not same:
+            mismatches.append((path, before, after))
+        print(f"{os.path.basename(path)[:45]:<45} {len(lines):>6} {read_ms:>9.1f} {rules_ms:>9.3f} "
+              f"{before_ms:>10.1f} {after_ms:>9.1f} {'yes' if same else 'NO':>5}")
+
+    for path, before, after in mismatches:
+        print(f"\n{os.path.basename(path)}: fields differ")
+        for key in sorted(set(before) | set(after)):
+            if before.get(key) != after.get(key):
+                print(f"  {key}: {before.get(key)!r} -> {after.get(key)!r}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Content-addressed storage for generated documents.
+
+Blobs are keyed by the SHA-256 of their bytes, so storing the same document twice keeps
+one copy; the database only records the key. Reads are ranged and chunked so downloads
+never load a whole file into memory. Settings (env):
+- BLOB_STORE: 'fs' (default) or 's3'
+- BLOB_STORE_PATH: root directory of the fs store (default: blobs/ next to this module)
+- BLOB_S3_BUCKET, BLOB_S3_PREFIX, BLOB_S3_ENDPOINT_URL: S3 store; the endpoint also points
+  it at an S3-compatible stand-in such as MinIO. Needs boto3.
+"""
+import hashlib
+import os
+import tempfile
+
+BLOB_STORE = os.getenv("BLOB_STORE", "fs")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", os.path.join(os.path.dirname(__file__), "blobs"))
+BLOB_S3_BUCKET = os.getenv("BLOB_S3_BUCKET", "")
+BLOB_S3_PREFIX = os.getenv("BLOB_S3_PREFIX", "stundenzettel/")
+BLOB_S3_ENDPOINT_URL = os.getenv("BLOB_S3_ENDPOINT_URL") or None
+BLOB_CHUNK_SIZE = 64 * 1024
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def blob_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    def __init__(self, root=BLOB_STORE_PATH):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        key = blob_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            return key
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write next to the target and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return key
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+
+    def iter_range(self, key, start=0, end=None, chunk_size=BLOB_CHUNK_SIZE):
+        """Bytes start..end (inclusive; end=None reads to the end) in chunks."""
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+        with f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3BlobStore:
+    """Same interface on top of any client with boto3's S3 API (head/put/get/delete_object)."""
+
+    def __init__(self, client, bucket, prefix=""):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    def put(self, data):
+        key = blob_key(data)
+        if self._head(key) is None:
+            self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+        return key
+
+    def size(self, key):
+        head = self._head(key)
+        if head is None:
+            raise BlobNotFound(key)
+        return head["ContentLength"]
+
+    def iter_range(self, key, start=0, end=None, chunk_size=BLOB_CHUNK_SIZE):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        try:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(key), Range=byte_range)["Body"]
+        except Exception as e:
+            if _is_not_found(e):
+                raise BlobNotFound(key)
+            raise
+        try:
+            while True:
+                chunk = body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+def _is_not_found(error):
+    code = str(getattr(error, "response", {}).get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+def _create_store():
+    if BLOB_STORE == "s3":
+        import boto3
+        client = boto3.client("s3", endpoint_url=BLOB_S3_ENDPOINT_URL)
+        return S3BlobStore(client, BLOB_S3_BUCKET, BLOB_S3_PREFIX)
+    return LocalBlobStore(BLOB_STORE_PATH)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = _create_store()
+    return _store
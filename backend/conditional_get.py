@@ -0,0 +1,87 @@
+"""
+Conditional GET for read-heavy resources.
+
+Every write in repositories bumps a per-table counter in resource_versions. A response's
+ETag is derived from the counters of the tables it reads plus the request path and query,
+so checking freshness costs one primary-key lookup: a matching If-None-Match gets a 304
+without running the real query, and recently built bodies are kept in memory by ETag and
+served to other clients without re-querying or re-serializing. Settings (env):
+- RESPONSE_CACHE_MAX_ENTRIES: serialized bodies kept by ETag (0 disables the body cache)
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+import repositories
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "128"))
+
+
+class _BodyCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag):
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag, body):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_bodies = _BodyCache(RESPONSE_CACHE_MAX_ENTRIES)
+
+
+def _etag(request, versions):
+    stamp = ";".join(f"{table}={versions[table]}" for table in sorted(versions))
+    digest = hashlib.sha256(f"{request.url.path}?{request.url.query}|{stamp}".encode()).hexdigest()
+    # Weak: the body is equivalent JSON, not a byte-for-byte promise across releases
+    return f'W/"{digest[:32]}"'
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    opaque = etag[2:]
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+async def conditional_json(request, tables, produce):
+    """
+    JSON response for produce() (an awaitable factory returning the content) with an ETag
+    over the given tables. Exceptions from produce(), e.g. a 404, pass through uncached.
+    """
+    try:
+        versions = await repositories.get_resource_versions(tuple(tables))
+    except Exception as e:
+        # No counters (e.g. resource_versions not created yet): serve without validation
+        logging.warning(f"Resource versions unavailable, serving without ETag: {e}")
+        return JSONResponse(content=jsonable_encoder(await produce()))
+    etag = _etag(request, versions)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = _bodies.get(etag)
+    if body is None:
+        body = JSONResponse(content=jsonable_encoder(await produce())).body
+        _bodies.put(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
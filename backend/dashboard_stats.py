@@ -0,0 +1,67 @@
+"""
+Dashboard statistics.
+
+The six totals come from one aggregate query and the per-month charts from two grouped
+queries, three statements on one connection. The result is reused in process for a short TTL and
+dropped by invalidate() whenever users, employees or payslips are written, so the
+dashboard never re-counts the tables on every load. Settings (env):
+- DASHBOARD_STATS_TTL: seconds a computed result is reused (default 30; 0 disables the cache)
+- DASHBOARD_CHART_MONTHS: months covered by the hires/payslips charts (default 12)
+"""
+import asyncio
+import datetime
+import os
+import time
+
+import repositories
+
+DASHBOARD_STATS_TTL = float(os.getenv("DASHBOARD_STATS_TTL", "30"))
+DASHBOARD_CHART_MONTHS = int(os.getenv("DASHBOARD_CHART_MONTHS", "12"))
+
+_cached = None  # (expires_at, stats)
+_generation = 0
+_lock = asyncio.Lock()
+
+
+def invalidate():
+    global _cached, _generation
+    _cached = None
+    # A computation that started before this call must not be stored afterwards
+    _generation += 1
+
+
+def chart_months(today=None, count=DASHBOARD_CHART_MONTHS):
+    """The last count months up to and including today's, oldest first, as 'YYYY-MM'."""
+    today = today or datetime.date.today()
+    index = today.year * 12 + today.month - 1
+    return [f"{i // 12:04d}-{i % 12 + 1:02d}" for i in range(index - count + 1, index + 1)]
+
+
+def _series(months, rows):
+    values = {row['month']: int(row['value']) for row in rows}
+    return [{"month": month, "value": values.get(month, 0)} for month in months]
+
+
+async def _compute():
+    months = chart_months()
+    counts, hires, payslips = await repositories.dashboard_stats(months[0], months[-1])
+    return {
+        **counts,
+        "hires_per_month": _series(months, hires),
+        "payslips_per_month": _series(months, payslips),
+    }
+
+
+async def get_stats():
+    global _cached
+    if _cached is not None and _cached[0] > time.monotonic():
+        return _cached[1]
+    # One request computes while concurrent ones wait for its result
+    async with _lock:
+        if _cached is not None and _cached[0] > time.monotonic():
+            return _cached[1]
+        generation = _generation
+        stats = await _compute()
+        if DASHBOARD_STATS_TTL > 0 and generation == _generation:
+            _cached = (time.monotonic() + DASHBOARD_STATS_TTL, stats)
+        return stats
@@ -1,4 +1,9 @@
 import os
+import queue
+import threading
+import time
+import logging
+from contextlib import contextmanager
 import mysql.connector
 from dotenv import load_dotenv
 
@@ -15,10 +20,171 @@ MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DB = os.getenv("MYSQL_DB")
 
-def get_connection():
+# Pool settings
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+MYSQL_POOL_MAX_OVERFLOW = int(os.getenv("MYSQL_POOL_MAX_OVERFLOW", "10"))
+MYSQL_POOL_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", "30"))
+MYSQL_POOL_RECYCLE = int(os.getenv("MYSQL_POOL_RECYCLE", "1800"))  # seconds
+
+
+def _connect():
     return mysql.connector.connect(
         host=MYSQL_HOST,
         user=MYSQL_USER,
         password=MYSQL_PASSWORD,
-        database=MYSQL_DB
-    ) 
\ No newline at end of file
+        database=MYSQL_DB,
+        # Drop unread result sets instead of failing the next borrower
+        consume_results=True,
+    )
+
+
+class PooledConnection:
+    """
+    Thin proxy around a mysql.connector connection.
+    Everything is delegated to the real connection except close(),
+    which hands the connection back to the pool instead of disconnecting.
+    """
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise AttributeError(f"Connection already returned to pool ({name})")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Safety net for code paths that raise before calling close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of MySQL connections.
+
+    - size: connections kept open while idle
+    - max_overflow: extra connections opened under load, closed again on return
+    - timeout: seconds to wait for a free slot before giving up
+    - recycle: connections older than this many seconds are reopened on checkout
+    Every checkout pings the server so a dropped connection is replaced transparently.
+    """
+
+    def __init__(self, size=MYSQL_POOL_SIZE, max_overflow=MYSQL_POOL_MAX_OVERFLOW,
+                 timeout=MYSQL_POOL_TIMEOUT, recycle=MYSQL_POOL_RECYCLE, connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size + max_overflow)
+        self._lock = threading.Lock()
+        self._checked_out = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise RuntimeError(f"Database pool exhausted ({self.size + self.max_overflow} connections in use)")
+        try:
+            raw, created_at = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._checked_out += 1
+        return PooledConnection(self, raw, created_at)
+
+    def _checkout(self):
+        while True:
+            try:
+                raw, created_at = self._idle.get_nowait()
+            except queue.Empty:
+                return _connect_with_timestamp(self._connect)
+            if self.recycle and time.monotonic() - created_at > self.recycle:
+                _close_quietly(raw)
+                continue
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                logging.info("Discarding dead pooled MySQL connection")
+                _close_quietly(raw)
+                continue
+            return raw, created_at
+
+    def _release(self, raw, created_at):
+        with self._lock:
+            self._checked_out -= 1
+        try:
+            # Never hand an open transaction to the next borrower
+            if raw.in_transaction:
+                raw.rollback()
+            if self._idle.qsize() < self.size:
+                self._idle.put((raw, created_at))
+            else:
+                _close_quietly(raw)
+        except Exception:
+            _close_quietly(raw)
+        finally:
+            self._slots.release()
+
+    def dispose(self):
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            _close_quietly(raw)
+
+    def status(self):
+        return {"idle": self._idle.qsize(), "checked_out": self._checked_out,
+                "size": self.size, "max_overflow": self.max_overflow}
+
+
+def _connect_with_timestamp(connect):
+    return connect(), time.monotonic()
+
+
+def _close_quietly(raw):
+    try:
+        raw.close()
+    except Exception:
+        pass
+
+
+pool = ConnectionPool()
+
+
+def get_connection():
+    """Borrow a connection from the pool; conn.close() returns it."""
+    return pool.acquire()
+
+
+@contextmanager
+def connection():
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_db():
+    """FastAPI dependency: one pooled connection per request."""
+    with connection() as conn:
+        yield conn
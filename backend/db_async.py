@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+import aiomysql
+from db import (
+    MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DB,
+    MYSQL_POOL_SIZE, MYSQL_POOL_MAX_OVERFLOW, MYSQL_POOL_RECYCLE,
+)
+
+# Async counterpart of db.py: one aiomysql pool per process, created on first use.
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_pool():
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            return _pool
+        _pool = await aiomysql.create_pool(
+            host=MYSQL_HOST,
+            user=MYSQL_USER,
+            password=MYSQL_PASSWORD,
+            db=MYSQL_DB,
+            charset="utf8mb4",
+            minsize=1,
+            maxsize=MYSQL_POOL_SIZE + MYSQL_POOL_MAX_OVERFLOW,
+            pool_recycle=MYSQL_POOL_RECYCLE,
+            autocommit=False,
+        )
+        logging.info("Async MySQL pool ready (maxsize=%s)", MYSQL_POOL_SIZE + MYSQL_POOL_MAX_OVERFLOW)
+        return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+@asynccontextmanager
+async def connection():
+    pool = _pool or await init_pool()
+    async with pool.acquire() as conn:
+        yield conn
+
+
+@asynccontextmanager
+async def transaction():
+    """Yield a dict cursor; commit on success, rollback on any error."""
+    async with connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            try:
+                yield cursor
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+
+async def fetch_one(sql, args=None):
+    async with connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, args)
+            row = await cursor.fetchone()
+        # End the implicit read transaction so the next borrower sees fresh data
+        await conn.rollback()
+    return row
+
+
+async def fetch_all(sql, args=None):
+    async with connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, args)
+            rows = await cursor.fetchall()
+        await conn.rollback()
+    return list(rows)
+
+
+async def execute(sql, args=None):
+    """Run a single write statement in its own transaction; returns (rowcount, lastrowid)."""
+    async with transaction() as cursor:
+        await cursor.execute(sql, args)
+        return cursor.rowcount, cursor.lastrowid
@@ -0,0 +1,102 @@
+"""
+In-memory document output.
+
+Renderers write into a buffer from new_buffer() and the routes stream it back with
+document_response(); nothing is left behind in /tmp. Stored files are served with
+ranged_response(), which streams them in chunks and honours Range requests. Settings (env):
+- DOCUMENT_SPILL_THRESHOLD: bytes a document may hold in memory before it is moved to an
+  anonymous temporary file (default 0: always in memory)
+"""
+import io
+import os
+import tempfile
+from urllib.parse import quote
+
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+DOCUMENT_SPILL_THRESHOLD = int(os.getenv("DOCUMENT_SPILL_THRESHOLD", "0"))
+DOCUMENT_CHUNK_SIZE = 64 * 1024
+
+
+def new_buffer():
+    if DOCUMENT_SPILL_THRESHOLD > 0:
+        # Spilled files are unlinked on creation, so they vanish once the buffer is closed
+        return tempfile.SpooledTemporaryFile(max_size=DOCUMENT_SPILL_THRESHOLD)
+    return io.BytesIO()
+
+
+def content_disposition(filename):
+    # Plain ASCII fallback plus the RFC 5987 form for names with umlauts
+    fallback = filename.encode("ascii", "replace").decode("ascii").replace("?", "_").replace('"', "")
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def document_response(document, filename, media_type):
+    """Stream a rendered document (bytes or a buffer from new_buffer()) as a download."""
+    buffer = io.BytesIO(document) if isinstance(document, (bytes, bytearray)) else document
+    size = buffer.seek(0, io.SEEK_END)
+    buffer.seek(0)
+
+    def chunks():
+        try:
+            while True:
+                chunk = buffer.read(DOCUMENT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            buffer.close()
+
+    return StreamingResponse(
+        chunks(),
+        media_type=media_type,
+        headers={"Content-Disposition": content_disposition(filename), "Content-Length": str(size)},
+        # Also covers a client that disconnects before the body is consumed
+        background=BackgroundTask(buffer.close),
+    )
+
+
+def parse_range(range_header, size):
+    """
+    (start, end) inclusive for a single 'bytes=' range, None when there is no usable
+    Range header (serve the whole file), or raise ValueError if it cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # Suffix range: the last n bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(f"Range {range_header} not satisfiable for {size} bytes")
+    return start, end
+
+
+def ranged_response(iter_range, size, filename, media_type, range_header=None):
+    """
+    Stream a stored file with Range support. iter_range(start, end) yields the bytes
+    start..end (inclusive) in chunks.
+    """
+    headers = {"Content-Disposition": content_disposition(filename), "Accept-Ranges": "bytes"}
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(iter_range(0, size - 1), media_type=media_type, headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(iter_range(start, end), status_code=206, media_type=media_type, headers=headers)
@@ -0,0 +1,157 @@
+"""
+Compiled DOCX templates.
+
+A DocxTemplate parses its .docx once and finds the {{field}} placeholders, including ones
+Word split across several runs. Each text node involved is replaced by a slot, and the
+serialized XML is kept as literal chunks around those slots. Rendering joins the chunks
+with the escaped values, so only the affected runs change and their formatting is kept.
+The zip members without placeholders are packed once and reused for every render.
+
+get_template(path) returns the compiled template and recompiles it when the file's mtime
+changes.
+"""
+import io
+import os
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+# Private-use code points frame the slot numbers in the serialized XML
+SLOT_OPEN, SLOT_CLOSE = "\ue000", "\ue001"
+SLOT_RE = re.compile(f"{SLOT_OPEN}(\\d+){SLOT_CLOSE}".encode("utf-8"))
+
+
+def _paragraph_text_nodes(root):
+    """<w:t> nodes grouped by the paragraph that directly owns them, in document order."""
+    groups = {}
+    for node in root.iter(W + "t"):
+        parent = node.getparent()
+        while parent is not None and parent.tag != W + "p":
+            parent = parent.getparent()
+        if parent is not None:
+            groups.setdefault(parent, []).append(node)
+    return groups.values()
+
+
+def _node_pieces(nodes):
+    """
+    For the text nodes of one paragraph, the new content of every node touched by a
+    placeholder: a list of literal strings and (field, original) tuples. A placeholder
+    split over several nodes is rendered entirely in the node where it starts.
+    """
+    texts = [node.text or "" for node in nodes]
+    joined = "".join(texts)
+    matches = list(PLACEHOLDER_RE.finditer(joined))
+    if not matches:
+        return {}
+    pieces = {}
+    offset = 0
+    for idx, text in enumerate(texts):
+        start, end = offset, offset + len(text)
+        offset = end
+        overlapping = [m for m in matches if m.start() < end and m.end() > start]
+        if not overlapping:
+            continue
+        node_pieces = []
+        pos = start
+        for m in overlapping:
+            if m.start() > pos:
+                node_pieces.append(joined[pos:m.start()])
+            if start <= m.start():
+                node_pieces.append((m.group(1), m.group(0)))
+            pos = min(m.end(), end)
+        if pos < end:
+            node_pieces.append(joined[pos:end])
+        pieces[idx] = node_pieces
+    return pieces
+
+
+def _compile_part(xml):
+    """Split an XML part into literal byte chunks and slots, or None if it has no placeholders."""
+    if b"{{" not in xml or SLOT_OPEN.encode("utf-8") in xml:
+        return None
+    root = etree.fromstring(xml)
+    slots = []
+    for nodes in _paragraph_text_nodes(root):
+        for idx, node_pieces in _node_pieces(nodes).items():
+            node = nodes[idx]
+            node.text = f"{SLOT_OPEN}{len(slots)}{SLOT_CLOSE}"
+            # Values may start or end with spaces
+            node.set(XML_SPACE, "preserve")
+            slots.append(node_pieces)
+    if not slots:
+        return None
+    serialized = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    parts = SLOT_RE.split(serialized)
+    # parts alternates literal chunks and slot numbers: [chunk, slot, chunk, slot, ..., chunk]
+    chunks = parts[0::2]
+    order = [slots[int(n)] for n in parts[1::2]]
+    return chunks, order
+
+
+class DocxTemplate:
+    def __init__(self, path):
+        self.path = path
+        self.parts = {}  # zip member name -> (chunks, slots)
+        base = io.BytesIO()
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(base, "w", zipfile.ZIP_DEFLATED) as packed:
+            for info in source.infolist():
+                data = source.read(info)
+                compiled = _compile_part(data) if info.filename.endswith(".xml") else None
+                if compiled is None:
+                    packed.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED)
+                else:
+                    self.parts[info.filename] = compiled
+        self._base = base.getvalue()
+
+    @property
+    def fields(self):
+        return {
+            piece[0]
+            for _, slots in self.parts.values()
+            for pieces in slots
+            for piece in pieces
+            if isinstance(piece, tuple)
+        }
+
+    def render_into(self, buffer, values):
+        """Write the document to buffer with the placeholders filled from values (field -> str)."""
+        buffer.write(self._base)
+        buffer.seek(0)
+        with zipfile.ZipFile(buffer, "a", zipfile.ZIP_DEFLATED) as out:
+            for name, (chunks, slots) in self.parts.items():
+                out.writestr(name, self._render_part(chunks, slots, values))
+        return buffer
+
+    @staticmethod
+    def _render_part(chunks, slots, values):
+        out = [chunks[0]]
+        for pieces, chunk in zip(slots, chunks[1:]):
+            text = "".join(
+                (values[piece[0]] if piece[0] in values else piece[1]) if isinstance(piece, tuple) else piece
+                for piece in pieces
+            )
+            out.append(escape(text).encode("utf-8"))
+            out.append(chunk)
+        return b"".join(out)
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(path):
+    mtime = os.stat(path).st_mtime_ns
+    with _templates_lock:
+        cached = _templates.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        template = DocxTemplate(path)
+        _templates[path] = (mtime, template)
+        return template
@@ -0,0 +1,122 @@
+"""
+On-disk cache of payslip extraction results.
+
+Entries are keyed on the SHA-256 of the PDF bytes plus the extractor version, so
+re-uploading the same file skips pdfplumber entirely and a new extractor version
+never serves stale results. The store is a local SQLite file with LRU eviction;
+the calls block, so async code runs them in the threadpool. Settings (env):
+- EXTRACTION_CACHE_PATH: SQLite file (default: extraction_cache.sqlite3 next to this module)
+- EXTRACTION_CACHE_MAX_ENTRIES: entries kept before the least recently used are evicted (0 disables the cache)
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from pdf_extract_utils import EXTRACTOR_VERSION
+
+EXTRACTION_CACHE_PATH = os.getenv(
+    "EXTRACTION_CACHE_PATH", os.path.join(os.path.dirname(__file__), "extraction_cache.sqlite3")
+)
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "5000"))
+# Eviction trims to this share of the bound, so it runs once per many inserts
+EVICT_TO = 0.9
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, path=EXTRACTION_CACHE_PATH, max_entries=EXTRACTION_CACHE_MAX_ENTRIES, version=EXTRACTOR_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = version
+        self._conn = None
+        self._lock = threading.Lock()
+        # Rows in the file as far as this process knows; other processes may add more between evictions
+        self._count = 0
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    content_hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (content_hash, version)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS extraction_cache_last_used ON extraction_cache (last_used)")
+            self._count = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, digest):
+        if not self.max_entries:
+            return None
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT result FROM extraction_cache WHERE content_hash = ? AND version = ?",
+                    (digest, self.version),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE extraction_cache SET last_used = ? WHERE content_hash = ? AND version = ?",
+                    (time.time(), digest, self.version),
+                )
+            return json.loads(row[0])
+        except Exception as e:
+            # The cache is an optimisation only; never fail an upload because of it
+            logging.warning(f"Extraction cache read failed: {e}")
+            return None
+
+    def put(self, digest, result):
+        if not self.max_entries:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO extraction_cache (content_hash, version, result, last_used) VALUES (?, ?, ?, ?)",
+                    (digest, self.version, json.dumps(result), time.time()),
+                ).rowcount
+                if inserted:
+                    self._count += 1
+                else:
+                    conn.execute(
+                        "UPDATE extraction_cache SET result = ?, last_used = ? WHERE content_hash = ? AND version = ?",
+                        (json.dumps(result), time.time(), digest, self.version),
+                    )
+                if self._count > self.max_entries:
+                    # Evict least recently used entries (old extractor versions go first)
+                    keep = max(int(self.max_entries * EVICT_TO), 1)
+                    conn.execute("""
+                        DELETE FROM extraction_cache WHERE rowid IN (
+                            SELECT rowid FROM extraction_cache
+                            ORDER BY version = ? DESC, last_used DESC
+                            LIMIT -1 OFFSET ?
+                        )
+                    """, (self.version, keep))
+                    self._count = conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()[0]
+        except Exception as e:
+            logging.warning(f"Extraction cache write failed: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+cache = ExtractionCache()
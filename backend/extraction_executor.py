@@ -0,0 +1,132 @@
+"""
+Process pool for CPU-heavy PDF work (payslip parsing, batch rendering).
+
+pdfplumber work runs in separate processes so uploads scale across cores and
+never block the event loop. Settings (env):
+- EXTRACTION_WORKERS: number of worker processes (default: CPU count)
+- EXTRACTION_MAX_PENDING: jobs allowed to wait or run at once before new ones are rejected
+- EXTRACTION_TIMEOUT: seconds a single job may run in a worker; time spent waiting
+  for a free worker is not counted
+- EXTRACTION_MAX_JOBS_PER_WORKER: worker processes are replaced after this many jobs
+  to contain pdfplumber memory growth
+"""
+import asyncio
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from starlette.concurrency import run_in_threadpool
+
+from pdf_extract_utils import extract_einkommensbescheinigung_fields
+import extraction_cache
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 2)))
+EXTRACTION_MAX_PENDING = int(os.getenv("EXTRACTION_MAX_PENDING", "64"))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "60"))
+EXTRACTION_MAX_JOBS_PER_WORKER = int(os.getenv("EXTRACTION_MAX_JOBS_PER_WORKER", "50"))
+
+
+class ExtractionQueueFull(Exception):
+    pass
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _extract_job(source):
+    # Runs inside a worker process; accepts a file path or the raw PDF bytes
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return extract_einkommensbescheinigung_fields(source)
+
+
+class ExtractionExecutor:
+    def __init__(self, workers=EXTRACTION_WORKERS, max_pending=EXTRACTION_MAX_PENDING,
+                 timeout=EXTRACTION_TIMEOUT, max_jobs_per_worker=EXTRACTION_MAX_JOBS_PER_WORKER,
+                 cache=extraction_cache.cache):
+        self.workers = workers
+        self.cache = cache
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        # The pool never gets more jobs than it has workers, so a submitted job starts at once
+        # and its timeout measures running time, not time queued behind other jobs
+        self._slots = asyncio.Semaphore(max(workers, 1))
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    max_tasks_per_child=self.max_jobs_per_worker or None,
+                )
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Throw away a pool whose worker hung or died; the next job starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            try:
+                process.terminate()
+            except Exception:
+                pass
+
+    async def run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise ExtractionQueueFull(f"{self._pending} extraction jobs already queued")
+        self._pending += 1
+        try:
+            async with self._slots:
+                for attempt in (1, 2):
+                    pool = self._get_pool()
+                    future = asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+                    try:
+                        return await asyncio.wait_for(future, self.timeout)
+                    except asyncio.TimeoutError:
+                        logging.error(f"Extraction job ran longer than {self.timeout}s, recycling worker pool")
+                        self._discard_pool(pool)
+                        raise ExtractionTimeout(f"PDF extraction took longer than {self.timeout:g}s")
+                    except BrokenProcessPool:
+                        # Collateral of another job's timeout or a crashed worker: retry once on a fresh pool
+                        self._discard_pool(pool)
+                        if attempt == 2:
+                            raise
+        finally:
+            self._pending -= 1
+
+    async def extract_einkommensbescheinigung(self, source, content_hash=None):
+        """
+        Extract payslip fields. Raw PDF bytes are looked up in the result cache first;
+        pass content_hash if the caller already computed it.
+        """
+        if self.cache is None or not isinstance(source, (bytes, bytearray)):
+            return await self.run(_extract_job, source)
+        digest = content_hash or await run_in_threadpool(extraction_cache.content_hash, source)
+        cached = await run_in_threadpool(self.cache.get, digest)
+        if cached is not None:
+            return cached
+        result = await self.run(_extract_job, source)
+        await run_in_threadpool(self.cache.put, digest, result)
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+executor = ExtractionExecutor()
@@ -0,0 +1,82 @@
+"""
+Rule-based German public holidays, nationwide and per federal state.
+
+Used when api-feiertage.de cannot be reached and as the first answer before the API
+result is cached. States use the api-feiertage codes ('bw', 'by', ..., 'th'); only
+holidays that apply to the whole state are listed, as the API does.
+"""
+import datetime
+from functools import lru_cache
+
+STATES = ('bw', 'by', 'be', 'bb', 'hb', 'hh', 'he', 'mv', 'ni', 'nw', 'rp', 'sl', 'sn', 'st', 'sh', 'th')
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _buss_und_bettag(year):
+    # Wednesday before 23 November
+    nov_22 = datetime.date(year, 11, 22)
+    return nov_22 - datetime.timedelta(days=(nov_22.weekday() - 2) % 7)
+
+
+def _applies(states, state):
+    return states is None or state in states
+
+
+@lru_cache(maxsize=512)
+def compute_holidays(year, state='sn'):
+    """((date, name), ...) sorted by date for the year in the given state."""
+    state = state.lower()
+    easter = easter_sunday(year)
+
+    def after_easter(days):
+        return easter + datetime.timedelta(days=days)
+
+    # (date, name, states or None for nationwide, first year it applies)
+    rules = [
+        (datetime.date(year, 1, 1), 'Neujahr', None, 0),
+        (datetime.date(year, 1, 6), 'Heilige Drei Könige', ('bw', 'by', 'st'), 0),
+        (datetime.date(year, 3, 8), 'Internationaler Frauentag', ('be',), 2019),
+        (datetime.date(year, 3, 8), 'Internationaler Frauentag', ('mv',), 2023),
+        (after_easter(-2), 'Karfreitag', None, 0),
+        (easter, 'Ostersonntag', ('bb',), 0),
+        (after_easter(1), 'Ostermontag', None, 0),
+        (datetime.date(year, 5, 1), 'Tag der Arbeit', None, 0),
+        (after_easter(39), 'Christi Himmelfahrt', None, 0),
+        (after_easter(49), 'Pfingstsonntag', ('bb',), 0),
+        (after_easter(50), 'Pfingstmontag', None, 0),
+        (after_easter(60), 'Fronleichnam', ('bw', 'by', 'he', 'nw', 'rp', 'sl'), 0),
+        (datetime.date(year, 8, 15), 'Mariä Himmelfahrt', ('sl',), 0),
+        (datetime.date(year, 9, 20), 'Weltkindertag', ('th',), 2019),
+        (datetime.date(year, 10, 3), 'Tag der Deutschen Einheit', None, 1990),
+        (datetime.date(year, 10, 31), 'Reformationstag', ('bb', 'mv', 'sn', 'st', 'th'), 0),
+        (datetime.date(year, 10, 31), 'Reformationstag', ('hb', 'hh', 'ni', 'sh'), 2018),
+        (datetime.date(year, 11, 1), 'Allerheiligen', ('bw', 'by', 'nw', 'rp', 'sl'), 0),
+        (_buss_und_bettag(year), 'Buß- und Bettag', ('sn',), 0),
+        (datetime.date(year, 12, 25), '1. Weihnachtstag', None, 0),
+        (datetime.date(year, 12, 26), '2. Weihnachtstag', None, 0),
+    ]
+    # One-off holidays
+    if year == 2017:
+        rules.append((datetime.date(2017, 10, 31), 'Reformationstag', None, 0))
+    if year in (2020, 2025):
+        rules.append((datetime.date(year, 5, 8), 'Tag der Befreiung', ('be',), 0))
+
+    holidays = {}
+    for date, name, states, since in rules:
+        if year >= since and _applies(states, state):
+            holidays.setdefault(date, name)
+    return tuple(sorted(holidays.items()))
@@ -0,0 +1,180 @@
+"""
+Public holidays per (year, state) for /holidays and the Stundenzettel endpoints.
+
+Results from api-feiertage.de are kept in memory and in a local SQLite file, so they
+survive restarts and are served without touching the network. A (year, state) that was
+never fetched is answered at once by the rule-based calculator in german_holidays and
+fetched from the API in the background; cached results older than HOLIDAY_REFRESH_AFTER
+are served as they are while a background refresh replaces them. Settings (env):
+- HOLIDAY_API_URL: api-feiertage.de compatible endpoint (empty: rules only, no network)
+- HOLIDAY_API_TIMEOUT: seconds per API request (default 10)
+- HOLIDAY_REFRESH_AFTER: seconds before a cached API result is fetched again (default 30 days)
+- HOLIDAY_RETRY_AFTER: seconds before a failed fetch is retried (default 1 hour)
+- HOLIDAY_CACHE_PATH: SQLite file (default: holiday_cache.sqlite3 next to this module)
+- HOLIDAY_DEFAULT_STATE: state used when none is given (default 'sn')
+"""
+import asyncio
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from starlette.concurrency import run_in_threadpool
+
+from german_holidays import STATES, compute_holidays
+
+HOLIDAY_API_URL = os.getenv("HOLIDAY_API_URL", "https://get.api-feiertage.de/")
+HOLIDAY_API_TIMEOUT = float(os.getenv("HOLIDAY_API_TIMEOUT", "10"))
+HOLIDAY_REFRESH_AFTER = float(os.getenv("HOLIDAY_REFRESH_AFTER", str(30 * 24 * 3600)))
+HOLIDAY_RETRY_AFTER = float(os.getenv("HOLIDAY_RETRY_AFTER", "3600"))
+HOLIDAY_CACHE_PATH = os.getenv(
+    "HOLIDAY_CACHE_PATH", os.path.join(os.path.dirname(__file__), "holiday_cache.sqlite3")
+)
+HOLIDAY_DEFAULT_STATE = os.getenv("HOLIDAY_DEFAULT_STATE", "sn")
+
+
+class HolidayStore:
+    """API results on disk: (year, state) -> [(date 'YYYY-MM-DD', name)] and when they were fetched."""
+
+    def __init__(self, path=HOLIDAY_CACHE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS holidays (
+                    year INTEGER NOT NULL,
+                    state TEXT NOT NULL,
+                    holidays TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (year, state)
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def get(self, year, state):
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT holidays, fetched_at FROM holidays WHERE year = ? AND state = ?", (year, state)
+                ).fetchone()
+        except Exception as e:
+            logging.warning(f"Holiday cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        return tuple(tuple(h) for h in json.loads(row[0])), row[1]
+
+    def put(self, year, state, holidays, fetched_at):
+        try:
+            with self._lock:
+                self._connection().execute(
+                    "INSERT OR REPLACE INTO holidays (year, state, holidays, fetched_at) VALUES (?, ?, ?, ?)",
+                    (year, state, json.dumps(holidays), fetched_at),
+                )
+        except Exception as e:
+            logging.warning(f"Holiday cache write failed: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def fetch_holidays(year, state, api_url=HOLIDAY_API_URL, timeout=HOLIDAY_API_TIMEOUT):
+    """Blocking call to api-feiertage.de; ((date, name), ...) or an exception."""
+    resp = requests.get(api_url, params={"years": year, "states": state}, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("status", "success") != "success":
+        raise ValueError(f"api-feiertage: {data.get('status')}")
+    holidays = {}
+    for h in data.get("feiertage", []):
+        if h.get("date"):
+            holidays.setdefault(h["date"], h.get("fname") or "")
+    return tuple(sorted(holidays.items()))
+
+
+class HolidayCalendar:
+    def __init__(self, store=None, api_url=HOLIDAY_API_URL, fetch=fetch_holidays):
+        self.store = store or HolidayStore()
+        self.api_url = api_url
+        self.fetch = fetch
+        # (year, state) -> (holidays, fetched_at); fetched_at is None for calculated entries
+        self._entries = {}
+        self._refreshing = {}
+        self._last_attempt = {}
+
+    async def holidays(self, year, state=None):
+        """((date 'YYYY-MM-DD', name), ...) for the year; never waits for the network."""
+        state = (state or HOLIDAY_DEFAULT_STATE).lower()
+        key = (year, state)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await run_in_threadpool(self.store.get, year, state)
+            if entry is None:
+                entry = (tuple((d.isoformat(), name) for d, name in compute_holidays(year, state)), None)
+            self._entries[key] = entry
+        self._schedule_refresh(key, entry)
+        return entry[0]
+
+    def _schedule_refresh(self, key, entry):
+        if not self.api_url or key in self._refreshing:
+            return
+        fetched_at = entry[1]
+        if fetched_at is not None and time.time() - fetched_at < HOLIDAY_REFRESH_AFTER:
+            return
+        if time.monotonic() - self._last_attempt.get(key, -HOLIDAY_RETRY_AFTER) < HOLIDAY_RETRY_AFTER:
+            return
+        self._last_attempt[key] = time.monotonic()
+        self._refreshing[key] = asyncio.get_running_loop().create_task(self._refresh(key))
+
+    async def _refresh(self, key):
+        year, state = key
+        try:
+            holidays = await run_in_threadpool(self.fetch, year, state, self.api_url)
+            if not holidays:
+                raise ValueError("no holidays in response")
+            fetched_at = time.time()
+            self._entries[key] = (holidays, fetched_at)
+            await run_in_threadpool(self.store.put, year, state, holidays, fetched_at)
+        except Exception as e:
+            # Keep serving what we have (cached or calculated) and retry later
+            logging.warning(f"Holiday refresh for {year}/{state} failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def month_days(self, year, month, state=None):
+        """Zero-padded holiday days of one month, as build_month_grid expects them."""
+        prefix = f"{year:04d}-{month:02d}-"
+        return {date[8:10] for date, _ in await self.holidays(year, state) if date.startswith(prefix)}
+
+    async def close(self):
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await run_in_threadpool(self.store.close)
+
+
+def holiday_map(holidays):
+    """((date, name), ...) -> {month: {day: True}}, the shape the frontend uses."""
+    result = {}
+    for date, _ in holidays:
+        d = datetime.date.fromisoformat(date)
+        result.setdefault(d.month, {})[str(d.day).zfill(2)] = True
+    return result
+
+
+def is_valid_state(state):
+    return state.lower() in STATES
+
+
+calendar = HolidayCalendar()
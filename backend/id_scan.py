@@ -0,0 +1,165 @@
+"""
+ID-card extraction for employee onboarding (local MRZ reader, Mindee International ID v2).
+
+Cards and passports whose machine-readable zone can be read locally and passes its check
+digits (see mrz.py) are decoded without a network round trip; everything else goes to
+Mindee. The document is enqueued with Mindee and then polled with the event loop free between
+polls; only the HTTP calls themselves run in the threadpool. At most ID_SCAN_CONCURRENCY
+scans talk to Mindee at a time and a scan that is not finished after ID_SCAN_TIMEOUT
+seconds fails. Results are cached by file hash, so scanning the same card again costs
+no Mindee call, and concurrent scans of the same file share one call. MINDEE_BASE_URL
+points the SDK at a local stand-in (see mindee_standin.py). Settings (env):
+- ID_SCAN_LOCAL_MRZ: read the MRZ locally before asking Mindee (default 1)
+- MINDEE_API_KEY: Mindee API key
+- ID_SCAN_CONCURRENCY: scans in flight against Mindee (default 4)
+- ID_SCAN_TIMEOUT: seconds one scan may take, queueing at Mindee included (default 90)
+- ID_SCAN_POLL_INTERVAL: seconds between polls (default 1.5)
+- ID_SCAN_CACHE_PATH: SQLite file for results (default: id_scan_cache.sqlite3 next to this module)
+- ID_SCAN_CACHE_MAX_ENTRIES: cached results kept (0 disables the cache)
+"""
+import asyncio
+import logging
+import os
+import re
+
+from mindee import Client, product
+from starlette.concurrency import run_in_threadpool
+
+from extraction_cache import ExtractionCache, content_hash
+from mrz import read_mrz
+
+ID_SCAN_LOCAL_MRZ = os.getenv("ID_SCAN_LOCAL_MRZ", "1") == "1"
+MINDEE_API_KEY = os.getenv("MINDEE_API_KEY", "your_mindee_api_key")
+ID_SCAN_CONCURRENCY = int(os.getenv("ID_SCAN_CONCURRENCY", "4"))
+ID_SCAN_TIMEOUT = float(os.getenv("ID_SCAN_TIMEOUT", "90"))
+ID_SCAN_POLL_INTERVAL = float(os.getenv("ID_SCAN_POLL_INTERVAL", "1.5"))
+ID_SCAN_CACHE_PATH = os.getenv(
+    "ID_SCAN_CACHE_PATH", os.path.join(os.path.dirname(__file__), "id_scan_cache.sqlite3")
+)
+ID_SCAN_CACHE_MAX_ENTRIES = int(os.getenv("ID_SCAN_CACHE_MAX_ENTRIES", "5000"))
+# Bump when the field mapping changes so cached results are not reused
+ID_SCAN_VERSION = "international-id-v2/1"
+
+GESCHLECHT = {'M': 'männlich', 'F': 'weiblich', 'D': 'divers'}
+
+
+class IdScanError(Exception):
+    pass
+
+
+def _value(field):
+    return field.value if field is not None and getattr(field, 'value', None) else None
+
+
+def id_fields(doc):
+    """Map a Mindee International ID document to employee columns."""
+    prediction = doc.inference.prediction
+    vorname = " ".join(n.value for n in prediction.given_names if n.value) or None
+    geburtsname = " ".join(s.value for s in prediction.surnames if s.value) or None
+    fields = {
+        "vorname": vorname,
+        "geburtsname": geburtsname,
+        "geburtsdatum": _value(prediction.birth_date),
+        "geschlecht": _value(prediction.sex),
+        "staatsangehoerigkeit": _value(prediction.nationality),
+        "id_number": _value(prediction.document_number),
+        "personal_number": _value(prediction.personal_number),
+    }
+    # Fallback extraction from the text summary if the prediction fields are empty
+    if not any(v for k, v in fields.items() if k != "geburtsname"):
+        doc_str = str(doc)
+
+        def extract(pattern):
+            match = re.search(pattern, doc_str)
+            return match.group(1).strip() if match else None
+        fields = {
+            "vorname": extract(r"Given Names:\s*(.*)"),
+            "geburtsname": extract(r"Surnames:\s*(.*)"),
+            "geburtsdatum": extract(r"Birth Date:\s*(.*)"),
+            "geschlecht": extract(r"Sex:\s*(.*)"),
+            "staatsangehoerigkeit": extract(r"Nationality:\s*(.*)"),
+            "id_number": extract(r"Document Number:\s*(.*)"),
+            "personal_number": extract(r"Personal Number:\s*(.*)"),
+        }
+    fields["geschlecht"] = GESCHLECHT.get(fields["geschlecht"], fields["geschlecht"])
+    return fields
+
+
+def mrz_fields(zone):
+    """Map a decoded MRZ (see mrz.read_mrz) to the same employee columns as id_fields."""
+    return {
+        "vorname": zone["given_names"],
+        "geburtsname": zone["surnames"],
+        "geburtsdatum": zone["birth_date"],
+        "geschlecht": GESCHLECHT.get(zone["sex"]),
+        "staatsangehoerigkeit": zone["nationality"],
+        "id_number": zone["document_number"],
+        "personal_number": zone["personal_number"],
+    }
+
+
+class IdScanner:
+    def __init__(self, client=None, concurrency=ID_SCAN_CONCURRENCY, timeout=ID_SCAN_TIMEOUT,
+                 poll_interval=ID_SCAN_POLL_INTERVAL, cache=None, local_mrz=ID_SCAN_LOCAL_MRZ):
+        self.client = client or Client(api_key=MINDEE_API_KEY)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.local_mrz = local_mrz
+        self.cache = cache or ExtractionCache(ID_SCAN_CACHE_PATH, ID_SCAN_CACHE_MAX_ENTRIES, ID_SCAN_VERSION)
+        self._slots = asyncio.Semaphore(max(concurrency, 1))
+        self._inflight = {}
+
+    def _enqueue(self, content, filename):
+        source = self.client.source_from_bytes(content, filename)
+        return self.client.enqueue(product.InternationalIdV2, source).job.id
+
+    def _poll(self, queue_id):
+        return self.client.parse_queued(product.InternationalIdV2, queue_id)
+
+    async def _call_mindee(self, content, filename):
+        queue_id = await run_in_threadpool(self._enqueue, content, filename)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            response = await run_in_threadpool(self._poll, queue_id)
+            if response.job.status == "completed":
+                return id_fields(response.document)
+            if response.job.status == "failed":
+                raise IdScanError(f"Mindee konnte das Dokument nicht verarbeiten ({queue_id})")
+
+    async def _scan(self, digest, content, filename, on_start):
+        zone = await run_in_threadpool(read_mrz, content) if self.local_mrz else None
+        if zone is not None:
+            logging.info(f"ID scan of {filename}: {zone['format']} MRZ read locally")
+            fields = mrz_fields(zone)
+        else:
+            async with self._slots:
+                if on_start:
+                    on_start()
+                try:
+                    fields = await asyncio.wait_for(self._call_mindee(content, filename), self.timeout)
+                except asyncio.TimeoutError:
+                    raise IdScanError(f"Mindee hat nicht innerhalb von {self.timeout:g} s geantwortet")
+        await run_in_threadpool(self.cache.put, digest, fields)
+        return fields
+
+    def _forget(self, digest, task):
+        self._inflight.pop(digest, None)
+        # Retrieve the error so an abandoned scan does not log 'exception was never retrieved'
+        if not task.cancelled():
+            task.exception()
+
+    async def scan(self, content, filename, on_start=None):
+        """Employee columns read from an ID card; on_start is called once a Mindee slot is taken."""
+        digest = content_hash(content)
+        cached = await run_in_threadpool(self.cache.get, digest)
+        if cached is not None:
+            return dict(cached)
+        task = self._inflight.get(digest)
+        if task is None:
+            task = asyncio.ensure_future(self._scan(digest, content, filename, on_start))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda t: self._forget(digest, t))
+        return dict(await asyncio.shield(task))
+
+
+scanner = IdScanner()
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request, Security, Body
+from fastapi import FastAPI, HTTPException, Depends, status, Request, Security, Body, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import logging
@@ -8,12 +8,17 @@ from routes_einkommensbescheinigung import router as einkommensbescheinigung_rou
 from routes_company import router as company_router
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 import jwt
-import bcrypt
 import datetime
-import mysql.connector
-from db import get_connection
-from auth import get_current_user, create_access_token
-import requests
+from starlette.concurrency import run_in_threadpool
+from db import pool as db_pool
+import db_async
+from extraction_executor import executor as extraction_executor
+import repositories
+import dashboard_stats
+import holiday_calendar
+import background_jobs
+from auth import get_current_user, create_tokens, verify_refresh_token, revocations
+from password_hashing import hasher, HashQueueFull
 import secrets
 from email.mime.text import MIMEText
 import smtplib
@@ -39,70 +44,104 @@ app.include_router(erklaerung_form_router)
 app.include_router(einkommensbescheinigung_router)
 app.include_router(company_router)
 
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecretkey")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
+@app.on_event("startup")
+async def prepare_database():
+    try:
+        await repositories.ensure_resource_versions()
+    except Exception as e:
+        logging.warning(f"Could not create resource_versions: {e}")
+    try:
+        await repositories.ensure_token_revocations()
+    except Exception as e:
+        logging.warning(f"Could not create token_revocations: {e}")
+    try:
+        await repositories.ensure_payslip_content_hash()
+    except Exception as e:
+        logging.warning(f"Could not add einkommensbescheinigung.content_hash: {e}")
+    try:
+        await repositories.ensure_payslip_period_index()
+    except Exception as e:
+        logging.warning(f"Could not index einkommensbescheinigung by period: {e}")
+    try:
+        await repositories.ensure_stundenzettel_file_key()
+    except Exception as e:
+        logging.warning(f"Could not add stundenzettel_downloads.file_key: {e}")
+    await hasher.prepare()
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    db_pool.dispose()
+    await db_async.close_pool()
+    extraction_executor.shutdown()
+    hasher.shutdown()
+    await holiday_calendar.calendar.close()
+    await background_jobs.jobs.close()
+
 RESET_TOKEN_EXPIRY_MINUTES = 30
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+PASSWORD_BUSY = "Zu viele Anmeldungen gleichzeitig, bitte später erneut versuchen"
+
+async def hash_password(password):
+    try:
+        return await hasher.hash(password)
+    except HashQueueFull:
+        raise HTTPException(status_code=503, detail=PASSWORD_BUSY)
+
+async def verify_password(password, hashed):
+    try:
+        return await hasher.verify(password, hashed)
+    except HashQueueFull:
+        raise HTTPException(status_code=503, detail=PASSWORD_BUSY)
+
+async def rehash_password(user_id, old_hash, password):
+    try:
+        await repositories.rehash_user_password(user_id, old_hash, await hasher.hash(password))
+    except Exception as e:
+        logging.warning(f"Password rehash for user {user_id} failed: {e}")
+
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM users WHERE username = %s OR email = %s", (form_data.username, form_data.username))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def login(background_tasks: BackgroundTasks, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await repositories.get_user_by_login(form_data.username)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    if not bcrypt.checkpw(form_data.password.encode(), user['password'].encode()):
+    if not await verify_password(form_data.password, user['password']):
         raise HTTPException(status_code=400, detail="Incorrect username or password")
-    token = create_access_token({"sub": user['username'], "role": user['role'], "user_id": user['id']})
-    return {"access_token": token, "token_type": "bearer", "role": user['role'], "username": user['username']}
+    if hasher.needs_rehash(user['password']):
+        # Upgrade the stored hash to the current cost after the response is sent
+        background_tasks.add_task(rehash_password, user['id'], user['password'], form_data.password)
+    return {**create_tokens(user), "role": user['role'], "username": user['username']}
+
+@app.post("/refresh")
+async def refresh(data: dict = Body(...)):
+    payload = await verify_refresh_token(data.get('refresh_token'))
+    user = await repositories.get_user_by_id(payload['user_id'])
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    return {**create_tokens(user), "role": user['role'], "username": user['username']}
 
 @app.get("/")
 def root():
     return {"status": "ok"}
 
 @app.get("/holidays/{year}")
-def get_holidays(year: int, state: str = 'sn'):
-    url = f"https://get.api-feiertage.de/?years={year}&states={state}"
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        holidays = data.get('feiertage', [])
-        # Map to { [month]: { [day]: true } }
-        result = {}
-        for h in holidays:
-            d = h.get('date')
-            if not d:
-                continue
-            dt = datetime.datetime.strptime(d, "%Y-%m-%d")
-            m = dt.month
-            day = dt.day
-            if m not in result:
-                result[m] = {}
-            result[m][str(day).zfill(2)] = True
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch holidays: {str(e)}")
+async def get_holidays(year: int, state: str = holiday_calendar.HOLIDAY_DEFAULT_STATE):
+    if not holiday_calendar.is_valid_state(state):
+        raise HTTPException(status_code=400, detail=f"Unbekanntes Bundesland: {state}")
+    if not 1900 <= year <= 2200:
+        raise HTTPException(status_code=400, detail=f"Ungültiges Jahr: {year}")
+    # Map to { [month]: { [day]: true } }
+    return holiday_calendar.holiday_map(await holiday_calendar.calendar.holidays(year, state))
 
 @app.get("/users")
-def list_users(user=Depends(get_current_user)):
+async def list_users(user=Depends(get_current_user)):
     if user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail="Admins only")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, username, email, role FROM users")
-    users = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return users
+    return await repositories.list_users()
 
 @app.post("/users")
-def create_user(data: dict = Body(...), user=Depends(get_current_user)):
+async def create_user(data: dict = Body(...), user=Depends(get_current_user)):
     if user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail="Admins only")
     username = data.get('username')
@@ -111,147 +150,94 @@ def create_user(data: dict = Body(...), user=Depends(get_current_user)):
     role = data.get('role', 'user')
     if not username or not email or not password:
         raise HTTPException(status_code=400, detail="Missing fields")
-    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
-    conn = get_connection()
-    cursor = conn.cursor()
+    hashed = await hash_password(password)
     try:
-        cursor.execute("INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)", (username, email, hashed, role))
-        conn.commit()
+        await repositories.create_user(username, email, hashed, role)
     except Exception as e:
-        conn.rollback()
-        cursor.close()
-        conn.close()
         raise HTTPException(status_code=400, detail=f"User creation failed: {str(e)}")
-    cursor.close()
-    conn.close()
+    dashboard_stats.invalidate()
     return {"message": "User created"}
 
 @app.patch("/users/{user_id}")
-def update_user(user_id: int, data: dict = Body(...), user=Depends(get_current_user)):
-    if user.get('role') != 'admin' and int(user.get('user_id')) != int(user_id):
+async def update_user(user_id: int, data: dict = Body(...), user=Depends(get_current_user)):
+    if user.get('role') != 'admin' and int(user.get('id')) != int(user_id):
         raise HTTPException(status_code=403, detail="Not allowed")
-    fields = []
-    values = []
+    fields = {}
     for k in ['username', 'email', 'role']:
         if k in data:
             if k == 'role' and user.get('role') != 'admin':
                 continue  # Only admin can change role
-            fields.append(f"{k}=%s")
-            values.append(data[k])
+            fields[k] = data[k]
     if 'password' in data and data['password']:
-        fields.append("password=%s")
-        values.append(bcrypt.hashpw(data['password'].encode(), bcrypt.gensalt()).decode())
+        fields['password'] = await hash_password(data['password'])
     if not fields:
         raise HTTPException(status_code=400, detail="No fields to update")
-    values.append(user_id)
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE users SET {', '.join(fields)} WHERE id=%s", tuple(values))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    await repositories.update_user(user_id, fields)
+    if 'role' in fields or 'password' in fields:
+        # Tokens carry the role, and a new password must also end sessions opened with the old one
+        await revocations.revoke(user_id)
+    if 'role' in fields:
+        dashboard_stats.invalidate()
     return {"message": "User updated"}
 
 @app.delete("/users/{user_id}")
-def delete_user(user_id: int, user=Depends(get_current_user)):
+async def delete_user(user_id: int, user=Depends(get_current_user)):
     if user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail="Admins only")
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    await revocations.revoke(user_id)
+    await repositories.delete_user(user_id)
+    dashboard_stats.invalidate()
     return {"message": "User deleted"}
 
 @app.post("/forgot-password")
-def forgot_password(data: dict = Body(...)):
+async def forgot_password(data: dict = Body(...)):
     email = data.get('email')
     if not email:
         raise HTTPException(status_code=400, detail="Email required")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, username FROM users WHERE email=%s", (email,))
-    user = cursor.fetchone()
+    user = await repositories.get_user_by_email(email)
     if not user:
-        cursor.close()
-        conn.close()
         return {"message": "If the email exists, a reset link will be sent."}
     token = secrets.token_urlsafe(48)
     expiry = (datetime.datetime.utcnow() + datetime.timedelta(minutes=RESET_TOKEN_EXPIRY_MINUTES)).isoformat()
-    cursor.execute("INSERT INTO password_resets (user_id, token, expires_at) VALUES (%s, %s, %s)", (user['id'], token, expiry))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    await repositories.create_password_reset(user['id'], token, expiry)
     reset_url = os.getenv('FRONTEND_URL', 'http://localhost:8080') + f"/reset-password?token={token}"
     msg = MIMEText(f"Hello {user['username']},\n\nClick the link to reset your password: {reset_url}\n\nIf you did not request this, ignore this email.")
     msg['Subject'] = 'Password Reset'
     msg['From'] = os.getenv('EMAIL_FROM')
     msg['To'] = email
-    try:
+    def send():
         with smtplib.SMTP_SSL(os.getenv('EMAIL_HOST'), int(os.getenv('EMAIL_PORT'))) as server:
             server.login(os.getenv('EMAIL_USER'), os.getenv('EMAIL_PASS'))
             server.sendmail(msg['From'], [msg['To']], msg.as_string())
+    try:
+        await run_in_threadpool(send)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to send email: {str(e)}")
     return {"message": "If the email exists, a reset link will be sent."}
 
 @app.post("/reset-password")
-def reset_password(data: dict = Body(...)):
+async def reset_password(data: dict = Body(...)):
     token = data.get('token')
     new_password = data.get('password')
     if not token or not new_password:
         raise HTTPException(status_code=400, detail="Token and new password required")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT user_id, expires_at FROM password_resets WHERE token=%s", (token,))
-    row = cursor.fetchone()
+    row = await repositories.get_password_reset(token)
     if not row:
-        cursor.close()
-        conn.close()
         raise HTTPException(status_code=400, detail="Invalid or expired token")
     if datetime.datetime.fromisoformat(row['expires_at']) < datetime.datetime.utcnow():
-        cursor.execute("DELETE FROM password_resets WHERE token=%s", (token,))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        await repositories.delete_password_reset(token)
         raise HTTPException(status_code=400, detail="Token expired")
-    hashed = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-    cursor.execute("UPDATE users SET password=%s WHERE id=%s", (hashed, row['user_id']))
-    cursor.execute("DELETE FROM password_resets WHERE token=%s", (token,))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    hashed = await hash_password(new_password)
+    await repositories.reset_user_password(row['user_id'], hashed, token)
+    # Refresh tokens live for days; one that leaked must not outlast the reset
+    await revocations.revoke(row['user_id'])
     return {"message": "Password reset successful"}
 
 @app.get("/dashboard-stats")
-def dashboard_stats(user=Depends(get_current_user)):
+async def get_dashboard_stats(user=Depends(get_current_user)):
     if user.get('role') not in ('admin', 'user'):
         raise HTTPException(status_code=403, detail="Not allowed")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    # Users
-    cursor.execute("SELECT COUNT(*) as total_users FROM users")
-    total_users = cursor.fetchone()['total_users']
-    cursor.execute("SELECT COUNT(*) as total_admins FROM users WHERE role='admin'")
-    total_admins = cursor.fetchone()['total_admins']
-    # Employees
-    cursor.execute("SELECT COUNT(*) as total_employees FROM employees")
-    total_employees = cursor.fetchone()['total_employees']
-    cursor.execute("SELECT COUNT(*) as total_minijobs FROM employees WHERE contract_type='TEILZEITTÄTIGKEIT - \"MINIJOB\"'")
-    total_minijobs = cursor.fetchone()['total_minijobs']
-    cursor.execute("SELECT COUNT(*) as total_fulltime FROM employees WHERE contract_type='VOLLZEITTÄTIGKEIT'")
-    total_fulltime = cursor.fetchone()['total_fulltime']
-    cursor.execute("SELECT COUNT(*) as total_parttime FROM employees WHERE contract_type='TEILZEITTÄTIGKEIT'")
-    total_parttime = cursor.fetchone()['total_parttime']
-    # Add more stats as needed
-    cursor.close()
-    conn.close()
-    return {
-        "total_users": total_users,
-        "total_admins": total_admins,
-        "total_employees": total_employees,
-        "total_minijobs": total_minijobs,
-        "total_fulltime": total_fulltime,
-        "total_parttime": total_parttime
-    }
+    try:
+        return await dashboard_stats.get_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,50 @@
+"""
+Move Stundenzettel PDFs from stundenzettel_downloads.file_blob into the blob store.
+
+    python migrate_stundenzettel_blobs.py [--keep-blobs]
+
+Adds the file_key column if the table does not have it yet (the API adds it on startup,
+see repositories.ensure_stundenzettel_file_key), then stores every remaining
+file_blob (one row at a time), records its key and clears the blob. Run OPTIMIZE TABLE
+stundenzettel_downloads afterwards to give the space back to InnoDB.
+"""
+import argparse
+import logging
+
+from db import connection
+import blob_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keep-blobs", action="store_true", help="record the keys but leave file_blob in place")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    store = blob_store.get_store()
+    with connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT COUNT(*) AS n FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'stundenzettel_downloads' AND COLUMN_NAME = 'file_key'"
+        )
+        if not cursor.fetchone()['n']:
+            logging.info("Adding stundenzettel_downloads.file_key")
+            cursor.execute("ALTER TABLE stundenzettel_downloads ADD COLUMN file_key char(64) DEFAULT NULL, ADD KEY file_key (file_key)")
+        cursor.execute("SELECT id FROM stundenzettel_downloads WHERE file_key IS NULL AND file_blob IS NOT NULL ORDER BY id")
+        ids = [row['id'] for row in cursor.fetchall()]
+        moved = 0
+        for download_id in ids:
+            cursor.execute("SELECT file_blob FROM stundenzettel_downloads WHERE id = %s", (download_id,))
+            key = store.put(cursor.fetchone()['file_blob'])
+            if args.keep_blobs:
+                cursor.execute("UPDATE stundenzettel_downloads SET file_key = %s WHERE id = %s", (key, download_id))
+            else:
+                cursor.execute("UPDATE stundenzettel_downloads SET file_key = %s, file_blob = NULL WHERE id = %s", (key, download_id))
+            conn.commit()
+            moved += 1
+        logging.info(f"Moved {moved} of {len(ids)} Stundenzettel files to the blob store")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Local stand-in for the Mindee International ID v2 async API, for development and load tests.
+
+    uvicorn mindee_standin:app --port 8001
+    MINDEE_BASE_URL=http://127.0.0.1:8001/v1 uvicorn main:app
+
+It answers the two calls the SDK makes (enqueue and poll the queue). Jobs complete after
+MINDEE_STANDIN_DELAY seconds; the card data is fixed except for the document number,
+which is derived from the file hash so different files give different employees.
+A file whose name contains 'fail' produces a failed job. Settings (env):
+- MINDEE_STANDIN_DELAY: seconds until a job is completed (default 1)
+"""
+import datetime
+import hashlib
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+
+MINDEE_STANDIN_DELAY = float(os.getenv("MINDEE_STANDIN_DELAY", "1"))
+PRODUCT_PATH = "/v1/products/mindee/international_id/v2"
+
+app = FastAPI()
+_jobs = {}
+
+
+def _field(value, confidence=0.99):
+    return {"value": value, "confidence": confidence, "polygon": [], "page_id": 0}
+
+
+def _prediction(digest):
+    return {
+        "address": _field("MUSTERSTRASSE 1, 01067 DRESDEN"),
+        "birth_date": _field("1990-08-12"),
+        "birth_place": _field("BERLIN"),
+        "country_of_issue": _field("DEU"),
+        "document_number": _field("T" + digest[:8].upper()),
+        "document_type": _field("IDENTIFICATION_CARD"),
+        "expiry_date": _field("2031-01-01"),
+        "given_names": [_field("ERIKA")],
+        "issue_date": _field("2021-01-02"),
+        "mrz_line1": _field(None),
+        "mrz_line2": _field(None),
+        "mrz_line3": _field(None),
+        "nationality": _field("DEU"),
+        "personal_number": _field(None),
+        "sex": _field("F"),
+        "state_of_issue": _field(None),
+        "surnames": [_field("MUSTERMANN")],
+    }
+
+
+def _api_request(status_code):
+    return {"error": {}, "resources": ["document", "job"], "status": "success",
+            "status_code": status_code, "url": f"http://localhost{PRODUCT_PATH}"}
+
+
+def _job(job):
+    done = time.time() >= job["ready_at"]
+    body = {
+        "id": job["id"],
+        "issued_at": job["issued_at"],
+        "status": ("failed" if job["fail"] else "completed") if done else "processing",
+    }
+    if done:
+        body["available_at"] = datetime.datetime.now().isoformat()
+    return body
+
+
+@app.post(PRODUCT_PATH + "/predict_async", status_code=202)
+async def predict_async(document: UploadFile = File(...)):
+    content = await document.read()
+    job_id = str(uuid.uuid4())
+    _jobs[job_id] = {
+        "id": job_id,
+        "issued_at": datetime.datetime.now().isoformat(),
+        "ready_at": time.time() + MINDEE_STANDIN_DELAY,
+        "digest": hashlib.sha256(content).hexdigest(),
+        "name": document.filename or "document",
+        "fail": "fail" in (document.filename or "").lower(),
+    }
+    return {"api_request": _api_request(202), "job": _job(_jobs[job_id])}
+
+
+@app.get(PRODUCT_PATH + "/documents/queue/{job_id}")
+async def queue(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    body = {"api_request": _api_request(200), "job": _job(job)}
+    if body["job"]["status"] == "completed":
+        prediction = _prediction(job["digest"])
+        body["document"] = {
+            "id": job_id,
+            "name": job["name"],
+            "n_pages": 1,
+            "is_rotation_applied": True,
+            "inference": {
+                "product": {"name": "mindee/international_id", "version": "2.0"},
+                "is_rotation_applied": True,
+                "prediction": prediction,
+                "pages": [{"id": 0, "orientation": {"value": 0}, "prediction": prediction, "extras": {}}],
+                "extras": {},
+                "started_at": job["issued_at"],
+                "finished_at": body["job"]["available_at"],
+                "processing_time": MINDEE_STANDIN_DELAY,
+            },
+        }
+    return body
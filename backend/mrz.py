@@ -0,0 +1,204 @@
+"""
+Local reader for the machine-readable zone (MRZ) of ID cards and passports.
+
+Decodes the ICAO 9303 formats TD1 (ID cards, 3 x 30), TD2 (2 x 36) and TD3 (passports,
+2 x 44). The text comes from the text layer of a PDF (pypdf) or, when pytesseract and
+the tesseract binary are installed, from OCR of images and of the images embedded in
+scanned PDFs; without them only text-layer PDFs are read locally. A zone is accepted
+only if every check digit matches, so a misread zone counts as no zone. Settings (env):
+- MRZ_MAX_PAGES: PDF pages searched for a zone (default 2)
+- MRZ_OCR_LANG: tesseract language, e.g. 'ocrb' if that model is installed (default 'eng')
+"""
+import datetime
+import io
+import logging
+import os
+import re
+from functools import lru_cache
+
+from pypdf import PdfReader
+
+MRZ_MAX_PAGES = int(os.getenv("MRZ_MAX_PAGES", "2"))
+MRZ_OCR_LANG = os.getenv("MRZ_OCR_LANG", "eng")
+
+_OCR_CONFIG = "--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+_MRZ_LINE = re.compile(r"[A-Z0-9<]{28,44}")
+# (lines, length, first characters of the document code)
+_FORMATS = (("TD1", 3, 30, "IAC"), ("TD3", 2, 44, "P"), ("TD2", 2, 36, "IACV"))
+# Germany writes 'D' instead of its ISO 3166 code
+_COUNTRY_CODES = {"D": "DEU"}
+
+
+def _char_value(c):
+    if c.isdigit():
+        return int(c)
+    if c == "<":
+        return 0
+    return ord(c) - ord("A") + 10
+
+
+def check_digit(data):
+    """ICAO 9303 check digit: weights 7, 3, 1 repeating, modulo 10."""
+    return sum(_char_value(c) * (7, 3, 1)[i % 3] for i, c in enumerate(data)) % 10
+
+
+def _checks(data, digit):
+    # An empty optional field may carry a filler instead of 0
+    if digit == "<":
+        return data.strip("<") == ""
+    return digit.isdigit() and check_digit(data) == int(digit)
+
+
+def _text(field):
+    return field.replace("<", " ").strip() or None
+
+
+def _country(field):
+    code = field.strip("<")
+    return _COUNTRY_CODES.get(code, code) or None
+
+
+def _names(field):
+    surnames, _, given_names = field.partition("<<")
+    return _text(surnames), _text(given_names)
+
+
+def _birth_date(field):
+    """YYMMDD -> 'YYYY-MM-DD'; a two-digit year after this year is taken as 19xx."""
+    if not field.isdigit():
+        return None
+    year, month, day = int(field[:2]), int(field[2:4]), int(field[4:6])
+    year += 1900 if year > datetime.date.today().year % 100 else 2000
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _document_number(line, start):
+    """Document number and its check digit; TD1 continues long numbers in the optional field."""
+    number, digit = line[start:start + 9], line[start + 9]
+    if digit == "<" and len(line) == 30:
+        overflow = line[start + 10:].split("<", 1)[0]
+        if overflow:
+            number, digit = number + overflow[:-1], overflow[-1]
+    return number, digit
+
+
+def parse_mrz(kind, lines):
+    """Decode one zone; None if a check digit does not match."""
+    if kind == "TD1":
+        line1, line2, line3 = lines
+        number, number_check = _document_number(line1, 5)
+        birth, birth_check = line2[0:6], line2[6]
+        sex, expiry, expiry_check = line2[7], line2[8:14], line2[14]
+        nationality, personal_number = line2[15:18], None
+        composite, composite_check = line1[5:30] + line2[0:7] + line2[8:15] + line2[18:29], line2[29]
+        name = line3
+    else:
+        line1, line2 = lines
+        number, number_check = line2[0:9], line2[9]
+        nationality, birth, birth_check = line2[10:13], line2[13:19], line2[19]
+        sex, expiry, expiry_check = line2[20], line2[21:27], line2[27]
+        end = len(line2) - 1
+        composite, composite_check = line2[0:10] + line2[13:20] + line2[21:end], line2[end]
+        personal_number = None
+        if kind == "TD3":
+            if not _checks(line2[28:42], line2[42]):
+                return None
+            personal_number = _text(line2[28:42])
+        name = line1[5:]
+    if not all(_checks(data, digit) for data, digit in (
+        (number, number_check), (birth, birth_check), (expiry, expiry_check), (composite, composite_check),
+    )):
+        return None
+    surnames, given_names = _names(name)
+    return {
+        "format": kind,
+        "document_code": line1[0:2].strip("<"),
+        "issuing_state": _country(line1[2:5]),
+        "document_number": number.strip("<"),
+        "surnames": surnames,
+        "given_names": given_names,
+        "birth_date": _birth_date(birth),
+        "sex": sex if sex != "<" else None,
+        "nationality": _country(nationality),
+        "personal_number": personal_number,
+    }
+
+
+def _candidate_lines(text):
+    lines = []
+    for raw in text.splitlines():
+        line = re.sub(r"\s+", "", raw.upper().replace("«", "<<"))
+        if _MRZ_LINE.fullmatch(line):
+            lines.append(line)
+    return lines
+
+
+def _fit(line, length):
+    # OCR and text extraction tend to drop trailing fillers
+    if length - 2 <= len(line) <= length:
+        return line.ljust(length, "<")
+    return None
+
+
+def find_mrz(text):
+    """The first valid zone in a block of text, or None."""
+    lines = _candidate_lines(text)
+    for i in range(len(lines)):
+        for kind, count, length, codes in _FORMATS:
+            window = [_fit(line, length) for line in lines[i:i + count]]
+            if len(window) < count or None in window or window[0][0] not in codes:
+                continue
+            zone = parse_mrz(kind, window)
+            if zone is not None:
+                return zone
+    return None
+
+
+@lru_cache(maxsize=1)
+def _ocr_engine():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return pytesseract
+    except Exception as e:
+        logging.info(f"No OCR for MRZ reading, only text-layer PDFs are read locally: {e}")
+        return None
+
+
+def _ocr(image_bytes):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image = image.convert("L")
+        if image.width < 1200:
+            image = image.resize((image.width * 2, image.height * 2))
+        return _ocr_engine().image_to_string(image, lang=MRZ_OCR_LANG, config=_OCR_CONFIG)
+
+
+def _texts(content):
+    """Text to search, cheapest source first."""
+    if content[:5] == b"%PDF-":
+        pages = PdfReader(io.BytesIO(content)).pages[:MRZ_MAX_PAGES]
+        for page in pages:
+            yield page.extract_text() or ""
+        if _ocr_engine():
+            for page in pages:
+                for image in page.images:
+                    yield _ocr(image.data)
+    elif _ocr_engine():
+        yield _ocr(content)
+
+
+def read_mrz(content):
+    """The decoded zone of an ID card or passport file (PDF or image), or None."""
+    try:
+        for text in _texts(content):
+            zone = find_mrz(text)
+            if zone is not None:
+                return zone
+    except Exception as e:
+        logging.warning(f"MRZ read failed: {e}")
+    return None
@@ -0,0 +1,117 @@
+"""
+bcrypt hashing and checking on a dedicated, bounded thread pool.
+
+bcrypt releases the GIL, so PASSWORD_HASH_WORKERS threads hash in parallel without
+taking threads from the request threadpool; once PASSWORD_HASH_MAX_PENDING hashes are
+running or waiting, new ones are rejected instead of piling up behind a login burst.
+The cost is PASSWORD_HASH_ROUNDS, or with 'auto' the highest cost (10-14) that hashes
+in about PASSWORD_HASH_TARGET_MS on this machine, measured once on first use. Hashes
+with another cost are upgraded on the next successful login (see needs_rehash).
+Settings (env):
+- PASSWORD_HASH_WORKERS: hashing threads (default: CPU count)
+- PASSWORD_HASH_MAX_PENDING: hashes allowed to wait or run at once (default 64)
+- PASSWORD_HASH_ROUNDS: bcrypt cost, 4-31 or 'auto' (default 12, bcrypt's own default)
+- PASSWORD_HASH_TARGET_MS: time one hash should take with 'auto' (default 250)
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS", "12")
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+
+AUTO_MIN_ROUNDS = 10
+AUTO_MAX_ROUNDS = 14
+
+
+class HashQueueFull(Exception):
+    pass
+
+
+def tune_rounds(target_ms=PASSWORD_HASH_TARGET_MS):
+    """Highest cost between AUTO_MIN_ROUNDS and AUTO_MAX_ROUNDS that stays within target_ms."""
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(AUTO_MIN_ROUNDS))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rounds = AUTO_MIN_ROUNDS
+    # Every extra round doubles the work
+    while rounds < AUTO_MAX_ROUNDS and elapsed_ms * 2 <= target_ms:
+        rounds += 1
+        elapsed_ms *= 2
+    logging.info(f"bcrypt cost {rounds} (~{elapsed_ms:.0f} ms per hash)")
+    return rounds
+
+
+def hash_rounds(hashed):
+    """Cost of a stored bcrypt hash ('$2b$12$...'), or None if it is not one."""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 rounds=PASSWORD_HASH_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._rounds = None if str(rounds).lower() == "auto" else int(rounds)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._tune_lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def rounds(self):
+        if self._rounds is None:
+            with self._tune_lock:
+                if self._rounds is None:
+                    self._rounds = tune_rounds()
+        return self._rounds
+
+    async def prepare(self):
+        """Settle the cost off the event loop ('auto' measures it), before the first login."""
+        await asyncio.get_running_loop().run_in_executor(self._get_pool(), lambda: self.rounds)
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._pool
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            raise HashQueueFull(f"{self._pending} password hashes already queued")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            self._pending -= 1
+
+    def _hash(self, password):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds)).decode()
+
+    async def hash(self, password):
+        return await self._run(self._hash, password)
+
+    async def verify(self, password, hashed):
+        return await self._run(bcrypt.checkpw, password.encode(), hashed.encode())
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher()
@@ -3,6 +3,9 @@ import re
 from datetime import datetime
 import logging
 
+# Bump whenever extraction output can change; cached results of other versions are ignored
+EXTRACTOR_VERSION = "3"
+
 MONTHS_DE = {
     'januar': '01', 'februar': '02', 'märz': '03', 'maerz': '03', 'april': '04', 'mai': '05', 'juni': '06',
     'juli': '07', 'august': '08', 'september': '09', 'oktober': '10', 'november': '11', 'dezember': '12'
@@ -106,34 +109,234 @@ def format_date_for_db(date_str):
     
     return date_str
 
-def extract_einkommensbescheinigung_fields(pdf_path):
-    results = {field: None for field in FIELDS}
-    results['monat'] = None
-    results['jahr'] = None
-    lines = []
+# Patterns used by the extractor, compiled once at import time
+MONEY_RE = re.compile(r'(\d{1,3}(?:\.\d{3})*,\d{2})')
+MONTH_YEAR_RE = re.compile(r'f[üu]r\s+([A-Za-zäöüÄÖÜ]+)\s+(\d{4})', re.IGNORECASE)
+EINTRITT_RE = re.compile(r'\d{6}')
+DIGIT_RE = re.compile(r'(\d)')
+PERSONAL_NR_RE = re.compile(r'(\d{5,})')
+SV_NUMMER_RE = re.compile(r'(\d{8,}[A-Z]\d{3})')
+STEUER_ID_RE = re.compile(r'(\d{11})')
+HAS_DIGIT_RE = re.compile(r'\d')
+LEADING_DIGIT_RE = re.compile(r'^\d')
+THOUSANDS_RE = re.compile(r'^\d{1,3}(?:\.\d{3})*$')
+GERMAN_AMOUNT_RE = re.compile(r'^\d{1,3}(?:\.\d{3})*,\d{2}$')
+DECIMAL_TAIL_RE = re.compile(r'^,\d{2}$')
+TWO_DIGITS_RE = re.compile(r'^\d{2}$')
+INTEGER_RE = re.compile(r'^\d+$')
+COMMA_DECIMAL_RE = re.compile(r'^\d+,\d+$')
+DOT_DECIMAL_RE = re.compile(r'^\d+\.\d+$')
+STREET_LINE_RE = re.compile(r'\b[A-Za-zäöüÄÖÜ]+straße\s+\d+|\b[A-Za-zäöüÄÖÜ]+str\.\s+\d+')
+STREET_RE = re.compile(r'([A-Za-zäöüÄÖÜ]+straße\s+\d+|[A-Za-zäöüÄÖÜ]+str\.\s+\d+)')
+PLZ_ORT_RE = re.compile(r'(\d{5})\s+([A-Za-zäöüÄÖÜß\s]+)')
+# Flexible label regexes to handle OCR spacing like 'B a nk' / 'K o nto'
+BANK_LABEL_RE = re.compile(r"b\s*a\s*n?\s*k", re.IGNORECASE)
+KONTO_LABEL_RE = re.compile(r"k\s*o\s*n\s*t\s*o", re.IGNORECASE)
+# Bank name: everything after the Bank label up to known terminators (Konto, SV-AG, Zus., Gesamtkosten, Auszahlungsbetrag) or EOL
+BANK_NAME_RE = re.compile(
+    r"(?:b\s*a\s*n?\s*k|bank)\s*[:\-]?\s*(.+?)\s*(?=(?:k\s*o\s*n\s*t\s*o|SV-AG|Zus\.|Gesamtkosten|Auszahlungsbetrag)|$)",
+    re.IGNORECASE,
+)
+KONTO_RE = re.compile(r"(?:k\s*o\s*n\s*t\s*o|konto)\s*[:\-]?\s*([A-Z0-9\s]+?)(?=\s+[A-Z]|$)", re.IGNORECASE)
+MULTI_SPACE_RE = re.compile(r"\s{2,}")
+WHITESPACE_RE = re.compile(r'\s+')
+# Full IBAN (DE30 8505 0300 1225 4209 34) and the partial form missing the last group
+IBAN_RE = re.compile(r'DE\d{2}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{2}')
+IBAN_PARTIAL_RE = re.compile(r'DE\d{2}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{4}')
+
+# Literal labels the field rules key on, mapped to their index key
+LABELS = {
+    'Eintritt': 'Eintritt',
+    'StKl': 'StKl',
+    'Steuerklasse': 'StKl',
+    'Krankenkasse': 'Krankenkasse',
+    'KK %': 'KK %',
+    'Betrag': 'Betrag',
+    'KV-Brutto': 'KV-Brutto',
+    'KV-Beitrag': 'Beitrag',
+    'RV-Beitrag': 'Beitrag',
+    'AV-Beitrag': 'Beitrag',
+    'PV-Beitrag': 'Beitrag',
+    'SV-rechtliche Abzüge': 'SV-Abzug',
+    'Netto-Verdiens': 'Netto',
+    'Personal-Nr': 'Personal-Nr',
+    'Pers.-Nr': 'Personal-Nr',
+    'Ki.Frbtr': 'Ki.Frbtr',
+    'SV-Nummer': 'SV-Nummer',
+    'Steuer-ID': 'Steuer-ID',
+}
+LABEL_RE = re.compile('|'.join(re.escape(label) for label in sorted(LABELS, key=len, reverse=True)))
+# Lines containing these are table rows/headers, never the employee address
+ADDRESS_SKIP_WORDS = ('personal-nr', 'geburtsdatum', 'stkl', 'krankenkasse', 'brutto', 'netto', 'betrag')
+# Table columns read by word position: header label -> words that must share the header row
+TABLE_COLUMNS = {
+    'Krankenkasse': ('KK',),
+    'Ki.Frbtr': (),
+    'Betrag': (),
+}
+# Words whose tops differ by at most this many points belong to the same row (as in extract_text)
+ROW_TOLERANCE = 3
+# Page spec per known document layout: a marker on the first page and, per field, the
+# last page (1-based) it can appear on. Fields not listed, and documents of unknown
+# layout, are looked for on every page until found.
+LAYOUTS = [
+    {
+        # DATEV Lohnabrechnung: every field is on the first page; combined PDFs repeat
+        # the same layout for further months, which the first-match rules never use.
+        'name': 'DATEV Lohnabrechnung',
+        'marker': re.compile(r'Personal-Nr\..*Geburtsdatum.*StKl'),
+        'field_pages': {field: 1 for field in FIELDS + ['monat', 'jahr']},
+    },
+    {
+        # Jobcenter Einkommensbescheinigung (SGB II, e.g. for Bürgergeld): sections 1-2
+        # (personal data, employment) are on the first page; the pages after it hold the
+        # monthly amounts table and the signature, which no field rule reads.
+        'name': 'Einkommensbescheinigung SGB II',
+        'marker': re.compile(r'Nachweis über die Höhe des Arbeitsentgelts'),
+        'field_pages': {field: 1 for field in FIELDS + ['monat', 'jahr']},
+    },
+]
+# Lines of the previous page the rules see again with the next one, so a label at the foot
+# of a page still finds its value at the top of the next (the address and bank rules look
+# up to 3 lines ahead)
+PAGE_CONTEXT_LINES = 3
+CONTRIBUTION_COLUMNS = (
+    'KV-Brutto', 'RV-Brutto', 'AV-Brutto', 'PV-Brutto',
+    'KV-Beitrag', 'RV-Beitrag', 'AV-Beitrag', 'PV-Beitrag',
+)
+
+
+def iter_pdf_pages(pdf_path):
+    """
+    Decode the PDF lazily, one page at a time: yields (text lines, word boxes) per page.
+    Word boxes are only extracted on pages containing one of the TABLE_COLUMNS headers.
+    """
     try:
         with pdfplumber.open(pdf_path) as pdf:
             for page in pdf.pages:
                 text = page.extract_text()
-                if text:
-                    lines.extend(text.split('\n'))
+                has_table = text and any(label in text for label in TABLE_COLUMNS)
+                yield (text.split('\n') if text else []), (page.extract_words() if has_table else [])
     except Exception as e:
         logging.error(f"PDF extraction error: {e}")
         raise RuntimeError(f"PDF extraction error: {str(e)}")
 
-    # Monat/Jahr extraction (look for 'für <Monat> <Jahr>' or 'f[üu]r <Monat> <Jahr>')
-    for line in lines:
-        match = re.search(r'f[üu]r\s+([A-Za-zäöüÄÖÜ]+)\s+(\d{4})', line, re.IGNORECASE)
-        if match:
-            month_str = match.group(1).lower().replace('ä', 'ae')
-            year_str = match.group(2)
-            month_num = MONTHS_DE.get(month_str)
-            if month_num:
-                results['monat'] = month_num
-            else:
-                results['monat'] = month_str  # fallback
-            results['jahr'] = year_str
-            break
+def read_pdf_document(pdf_path):
+    """Text lines of all pages plus the word boxes of each page."""
+    lines, page_words = [], []
+    for page_lines, words in iter_pdf_pages(pdf_path):
+        lines.extend(page_lines)
+        page_words.append(words)
+    return lines, page_words
+
+def read_pdf_lines(pdf_path):
+    return read_pdf_document(pdf_path)[0]
+
+def _cluster_rows(words):
+    rows = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if rows and word['top'] - rows[-1][0]['top'] <= ROW_TOLERANCE:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    return [sorted(row, key=lambda w: w['x0']) for row in rows]
+
+def _column_spans(header_row):
+    # Each header cell owns the space up to halfway to its neighbours
+    spans = []
+    for i, word in enumerate(header_row):
+        left = (header_row[i - 1]['x1'] + word['x0']) / 2 if i > 0 else float('-inf')
+        right = (word['x1'] + header_row[i + 1]['x0']) / 2 if i + 1 < len(header_row) else float('inf')
+        spans.append((left, right))
+    return spans
+
+def _overlap(word, span):
+    return min(word['x1'], span[1]) - max(word['x0'], span[0])
+
+def read_table_cells(page_words):
+    """
+    Locate the TABLE_COLUMNS headers by word position and read the cell in the row below.
+    A value word belongs to the header column it overlaps most, so empty cells stay empty
+    instead of picking up their neighbour's value. Returns {label: [cell text, ...]} in
+    document order; labels without a header are missing.
+    """
+    cells = {}
+    for words in page_words:
+        rows = _cluster_rows(words)
+        for row_idx, row in enumerate(rows[:-1]):
+            texts = {w['text'] for w in row}
+            spans = None
+            for col_idx, word in enumerate(row):
+                label = next((label for label in TABLE_COLUMNS if word['text'].startswith(label)), None)
+                if label is None or not all(required in texts for required in TABLE_COLUMNS[label]):
+                    continue
+                spans = spans or _column_spans(row)
+                cell = []
+                for value in rows[row_idx + 1]:
+                    overlaps = [_overlap(value, span) for span in spans]
+                    best = max(range(len(spans)), key=overlaps.__getitem__)
+                    if best == col_idx and overlaps[best] > 0:
+                        cell.append(value['text'])
+                cells.setdefault(label, []).append(' '.join(cell))
+    return cells
+
+def index_lines(lines):
+    """
+    Single pass over the text: returns {key: [line numbers]} for every label in LABELS
+    plus the pattern-based anchors 'monat', 'street', 'bank', 'konto' and 'iban'.
+    """
+    index = {key: [] for key in set(LABELS.values())}
+    index.update({'monat': [], 'street': [], 'bank': [], 'konto': [], 'iban': []})
+    for idx, line in enumerate(lines):
+        for key in {LABELS[label] for label in LABEL_RE.findall(line)}:
+            index[key].append(idx)
+        if not index['monat'] and MONTH_YEAR_RE.search(line):
+            index['monat'].append(idx)
+        if (not index['street'] and 'str' in line
+                and not any(word in line.lower() for word in ADDRESS_SKIP_WORDS)
+                and STREET_LINE_RE.search(line)):
+            index['street'].append(idx)
+        if BANK_LABEL_RE.search(line):
+            index['bank'].append(idx)
+        elif not index['konto'] and KONTO_LABEL_RE.search(line):
+            index['konto'].append(idx)
+        if not index['iban'] and 'DE' in line and IBAN_PARTIAL_RE.search(line):
+            index['iban'].append(idx)
+    return index
+
+def _next_line(lines, idx):
+    return lines[idx + 1] if idx + 1 < len(lines) else None
+
+def _first_match(lines, line_numbers, pattern, same_line=False):
+    """First match of pattern in the line after a label (or on the label line itself, if same_line)."""
+    for idx in line_numbers:
+        candidates = [lines[idx], _next_line(lines, idx)] if same_line else [_next_line(lines, idx)]
+        for candidate in candidates:
+            if candidate is None:
+                continue
+            match = pattern.search(candidate)
+            if match:
+                return match
+    return None
+
+def _column_index(header_cols, label, exact=True):
+    # Exact header column first, then the first column that contains the label
+    if exact and label in header_cols:
+        return header_cols.index(label)
+    return next((i for i, col in enumerate(header_cols) if label in col), None)
+
+def _strip_leading_labels(value_cols):
+    # Remove leading non-numeric columns (like 'L', 'E', etc.)
+    while value_cols and not HAS_DIGIT_RE.search(value_cols[0]):
+        value_cols = value_cols[1:]
+    return value_cols
+
+def _extract_monat_jahr(lines, index, results):
+    for idx in index['monat']:
+        match = MONTH_YEAR_RE.search(lines[idx])
+        month_str = match.group(1).lower().replace('ä', 'ae')
+        results['monat'] = MONTHS_DE.get(month_str) or month_str
+        results['jahr'] = match.group(2)
     # Fallback to current month/year if not found
     now = datetime.now()
     if not results['monat']:
@@ -141,532 +344,292 @@ def extract_einkommensbescheinigung_fields(pdf_path):
     if not results['jahr']:
         results['jahr'] = now.strftime("%Y")
 
-    # Eintritt (eintrittsdatum) - extract and format for DB
-    try:
-        for idx, line in enumerate(lines):
-            if 'Eintritt' in line and idx + 1 < len(lines):
-                match = re.search(r'\d{6}', lines[idx + 1])
-                if match:
-                    results['Eintritt'] = format_eintritt_date(match.group(0))
-                    break
-    except Exception as e:
-        logging.warning(f"Eintritt extraction failed: {e}")
-
-    # StKl (Steuerklasse) - extract from table
-    try:
-        for idx, line in enumerate(lines):
-            if 'StKl' in line or 'Steuerklasse' in line:
-                # Look for number in the same line or next line
-                match = re.search(r'(\d)', line)
-                if match:
-                    results['StKl'] = match.group(1)
-                    break
-                elif idx + 1 < len(lines):
-                    match = re.search(r'(\d)', lines[idx + 1])
-                    if match:
-                        results['StKl'] = match.group(1)
-                        break
-    except Exception as e:
-        logging.warning(f"StKl extraction failed: {e}")
-
-    # Krankenkasse (gesetzliche_krankenkasse) - extract from table
-    try:
-        for idx, line in enumerate(lines):
-            if 'Krankenkasse' in line and 'KK %' in line:
-                header_cols = line.strip().split()
-                try:
-                    kk_idx = header_cols.index('Krankenkasse')
-                except ValueError:
-                    kk_idx = None
-                    for i, col in enumerate(header_cols):
-                        if 'Krankenkasse' in col:
-                            kk_idx = i
-                            break
-                if kk_idx is not None and idx + 1 < len(lines):
-                    next_line = lines[idx + 1].strip().split()
-                    krankenkasse_words = []
-                    for word in next_line[kk_idx:]:
-                        if re.match(r'^\d', word):
-                            break
-                        krankenkasse_words.append(word)
-                    if krankenkasse_words:
-                        results['Krankenkasse'] = ' '.join(krankenkasse_words)
-                break
-    except Exception as e:
-        logging.warning(f"Krankenkasse extraction failed: {e}")
-
-    # Betrag (look for label, then next line)
-    try:
-        for idx, line in enumerate(lines):
-            if 'Betrag' in line:
-                # Look for number in the next line
-                if idx + 1 < len(lines):
-                    match = re.search(r'(\d{1,3}(?:\.\d{3})*,\d{2})', lines[idx + 1])
-                    if match:
-                        results['Betrag'] = normalize_german_number(match.group(1))
-                        break
-    except Exception as e:
-        logging.warning(f"Betrag extraction failed: {e}")
-
-    # KV-Brutto (improved logic for numbers with dot and split values)
-    try:
-        for idx, line in enumerate(lines):
-            if 'KV-Brutto' in line:
-                header_cols = line.strip().split()
-                try:
-                    kv_idx = header_cols.index('KV-Brutto')
-                except ValueError:
-                    kv_idx = None
-                    for i, col in enumerate(header_cols):
-                        if 'KV-Brutto' in col:
-                            kv_idx = i
-                            break
-                if kv_idx is not None and idx + 1 < len(lines):
-                    value_cols = lines[idx + 1].strip().split()
-                    # Remove leading non-numeric columns (like 'L', 'E', etc.)
-                    while value_cols and not re.search(r'\d', value_cols[0]):
-                        value_cols = value_cols[1:]
-                    # Try to join split numbers (e.g., 1.322 ,32)
-                    if len(value_cols) > kv_idx:
-                        val = value_cols[kv_idx]
-                        # If the value is split (e.g., 1.322 ,32), join with next col
-                        if re.match(r'^\d{1,3}(?:\.\d{3})*$', val) and kv_idx + 1 < len(value_cols) and re.match(r'^,\d{2}$', value_cols[kv_idx + 1]):
-                            val = val + value_cols[kv_idx + 1]
-                        elif re.match(r'^\d{1,3}(?:\.\d{3})*,\d{2}$', val):
-                            pass  # already in correct format
-                        elif kv_idx + 2 < len(value_cols) and value_cols[kv_idx + 1] == ',' and re.match(r'^\d{2}$', value_cols[kv_idx + 2]):
-                            val = val + ',' + value_cols[kv_idx + 2]
-                        elif kv_idx + 1 < len(value_cols) and re.match(r'^\d{2}$', value_cols[kv_idx + 1]):
-                            val = val + ',' + value_cols[kv_idx + 1]
-                        # Normalize and assign
-                        results['KV-Brutto'] = normalize_german_number(val)
-                break
-    except Exception as e:
-        logging.warning(f"KV-Brutto extraction failed: {e}")
-
-    # KV-Beitrag, RV-Beitrag, AV-Beitrag, PV-Beitrag extraction
-    try:
-        for idx, line in enumerate(lines):
-            if 'KV-Beitrag' in line or 'RV-Beitrag' in line or 'AV-Beitrag' in line or 'PV-Beitrag' in line:
-                logging.info(f"Found contribution headers in line: {line}")
-                header_cols = line.strip().split()
-                logging.info(f"Header columns: {header_cols}")
-
-                # Map header labels to their indices
-                header_index_map = {}
-                for i, col in enumerate(header_cols):
-                    if 'KV-Brutto' in col:
-                        header_index_map['KV-Brutto'] = i
-                    if 'RV-Brutto' in col:
-                        header_index_map['RV-Brutto'] = i
-                    if 'AV-Brutto' in col:
-                        header_index_map['AV-Brutto'] = i
-                    if 'PV-Brutto' in col:
-                        header_index_map['PV-Brutto'] = i
-                    if 'KV-Beitrag' in col:
-                        header_index_map['KV-Beitrag'] = i
-                    if 'RV-Beitrag' in col:
-                        header_index_map['RV-Beitrag'] = i
-                    if 'AV-Beitrag' in col:
-                        header_index_map['AV-Beitrag'] = i
-                    if 'PV-Beitrag' in col:
-                        header_index_map['PV-Beitrag'] = i
-
-                logging.info(f"Header index map: {header_index_map}")
-
-                # Determine the first real data column in the header (aligns with first numeric in value row)
-                possible_starts = [
-                    header_index_map.get('KV-Brutto'), header_index_map.get('RV-Brutto'),
-                    header_index_map.get('AV-Brutto'), header_index_map.get('PV-Brutto'),
-                    header_index_map.get('KV-Beitrag'), header_index_map.get('RV-Beitrag'),
-                    header_index_map.get('AV-Beitrag'), header_index_map.get('PV-Beitrag'),
-                ]
-                possible_starts = [x for x in possible_starts if x is not None]
-                if not possible_starts:
+def _extract_eintritt(lines, index, results):
+    match = _first_match(lines, index['Eintritt'], EINTRITT_RE)
+    if match:
+        results['Eintritt'] = format_eintritt_date(match.group(0))
+
+def _extract_stkl(lines, index, results):
+    match = _first_match(lines, index['StKl'], DIGIT_RE, same_line=True)
+    if match:
+        results['StKl'] = match.group(1)
+
+def _krankenkasse_name(words):
+    # The cell can run into the numeric KK % column; the name ends at the first number
+    name = []
+    for word in words:
+        if LEADING_DIGIT_RE.match(word):
+            break
+        name.append(word)
+    return ' '.join(name) or None
+
+def _extract_krankenkasse(lines, index, results):
+    if 'Krankenkasse' in index['cells']:
+        results['Krankenkasse'] = _krankenkasse_name(index['cells']['Krankenkasse'][0].split())
+        return
+    header_lines = sorted(set(index['Krankenkasse']) & set(index['KK %']))
+    if not header_lines:
+        return
+    idx = header_lines[0]
+    header_cols = lines[idx].strip().split()
+    kk_idx = _column_index(header_cols, 'Krankenkasse')
+    if kk_idx is not None and idx + 1 < len(lines):
+        results['Krankenkasse'] = _krankenkasse_name(lines[idx + 1].strip().split()[kk_idx:])
+
+def _extract_amount(label):
+    def rule(lines, index, results):
+        match = _first_match(lines, index[label], MONEY_RE)
+        if match:
+            results[label] = normalize_german_number(match.group(1))
+    rule.__name__ = f"_extract_{label}"
+    return rule
+
+def _extract_betrag(lines, index, results):
+    if 'Betrag' in index['cells']:
+        match = next((MONEY_RE.search(cell) for cell in index['cells']['Betrag'] if MONEY_RE.search(cell)), None)
+        results['Betrag'] = normalize_german_number(match.group(1)) if match else None
+        return
+    _extract_amount('Betrag')(lines, index, results)
+
+def _extract_kv_brutto(lines, index, results):
+    if not index['KV-Brutto']:
+        return
+    idx = index['KV-Brutto'][0]
+    header_cols = lines[idx].strip().split()
+    kv_idx = _column_index(header_cols, 'KV-Brutto')
+    if kv_idx is None or idx + 1 >= len(lines):
+        return
+    value_cols = _strip_leading_labels(lines[idx + 1].strip().split())
+    if len(value_cols) <= kv_idx:
+        return
+    val = value_cols[kv_idx]
+    # Join values split by the text layer (e.g. '1.322 ,32', '1.322 , 32', '1.322 32')
+    if THOUSANDS_RE.match(val) and kv_idx + 1 < len(value_cols) and DECIMAL_TAIL_RE.match(value_cols[kv_idx + 1]):
+        val = val + value_cols[kv_idx + 1]
+    elif GERMAN_AMOUNT_RE.match(val):
+        pass
+    elif kv_idx + 2 < len(value_cols) and value_cols[kv_idx + 1] == ',' and TWO_DIGITS_RE.match(value_cols[kv_idx + 2]):
+        val = val + ',' + value_cols[kv_idx + 2]
+    elif kv_idx + 1 < len(value_cols) and TWO_DIGITS_RE.match(value_cols[kv_idx + 1]):
+        val = val + ',' + value_cols[kv_idx + 1]
+    results['KV-Brutto'] = normalize_german_number(val)
+
+def _extract_beitraege(lines, index, results):
+    for idx in index['Beitrag']:
+        header_cols = lines[idx].strip().split()
+        header_index_map = {}
+        for i, col in enumerate(header_cols):
+            for label in CONTRIBUTION_COLUMNS:
+                if label in col:
+                    header_index_map[label] = i
+        if not header_index_map:
+            continue
+        # The first data column in the header aligns with the first numeric value in the row below
+        start_idx = min(header_index_map.values())
+        if idx + 1 < len(lines):
+            value_cols = _strip_leading_labels(lines[idx + 1].strip().split())
+            for label in ('KV-Beitrag', 'RV-Beitrag', 'AV-Beitrag', 'PV-Beitrag'):
+                if label not in header_index_map:
                     continue
-                start_idx = min(possible_starts)
-                logging.info(f"Detected start index for numeric data: {start_idx}")
-
-                if idx + 1 < len(lines):
-                    value_line = lines[idx + 1]
-                    logging.info(f"Value line: {value_line}")
-                    value_cols = value_line.strip().split()
-                    logging.info(f"Raw value columns: {value_cols}")
-
-                    # Remove leading non-numeric columns (like 'L', 'E', etc.)
-                    while value_cols and not re.search(r'\d', value_cols[0]):
-                        value_cols = value_cols[1:]
-                    logging.info(f"Value columns after cleanup: {value_cols}")
-
-                    def read_value_for(label: str):
-                        if label not in header_index_map:
-                            return None
-                        rel_index = header_index_map[label] - start_idx
-                        if rel_index < 0 or rel_index >= len(value_cols):
-                            logging.info(f"Relative index {rel_index} out of range for label {label}")
-                            return None
-                        val = value_cols[rel_index]
-                        # Join split decimals like ['28', ',39']
-                        if re.match(r'^\d+$', val) and rel_index + 1 < len(value_cols) and re.match(r'^,\d{2}$', value_cols[rel_index + 1]):
-                            val = val + value_cols[rel_index + 1]
-                        # Remove possible 'E' marker adjacent to value (e.g. 'E' column before value)
-                        val = val.strip()
-                        if val.upper() == 'E' and rel_index + 1 < len(value_cols):
-                            val = value_cols[rel_index + 1]
-                        # Normalize numbers that are like 2839 → 28,39
-                        return normalize_german_number(val)
-
-                    kvb = read_value_for('KV-Beitrag')
-                    rvb = read_value_for('RV-Beitrag')
-                    avb = read_value_for('AV-Beitrag')
-                    pvb = read_value_for('PV-Beitrag')
-
-                    if kvb is not None:
-                        results['KV-Beitrag'] = kvb
-                        logging.info(f"Extracted KV-Beitrag: {kvb}")
-                    if rvb is not None:
-                        results['RV-Beitrag'] = rvb
-                        logging.info(f"Extracted RV-Beitrag: {rvb}")
-                    if avb is not None:
-                        results['AV-Beitrag'] = avb
-                        logging.info(f"Extracted AV-Beitrag: {avb}")
-                    if pvb is not None:
-                        results['PV-Beitrag'] = pvb
-                        logging.info(f"Extracted PV-Beitrag: {pvb}")
-                break
-    except Exception as e:
-        logging.warning(f"Contribution extraction failed: {e}")
-
-    # SV-Abzug (look for label, then next line)
-    try:
-        for idx, line in enumerate(lines):
-            if 'SV-rechtliche Abzüge' in line:
-                if idx + 1 < len(lines):
-                    match = re.search(r'(\d{1,3}(?:\.\d{3})*,\d{2})', lines[idx + 1])
-                    if match:
-                        results['SV-Abzug'] = normalize_german_number(match.group(1))
-                        break
-    except Exception as e:
-        logging.warning(f"SV-Abzug extraction failed: {e}")
-
-    # Netto (look for label, then next line)
-    try:
-        for idx, line in enumerate(lines):
-            if 'Netto-Verdienst' in line or 'Netto-Verdiens' in line:
-                if idx + 1 < len(lines):
-                    match = re.search(r'(\d{1,3}(?:\.\d{3})*,\d{2})', lines[idx + 1])
-                    if match:
-                        results['Netto'] = normalize_german_number(match.group(1))
-                        break
-    except Exception as e:
-        logging.warning(f"Netto extraction failed: {e}")
-
-    # Personal-Nr (arbeitnehmernummer) - extract from PDF
-    try:
-        for idx, line in enumerate(lines):
-            if 'Personal-Nr' in line or 'Pers.-Nr' in line:
-                # Look for number in the same line or next line
-                match = re.search(r'(\d{5,})', line)
-                if match:
-                    results['Personal-Nr'] = match.group(1)
-                    break
-                elif idx + 1 < len(lines):
-                    match = re.search(r'(\d{5,})', lines[idx + 1])
-                    if match:
-                        results['Personal-Nr'] = match.group(1)
-                        break
-    except Exception as e:
-        logging.warning(f"Personal-Nr extraction failed: {e}")
-
-    # Ki.Frbtr (kinderfreibetraege) - extract from PDF using table-aware logic
-    try:
-        for idx, line in enumerate(lines):
-            if 'Ki.Frbtr' in line or 'Ki.Frbtr.' in line:
-                logging.info(f"Found Ki.Frbtr header in line: {line}")
-                
-                # IMPROVED APPROACH: Use column-based positioning with better alignment
-                header_cols = line.strip().split()
-                logging.info(f"Header columns: {header_cols}")
-                
-                # Find the index of Ki.Frbtr in the header
-                kifrbtr_idx = None
-                for i, col in enumerate(header_cols):
-                    if 'Ki.Frbtr' in col:
-                        kifrbtr_idx = i
-                        logging.info(f"Ki.Frbtr found at column index: {kifrbtr_idx}")
-                        break
-                
-                if kifrbtr_idx is not None and idx + 1 < len(lines):
-                    value_line = lines[idx + 1]
-                    logging.info(f"Value line: {value_line}")
-                    value_cols = value_line.strip().split()
-                    logging.info(f"Value columns: {value_cols}")
-                    
-                    # Check if value line has enough columns (Ki.Frbtr is typically at position 3-4)
-                    if len(value_cols) <= 4:
-                        logging.info(f"Value line has only {len(value_cols)} columns, Ki.Frbtr column likely missing - setting to null")
-                        val = None
-                    else:
-                        # IMPROVED: Handle empty spaces in columns by using more robust alignment
-                        # If the value columns don't align properly, try to find the Ki.Frbtr value by position
-                        if len(value_cols) > kifrbtr_idx:
-                            val = value_cols[kifrbtr_idx]
-                            logging.info(f"Ki.Frbtr column value: '{val}'")
-                            
-                            # Check if the value is empty or just whitespace
-                            if not val or not val.strip():
-                                logging.info("Ki.Frbtr column is empty, trying alternative method...")
-                                # Find all numbers in the value line
-                                number_matches = re.findall(r'\b(\d+)\b', value_line)
-                                logging.info(f"All numbers found: {number_matches}")
-                                
-                                # Look for numbers that are likely Ki.Frbtr values (small numbers, not dates or IDs)
-                                for num in number_matches:
-                                    num_val = int(num)
-                                    # Ki.Frbtr is typically 0-10 range, not dates or IDs
-                                    if 0 < num_val <= 10:
-                                        results['Ki.Frbtr'] = f"{num_val / 10:.1f}"
-                                        logging.info(f"Ki.Frbtr FINAL extracted (alternative): {results['Ki.Frbtr']}")
-                                        break
-                                else:
-                                    logging.info("No suitable Ki.Frbtr value found in alternative method")
-                                    val = None
-                        else:
-                            logging.info(f"Ki.Frbtr column index {kifrbtr_idx} is out of range for value columns {len(value_cols)}")
-                            val = None
-                    
-                    # ONLY process if it's a valid number and not empty
-                    if val and val.strip():
-                        # Check for comma-separated decimal (e.g., 0,5)
-                        if re.match(r'^\d+,\d+$', val.strip()):
-                            results['Ki.Frbtr'] = val.replace(',', '.')
-                            logging.info(f"Ki.Frbtr FINAL extracted (comma): {results['Ki.Frbtr']}")
-                        # Check for dot-separated decimal (e.g., 0.5)
-                        elif re.match(r'^\d+\.\d+$', val.strip()):
-                            results['Ki.Frbtr'] = val
-                            logging.info(f"Ki.Frbtr FINAL extracted (dot): {results['Ki.Frbtr']}")
-                        # Check for plain number (e.g., 05 -> 0.5)
-                        elif re.match(r'^\d+$', val.strip()):
-                            num_val = int(val)
-                            if num_val < 100:
-                                results['Ki.Frbtr'] = f"{num_val / 10:.1f}"
-                            else:
-                                results['Ki.Frbtr'] = val
-                            logging.info(f"Ki.Frbtr FINAL extracted (number): {results['Ki.Frbtr']}")
-                        else:
-                            logging.info(f"Ki.Frbtr value '{val}' is not a valid number format, NOT setting anything")
-                    else:
-                        logging.info(f"Ki.Frbtr value '{val}' is empty, NOT setting anything")
-                else:
-                    logging.info(f"Ki.Frbtr column index {kifrbtr_idx} is out of range for value columns {len(value_cols)}")
-                    # Don't use fallback method - if column alignment fails, don't extract anything
-                    logging.info("Column alignment failed, NOT extracting Ki.Frbtr to avoid cross-contamination")
-                break
-    except Exception as e:
-        logging.warning(f"Ki.Frbtr extraction failed: {e}")
-
-    # SV-Nummer (versicherungsnummer) - extract from PDF
-    try:
-        for idx, line in enumerate(lines):
-            if 'SV-Nummer' in line:
-                # Look for SV-Nummer pattern (e.g., 09130389K613)
-                match = re.search(r'(\d{8,}[A-Z]\d{3})', line)
-                if match:
-                    results['SV-Nummer'] = match.group(1)
-                    break
-                elif idx + 1 < len(lines):
-                    match = re.search(r'(\d{8,}[A-Z]\d{3})', lines[idx + 1])
-                    if match:
-                        results['SV-Nummer'] = match.group(1)
-                        break
-    except Exception as e:
-        logging.warning(f"SV-Nummer extraction failed: {e}")
+                rel_index = header_index_map[label] - start_idx
+                if rel_index < 0 or rel_index >= len(value_cols):
+                    continue
+                val = value_cols[rel_index]
+                # Join split decimals like ['28', ',39']
+                if INTEGER_RE.match(val) and rel_index + 1 < len(value_cols) and DECIMAL_TAIL_RE.match(value_cols[rel_index + 1]):
+                    val = val + value_cols[rel_index + 1]
+                val = val.strip()
+                # Skip an 'E' marker column in front of the value
+                if val.upper() == 'E' and rel_index + 1 < len(value_cols):
+                    val = value_cols[rel_index + 1]
+                results[label] = normalize_german_number(val)
+        break
+
+def _extract_personal_nr(lines, index, results):
+    match = _first_match(lines, index['Personal-Nr'], PERSONAL_NR_RE, same_line=True)
+    if match:
+        results['Personal-Nr'] = match.group(1)
+
+def _parse_ki_frbtr(val):
+    if COMMA_DECIMAL_RE.match(val):
+        return val.replace(',', '.')
+    if DOT_DECIMAL_RE.match(val):
+        return val
+    if INTEGER_RE.match(val):
+        # Plain number, e.g. 05 -> 0.5
+        num_val = int(val)
+        return f"{num_val / 10:.1f}" if num_val < 100 else val
+    logging.info(f"Ki.Frbtr value '{val}' is not a valid number format, NOT setting anything")
+    return None
 
-    # Steuer-ID (identifikationsnummer) - extract from PDF
-    try:
-        for idx, line in enumerate(lines):
-            if 'Steuer-ID' in line:
-                # Look for Steuer-ID pattern (e.g., 45476214031)
-                match = re.search(r'(\d{11})', line)
-                if match:
-                    results['Steuer-ID'] = match.group(1)
-                    break
-                elif idx + 1 < len(lines):
-                    match = re.search(r'(\d{11})', lines[idx + 1])
-                    if match:
-                        results['Steuer-ID'] = match.group(1)
+def _extract_ki_frbtr(lines, index, results):
+    if 'Ki.Frbtr' in index['cells']:
+        # Positional read: an empty cell means no Kinderfreibetrag
+        val = index['cells']['Ki.Frbtr'][0]
+        results['Ki.Frbtr'] = _parse_ki_frbtr(val) if val else None
+        return
+    if not index['Ki.Frbtr']:
+        return
+    idx = index['Ki.Frbtr'][0]
+    header_cols = lines[idx].strip().split()
+    kifrbtr_idx = _column_index(header_cols, 'Ki.Frbtr', exact=False)
+    if kifrbtr_idx is None or idx + 1 >= len(lines):
+        return
+    value_cols = lines[idx + 1].strip().split()
+    # Ki.Frbtr is typically at position 3-4; a short row means the column is empty.
+    # If the columns don't line up, nothing is extracted to avoid cross-contamination.
+    if len(value_cols) <= 4 or len(value_cols) <= kifrbtr_idx:
+        logging.info("Ki.Frbtr column empty or not aligned - leaving it null")
+        return
+    results['Ki.Frbtr'] = _parse_ki_frbtr(value_cols[kifrbtr_idx])
+
+def _extract_sv_nummer(lines, index, results):
+    match = _first_match(lines, index['SV-Nummer'], SV_NUMMER_RE, same_line=True)
+    if match:
+        results['SV-Nummer'] = match.group(1)
+
+def _extract_steuer_id(lines, index, results):
+    match = _first_match(lines, index['Steuer-ID'], STEUER_ID_RE, same_line=True)
+    if match:
+        results['Steuer-ID'] = match.group(1)
+
+def _extract_address(lines, index, results):
+    if not index['street']:
+        return
+    idx = index['street'][0]
+    street_match = STREET_RE.search(lines[idx])
+    if street_match:
+        results['strasse_hausnummer'] = street_match.group(1).strip()
+    # PLZ and city on the same line or the next one
+    plz_city_match = PLZ_ORT_RE.search(lines[idx])
+    if not plz_city_match and idx + 1 < len(lines):
+        plz_city_match = PLZ_ORT_RE.search(lines[idx + 1])
+    if plz_city_match:
+        results['plz_ort'] = f"{plz_city_match.group(1)} {plz_city_match.group(2).strip()}"
+
+def _match_bank_name(line):
+    match = BANK_NAME_RE.search(line)
+    return MULTI_SPACE_RE.sub(" ", match.group(1).strip()) if match else None
+
+def _match_konto(line):
+    match = KONTO_RE.search(line)
+    return WHITESPACE_RE.sub(' ', match.group(1).strip()).strip() if match else None
+
+def _extract_bank_konto(lines, index, results):
+    anchors = index['bank'][:1] + index['konto']
+    if anchors:
+        idx = min(anchors)
+        if index['bank'] and idx == index['bank'][0]:
+            bank_name = _match_bank_name(lines[idx])
+            if bank_name:
+                results['Bank'] = bank_name
+            konto = _match_konto(lines[idx])
+            if konto is not None:
+                results['Konto'] = konto
+            # If Konto not found, check next few lines
+            if not results.get('Konto'):
+                for next_line in lines[idx + 1:idx + 4]:
+                    konto = _match_konto(next_line)
+                    if konto is not None:
+                        results['Konto'] = konto
                         break
-    except Exception as e:
-        logging.warning(f"Steuer-ID extraction failed: {e}")
+        else:
+            results['Konto'] = _match_konto(lines[idx])
 
-    # Address extraction - strasse_hausnummer and plz_ort
-    try:
-        # Look for address lines after employee name
-        for idx, line in enumerate(lines):
-            # Skip lines that are likely headers or table data
-            if any(header in line.lower() for header in ['personal-nr', 'geburtsdatum', 'stkl', 'krankenkasse', 'brutto', 'netto', 'betrag']):
-                continue
-            
-            # Look for lines that contain street patterns (German street names)
-            if re.search(r'\b[A-Za-zäöüÄÖÜ]+straße\s+\d+', line) or re.search(r'\b[A-Za-zäöüÄÖÜ]+str\.\s+\d+', line):
-                logging.info(f"Found potential street line: {line}")
-                # Extract street and house number
-                street_match = re.search(r'([A-Za-zäöüÄÖÜ]+straße\s+\d+|[A-Za-zäöüÄÖÜ]+str\.\s+\d+)', line)
-                if street_match:
-                    results['strasse_hausnummer'] = street_match.group(1).strip()
-                    logging.info(f"Extracted strasse_hausnummer: {results['strasse_hausnummer']}")
-                
-                # Look for PLZ and city in the same line or next line
-                plz_city_match = re.search(r'(\d{5})\s+([A-Za-zäöüÄÖÜß\s]+)', line)
-                if plz_city_match:
-                    plz = plz_city_match.group(1)
-                    city = plz_city_match.group(2).strip()
-                    logging.info(f"PLZ match found: '{plz_city_match.group(0)}'")
-                    logging.info(f"PLZ: '{plz}', City: '{city}'")
-                    results['plz_ort'] = f"{plz} {city}"
-                    logging.info(f"Extracted plz_ort: {results['plz_ort']}")
-                elif idx + 1 < len(lines):
-                    # Try next line for PLZ and city
-                    next_line = lines[idx + 1]
-                    logging.info(f"Checking next line for PLZ: '{next_line}'")
-                    plz_city_match = re.search(r'(\d{5})\s+([A-Za-zäöüÄÖÜß\s]+)', next_line)
-                    if plz_city_match:
-                        plz = plz_city_match.group(1)
-                        city = plz_city_match.group(2).strip()
-                        logging.info(f"PLZ match found in next line: '{plz_city_match.group(0)}'")
-                        logging.info(f"PLZ: '{plz}', City: '{city}'")
-                        results['plz_ort'] = f"{plz} {city}"
-                        logging.info(f"Extracted plz_ort from next line: {results['plz_ort']}")
-                break
-    except Exception as e:
-        logging.warning(f"Address extraction failed: {e}")
+    # Fallback: IBAN anywhere in the document
+    if not results.get('Konto') and index['iban']:
+        line = lines[index['iban'][0]]
+        results['Konto'] = (IBAN_RE.search(line) or IBAN_PARTIAL_RE.search(line)).group(0)
 
-    # Bank and Konto extraction
-    try:
-        # Search through all lines more thoroughly
-        for idx, line in enumerate(lines):
-            logging.info(f"Checking line {idx}: {line}")
-            
-            # Define flexible label regexes to handle OCR spacing like 'B a nk' / 'K o nto'
-            bank_label_regex = re.compile(r"b\s*a\s*n?\s*k", re.IGNORECASE)
-            konto_label_regex = re.compile(r"k\s*o\s*n\s*t\s*o", re.IGNORECASE)
-            
-            # Look for Bank label robustly
-            if bank_label_regex.search(line):
-                logging.info(f"Found Bank label in line: {line}")
-                
-                # Extract bank name: everything after the Bank label up to known terminators or EOL
-                # Known terminators: Konto, SV-AG, Zus., Gesamtkosten, Auszahlungsbetrag
-                bank_name_match = re.search(
-                    r"(?:b\s*a\s*n?\s*k|bank)\s*[:\-]?\s*(.+?)\s*(?=(?:k\s*o\s*n\s*t\s*o|SV-AG|Zus\.|Gesamtkosten|Auszahlungsbetrag)|$)",
-                    line,
-                    re.IGNORECASE,
-                )
-                if bank_name_match:
-                    bank_name = bank_name_match.group(1).strip()
-                    # Collapse multiple spaces
-                    bank_name = re.sub(r"\s{2,}", " ", bank_name)
-                    if bank_name:
-                        results['Bank'] = bank_name
-                        logging.info(f"Extracted Bank: {results['Bank']}")
-                else:
-                    logging.info("No bank name matched with robust pattern; will continue to search next lines if needed")
-                
-                # Look for Konto in the same line or next few lines
-                konto_match = re.search(r"(?:k\s*o\s*n\s*t\s*o|konto)\s*[:\-]?\s*([A-Z0-9\s]+?)(?=\s+[A-Z]|$)", line, re.IGNORECASE)
-                if konto_match:
-                    konto = konto_match.group(1).strip()
-                    # Clean up the IBAN by removing extra spaces and ensuring it's complete
-                    konto = re.sub(r'\s+', ' ', konto).strip()
-                    results['Konto'] = konto
-                    logging.info(f"Extracted Konto from same line: {results['Konto']}")
-                else:
-                    logging.info("No konto match found in same line")
-                
-                # If Konto not found, check next few lines
-                if not results.get('Konto'):
-                    for next_idx in range(idx + 1, min(idx + 4, len(lines))):
-                        next_line = lines[next_idx]
-                        logging.info(f"Checking line {next_idx} for Konto: '{next_line}'")
-                        konto_match = re.search(r"(?:k\s*o\s*n\s*t\s*o|konto)\s*[:\-]?\s*([A-Z0-9\s]+?)(?=\s+[A-Z]|$)", next_line, re.IGNORECASE)
-                        if konto_match:
-                            konto = konto_match.group(1).strip()
-                            # Clean up the IBAN by removing extra spaces and ensuring it's complete
-                            konto = re.sub(r'\s+', ' ', konto).strip()
-                            results['Konto'] = konto
-                            logging.info(f"Extracted Konto from line {next_idx}: {results['Konto']}")
-                            break
-                        else:
-                            logging.info(f"No konto match found in line {next_idx}")
-                break
-            
-            # Also look for Konto if Bank wasn't found
-            elif konto_label_regex.search(line):
-                logging.info(f"Found Konto label in line: {line}")
-                konto_match = re.search(r"(?:k\s*o\s*n\s*t\s*o|konto)\s*[:\-]?\s*([A-Z0-9\s]+?)(?=\s+[A-Z]|$)", line, re.IGNORECASE)
-                if konto_match:
-                    konto = konto_match.group(1).strip()
-                    # Clean up the IBAN by removing extra spaces and ensuring it's complete
-                    konto = re.sub(r'\s+', ' ', konto).strip()
-                    results['Konto'] = konto
-                    logging.info(f"Extracted Konto: {results['Konto']}")
-                else:
-                    logging.info("No konto match found with current patterns")
+    # Fallback: first Bank label followed by a usable name
+    if not results.get('Bank'):
+        for idx in index['bank']:
+            bank_name = _match_bank_name(lines[idx])
+            if bank_name and len(bank_name) > 2:
+                results['Bank'] = bank_name
                 break
-        else:
-            logging.info("No Bank or Konto lines found in primary search")
-    except Exception as e:
-        logging.warning(f"Bank/Konto extraction failed: {e}")
 
-    # Fallback: Look for IBAN pattern if Bank/Konto extraction failed
-    if not results.get('Konto'):
-        logging.info("Trying fallback IBAN extraction...")
-        try:
-            for idx, line in enumerate(lines):
-                # Look for IBAN pattern (DE followed by 2 digits, then 4 groups of 4 digits)
-                # This pattern matches the full IBAN: DE30 8505 0300 1225 4209 34
-                iban_match = re.search(r'DE\d{2}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{2}', line)
-                if iban_match:
-                    konto = iban_match.group(0)
-                    results['Konto'] = konto
-                    logging.info(f"Extracted IBAN via fallback: {results['Konto']}")
-                    break
-                # Also try a more flexible pattern that might catch partial IBANs
-                iban_match = re.search(r'DE\d{2}\s+\d{4}\s+\d{4}\s+\d{4}\s+\d{4}', line)
-                if iban_match:
-                    konto = iban_match.group(0)
-                    results['Konto'] = konto
-                    logging.info(f"Extracted partial IBAN via fallback: {results['Konto']}")
-                    break
-        except Exception as e:
-            logging.warning(f"Fallback IBAN extraction failed: {e}")
+# Field rules in dispatch order; each reads the shared line index and fills results
+FIELD_RULES = [
+    _extract_monat_jahr,
+    _extract_eintritt,
+    _extract_stkl,
+    _extract_krankenkasse,
+    _extract_betrag,
+    _extract_kv_brutto,
+    _extract_beitraege,
+    _extract_amount('SV-Abzug'),
+    _extract_amount('Netto'),
+    _extract_personal_nr,
+    _extract_ki_frbtr,
+    _extract_sv_nummer,
+    _extract_steuer_id,
+    _extract_address,
+    _extract_bank_konto,
+]
 
-    # Fallback: Look for Bank name if Bank extraction failed
-    if not results.get('Bank'):
-        logging.info("Trying fallback Bank extraction...")
+def _apply_rules(lines, page_words):
+    results = {field: None for field in FIELDS}
+    results['monat'] = None
+    results['jahr'] = None
+    index = index_lines(lines)
+    index['cells'] = read_table_cells(page_words or [])
+    for rule in FIELD_RULES:
         try:
-            for idx, line in enumerate(lines):
-                if bank_label_regex.search(line):
-                    logging.info(f"Found Bank label in fallback: {line}")
-                    bank_name_match = re.search(
-                        r"(?:b\s*a\s*n?\s*k|bank)\s*[:\-]?\s*(.+?)\s*(?=(?:k\s*o\s*n\s*t\s*o|SV-AG|Zus\.|Gesamtkosten|Auszahlungsbetrag)|$)",
-                        line,
-                        re.IGNORECASE,
-                    )
-                    if bank_name_match:
-                        bank_name = bank_name_match.group(1).strip()
-                        bank_name = re.sub(r"\s{2,}", " ", bank_name)
-                        if bank_name and len(bank_name) > 2:
-                            results['Bank'] = bank_name
-                            logging.info(f"Extracted Bank via fallback: {results['Bank']}")
-                            break
-                    else:
-                        logging.info("Bank regex pattern didn't match in fallback")
+            rule(lines, index, results)
         except Exception as e:
-            logging.warning(f"Fallback Bank extraction failed: {e}")
+            logging.warning(f"{rule.__name__} failed: {e}")
+    return results, index
 
-    # Final logging to show what was extracted
-    logging.info(f"FINAL Ki.Frbtr result: {results.get('Ki.Frbtr')}")
-    logging.info(f"FINAL Ki.Frbtr type: {type(results.get('Ki.Frbtr'))}")
+def extract_fields_from_lines(lines, page_words=None):
+    """
+    Run the field rules on the text lines. With page_words (from read_pdf_document) the
+    table columns are read by word position; without, the line heuristics are used.
+    """
+    results, _ = _apply_rules(lines, page_words)
+    logging.info(f"Extracted payslip fields: {results}")
+    return results
+
+def _field_pages(first_page_lines):
+    text = '\n'.join(first_page_lines)
+    for layout in LAYOUTS:
+        if layout['marker'].search(text):
+            logging.info(f"Detected layout: {layout['name']}")
+            return layout['field_pages']
+    return {}
+
+def _unresolved_fields(results, index):
+    # monat/jahr are always filled (current month fallback), so check whether the text had them
+    missing = [field for field in FIELDS if results[field] is None]
+    if not index['monat']:
+        missing += ['monat', 'jahr']
+    return missing
 
-    return results 
\ No newline at end of file
+def extract_einkommensbescheinigung_fields(pdf_path):
+    """
+    Decode pages one at a time and stop as soon as every field is found or the layout's
+    page spec says none of the missing fields can appear on a later page. The rules run on
+    each new page only (plus the last PAGE_CONTEXT_LINES of the page before); a field keeps
+    the value from the first page that resolved it, as with the rules on the whole text.
+    """
+    results, _ = _apply_rules([], [])
+    found, context, field_pages = {}, [], {}
+    for page_no, (page_lines, words) in enumerate(iter_pdf_pages(pdf_path), start=1):
+        if page_no == 1:
+            field_pages = _field_pages(page_lines)
+        page_results, index = _apply_rules(context + page_lines, [words])
+        unresolved = _unresolved_fields(page_results, index)
+        for field in FIELDS + ['monat', 'jahr']:
+            if field not in unresolved:
+                found.setdefault(field, page_results[field])
+        context = page_lines[-PAGE_CONTEXT_LINES:]
+        pending = [
+            field for field in FIELDS + ['monat', 'jahr']
+            if field not in found and (field_pages.get(field) is None or field_pages[field] > page_no)
+        ]
+        if not pending:
+            logging.info(f"All resolvable fields found after page {page_no}, skipping the rest")
+            break
+    results.update(found)
+    logging.info(f"Extracted payslip fields: {results}")
+    return results
@@ -0,0 +1,66 @@
+"""
+Compiled AcroForm templates.
+
+A PdfFormTemplate parses its PDF once (all objects resolved up front) and indexes the
+top-level form fields by name: their position in /AcroForm /Fields and their /Opt
+export values, plus the pages that carry widgets. Each fill clones the parsed document
+and looks fields up through the index instead of walking the field tree.
+"""
+import io
+import logging
+import threading
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+
+class PdfFormTemplate:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._reader = PdfReader(io.BytesIO(f.read()))
+        # Cloning reads from the shared reader; keep concurrent fills from interleaving
+        self._lock = threading.Lock()
+        self.positions = {}  # field name -> positions in /AcroForm /Fields
+        self.options = {}    # field name -> /Opt export values
+        acroform = self._reader.trailer["/Root"].get("/AcroForm")
+        if acroform is not None:
+            for position, ref in enumerate(acroform.get("/Fields", [])):
+                field = ref.get_object()
+                name = field.get("/T")
+                self.positions.setdefault(name, []).append(position)
+                if "/Opt" in field:
+                    self.options[name] = list(field["/Opt"])
+        self.form_pages = [i for i, page in enumerate(self._reader.pages) if page.get("/Annots")]
+        # Resolve every object now so later clones never parse the file again
+        self.new_writer()
+
+    def new_writer(self):
+        writer = PdfWriter()
+        with self._lock:
+            writer.clone_document_from_reader(self._reader)
+        return writer
+
+    def fields(self, writer, name):
+        """The top-level field objects called name in a writer created by new_writer()."""
+        positions = self.positions.get(name)
+        if not positions:
+            return []
+        fields = writer._root_object[NameObject("/AcroForm")][NameObject("/Fields")]
+        return [fields[position].get_object() for position in positions]
+
+    def option_index(self, name, export_value):
+        """Index of export_value in the field's /Opt list (case/whitespace-insensitive), or None."""
+        wanted = str(export_value).strip().lower()
+        for idx, opt in enumerate(self.options.get(name, [])):
+            if str(opt).strip().lower() == wanted:
+                return idx
+        return None
+
+    def fill_pages(self, writer, data_map):
+        # Only pages that carry widgets; the rest have nothing to update
+        for i in self.form_pages:
+            try:
+                writer.update_page_form_field_values(writer.pages[i], data_map)
+            except Exception as e:
+                logging.warning(f"[PDF] Could not update fields on page {i + 1}: {e}")
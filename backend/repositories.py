@@ -0,0 +1,688 @@
+"""
+Async repository functions used by the routers.
+Each function borrows a connection from db_async and returns plain dicts,
+matching what the old mysql.connector dictionary cursors produced.
+"""
+from functools import lru_cache
+
+from db_async import fetch_one, fetch_all, execute, transaction
+
+
+def _set_clause(fields: dict):
+    return ', '.join(f"{k} = %s" for k in fields), list(fields.values())
+
+
+async def _bump_versions(cursor, *tables):
+    """Count a change to each table inside the writer's transaction (the ETags are built from these)."""
+    # Sorted so concurrent writers lock the counter rows in the same order
+    await cursor.executemany(
+        "INSERT INTO resource_versions (name, version) VALUES (%s, 1) ON DUPLICATE KEY UPDATE version = version + 1",
+        [(table,) for table in sorted(set(tables))],
+    )
+
+
+async def ensure_resource_versions():
+    """Create the counter table on databases set up before it existed; writes rely on it."""
+    await execute(
+        "CREATE TABLE IF NOT EXISTS resource_versions ("
+        "name varchar(64) NOT NULL PRIMARY KEY, version bigint NOT NULL DEFAULT 0"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+async def ensure_token_revocations():
+    """Create the token revocation table on databases set up before it existed."""
+    await execute(
+        "CREATE TABLE IF NOT EXISTS token_revocations ("
+        "user_id int(11) NOT NULL PRIMARY KEY, revoked_at double NOT NULL"
+        ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+    )
+
+
+async def ensure_payslip_content_hash():
+    """Add einkommensbescheinigung.content_hash and its index on databases set up before they existed."""
+    column = await fetch_one(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'einkommensbescheinigung' AND COLUMN_NAME = 'content_hash'"
+    )
+    index = await fetch_one(
+        "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'einkommensbescheinigung' AND INDEX_NAME = 'content_hash' LIMIT 1"
+    )
+    changes = []
+    if column is None:
+        changes.append("ADD COLUMN content_hash char(64) DEFAULT NULL AFTER jahr")
+    if index is None:
+        changes.append("ADD KEY content_hash (content_hash)")
+    if changes:
+        await execute(f"ALTER TABLE einkommensbescheinigung {', '.join(changes)}")
+
+
+async def ensure_payslip_period_index():
+    """Index einkommensbescheinigung by (jahr, monat) on databases set up before it existed."""
+    index = await fetch_one(
+        "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'einkommensbescheinigung' AND INDEX_NAME = 'jahr_monat' LIMIT 1"
+    )
+    if index is None:
+        await execute("ALTER TABLE einkommensbescheinigung ADD KEY jahr_monat (jahr, monat)")
+
+
+async def ensure_stundenzettel_file_key():
+    """Add stundenzettel_downloads.file_key and its index on databases set up before the blob store."""
+    column = await fetch_one(
+        "SELECT 1 FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'stundenzettel_downloads' AND COLUMN_NAME = 'file_key'"
+    )
+    index = await fetch_one(
+        "SELECT 1 FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+        "AND TABLE_NAME = 'stundenzettel_downloads' AND INDEX_NAME = 'file_key' LIMIT 1"
+    )
+    changes = []
+    if column is None:
+        changes.append("ADD COLUMN file_key char(64) DEFAULT NULL")
+    if index is None:
+        changes.append("ADD KEY file_key (file_key)")
+    if changes:
+        await execute(f"ALTER TABLE stundenzettel_downloads {', '.join(changes)}")
+
+
+async def get_resource_versions(tables):
+    """{table: version}; tables that were never written are at 0."""
+    placeholders = ', '.join(['%s'] * len(tables))
+    rows = await fetch_all(f"SELECT name, version FROM resource_versions WHERE name IN ({placeholders})", tuple(tables))
+    versions = dict.fromkeys(tables, 0)
+    versions.update((row['name'], row['version']) for row in rows)
+    return versions
+
+
+# --- Company ---
+
+async def get_company():
+    return await fetch_one('SELECT * FROM company WHERE id=1')
+
+
+async def get_first_company():
+    return await fetch_one('SELECT * FROM company LIMIT 1')
+
+
+async def update_company(data: dict):
+    async with transaction() as cursor:
+        await cursor.execute('''
+            UPDATE company SET
+                name=%s,
+                street=%s,
+                postal_code=%s,
+                city=%s,
+                contact_person=%s,
+                phone=%s,
+                reference=%s,
+                company_number=%s
+            WHERE id=1
+        ''', (
+            data.get('name'),
+            data.get('street'),
+            data.get('postal_code'),
+            data.get('city'),
+            data.get('contact_person'),
+            data.get('phone'),
+            data.get('reference'),
+            data.get('company_number')
+        ))
+        await _bump_versions(cursor, 'company')
+
+
+# --- Employees ---
+
+async def get_employee(employee_id: int):
+    return await fetch_one("SELECT * FROM employees WHERE id = %s", (employee_id,))
+
+
+async def get_employees(employee_ids):
+    if not employee_ids:
+        return []
+    return await fetch_all(
+        f"SELECT * FROM employees WHERE id IN ({', '.join(['%s'] * len(employee_ids))})",
+        tuple(employee_ids),
+    )
+
+
+async def get_employee_columns(employee_id: int, columns):
+    return await fetch_one(f"SELECT {', '.join(columns)} FROM employees WHERE id = %s", (employee_id,))
+
+
+# Columns the employee list returns as strings, with NULL as ''
+EMPLOYEE_TEXT_COLUMNS = (
+    'id', 'id_number', 'personal_number', 'vorname', 'geburtsname', 'strasse_hausnummer',
+    'plz_ort', 'geburtsdatum', 'geschlecht', 'versicherungsnummer', 'familienstand',
+    'geburtsort_land', 'schwerbehindert', 'staatsangehoerigkeit', 'arbeitnehmernummer', 'iban',
+    'bic', 'eintrittsdatum', 'ersteintrittsdatum', 'betriebsstaette', 'berufsbezeichnung',
+    'taetigkeit', 'hauptbeschaeftigung', 'nebenbeschaeftigung', 'weitere_beschaeftigungen',
+    'schulabschluss', 'berufsausbildung', 'ausbildung_beginn', 'ausbildung_ende',
+    'baugewerbe_seit', 'arbeitszeit_vollzeit', 'arbeitszeit_teilzeit', 'arbeitszeit_verteilung',
+    'urlaubsanspruch', 'kostenstelle', 'abteilungsnummer', 'personengruppe',
+    'arbeitsverhaeltnis_befristet', 'zweckbefristet', 'befristung_arbeitsvertrag_zum',
+    'schriftlicher_abschluss', 'abschluss_arbeitsvertrag_am', 'befristete_beschaeftigung_2monate',
+    'weitere_angaben', 'identifikationsnummer', 'finanzamt_nr', 'steuerklasse',
+    'kinderfreibetraege', 'konfession', 'gesetzliche_krankenkasse', 'elterneigenschaft', 'kv',
+    'rv', 'av', 'pv', 'uv_gefahrtarif', 'entlohnung_bezeichnung1', 'entlohnung_betrag1',
+    'entlohnung_gueltig_ab1', 'entlohnung_stundenlohn1', 'entlohnung_gueltig_ab_stunden1',
+    'entlohnung_bezeichnung2', 'entlohnung_betrag2', 'entlohnung_gueltig_ab2',
+    'entlohnung_stundenlohn2', 'entlohnung_gueltig_ab_stunden2', 'entlohnung_bezeichnung3',
+    'entlohnung_betrag3', 'entlohnung_gueltig_ab3', 'entlohnung_stundenlohn3',
+    'entlohnung_gueltig_ab_stunden3', 'vwl_empfaenger', 'vwl_betrag', 'vwl_ag_anteil',
+    'vwl_seit_wann', 'vwl_vertragsnr', 'vwl_kontonummer', 'vwl_bankleitzahl', 'ap_arbeitsvertrag',
+    'ap_bescheinigung_lsta', 'ap_sv_ausweis', 'ap_mitgliedsbescheinigung_kk',
+    'ap_bescheinigung_private_kk', 'ap_vwl_vertrag', 'ap_nachweis_elterneigenschaft',
+    'ap_vertrag_bav', 'ap_schwerbehindertenausweis', 'ap_unterlagen_sozialkasse',
+    'vorbeschaeftigung_zeitraum_von', 'vorbeschaeftigung_zeitraum_bis', 'vorbeschaeftigung_art',
+    'vorbeschaeftigung_tage',
+)
+EMPLOYEE_LIST_COLUMNS = EMPLOYEE_TEXT_COLUMNS + ('land', 'contract_type')
+# Sort keys for the employee list; NULLs are folded so keyset pagination can compare them.
+# Columns are qualified so ORDER BY does not pick up the text aliases of the select list.
+EMPLOYEE_SORT_KEYS = {
+    'id': 'e.id',
+    'vorname': "COALESCE(e.vorname, '')",
+    'geburtsname': "COALESCE(e.geburtsname, '')",
+    'personal_number': "COALESCE(e.personal_number, '')",
+    'contract_type': "COALESCE(e.contract_type, '')",
+    'eintrittsdatum': "COALESCE(e.eintrittsdatum, '0001-01-01')",
+}
+
+
+@lru_cache(maxsize=128)
+def _employee_select_list(columns):
+    # Conversion to text happens in the query, once per column, not per cell in Python
+    return ', '.join(
+        f"COALESCE(CAST(e.{c} AS CHAR), '') AS {c}" if c in EMPLOYEE_TEXT_COLUMNS else f"e.{c}"
+        for c in columns
+    )
+
+
+async def list_employees(columns=EMPLOYEE_LIST_COLUMNS, contract_type=None, search=None, eintritt_von=None,
+                         eintritt_bis=None, sort='id', descending=False, after=None, limit=None):
+    """
+    Employees for the list view. columns must come from EMPLOYEE_LIST_COLUMNS and sort from
+    EMPLOYEE_SORT_KEYS. after is the (_sort_key, id) of the last row of the previous page;
+    every row carries its _sort_key for building the next cursor.
+    """
+    sort_key = EMPLOYEE_SORT_KEYS[sort]
+    conditions, args = [], []
+    if contract_type:
+        conditions.append("e.contract_type = %s")
+        args.append(contract_type)
+    if search:
+        like = f"%{search}%"
+        conditions.append("(CONCAT_WS(' ', e.vorname, e.geburtsname) LIKE %s OR e.personal_number LIKE %s)")
+        args.extend([like, like])
+    if eintritt_von:
+        conditions.append("e.eintrittsdatum >= %s")
+        args.append(eintritt_von)
+    if eintritt_bis:
+        conditions.append("e.eintrittsdatum <= %s")
+        args.append(eintritt_bis)
+    if after is not None:
+        op = '<' if descending else '>'
+        conditions.append(f"({sort_key} {op} %s OR ({sort_key} = %s AND e.id {op} %s))")
+        args.extend([after[0], after[0], after[1]])
+    direction = 'DESC' if descending else 'ASC'
+    sql = f"SELECT {_employee_select_list(tuple(columns))}, {sort_key} AS _sort_key FROM employees e"
+    if conditions:
+        sql += f" WHERE {' AND '.join(conditions)}"
+    sql += f" ORDER BY {sort_key} {direction}, e.id {direction}"
+    if limit is not None:
+        sql += " LIMIT %s"
+        args.append(limit)
+    return await fetch_all(sql, tuple(args))
+
+
+async def find_employees_by_payslip_ids(sv_numbers, personal_numbers):
+    """Employees whose Versicherungsnummer or Arbeitnehmernummer appears on one of the given payslips."""
+    if not sv_numbers and not personal_numbers:
+        return []
+    conditions, args = [], []
+    if sv_numbers:
+        conditions.append(f"REPLACE(versicherungsnummer, ' ', '') IN ({', '.join(['%s'] * len(sv_numbers))})")
+        args.extend(sv_numbers)
+    if personal_numbers:
+        conditions.append(f"arbeitnehmernummer IN ({', '.join(['%s'] * len(personal_numbers))})")
+        args.extend(personal_numbers)
+    return await fetch_all(
+        f"SELECT id, versicherungsnummer, arbeitnehmernummer FROM employees WHERE {' OR '.join(conditions)}",
+        tuple(args),
+    )
+
+
+async def find_employee_by_id_number(id_number):
+    return await fetch_one("SELECT id FROM employees WHERE id_number = %s", (id_number,))
+
+
+async def find_employees_by_id_numbers(id_numbers):
+    if not id_numbers:
+        return []
+    placeholders = ', '.join(['%s'] * len(id_numbers))
+    return await fetch_all(f"SELECT id, id_number FROM employees WHERE id_number IN ({placeholders})", tuple(id_numbers))
+
+
+async def insert_employees(rows):
+    """
+    Insert many employees with one multi-row INSERT and return the new rows. All rows
+    must have the same keys, including a distinct, not yet used id_number.
+    """
+    keys = list(rows[0])
+    row_placeholders = '(' + ', '.join(['%s'] * len(keys)) + ')'
+    values = [row[k] for row in rows for k in keys]
+    id_numbers = [row['id_number'] for row in rows]
+    async with transaction() as cursor:
+        await cursor.execute(
+            f"INSERT INTO employees ({', '.join(keys)}) VALUES {', '.join([row_placeholders] * len(rows))}",
+            tuple(values),
+        )
+        await _bump_versions(cursor, 'employees')
+        placeholders = ', '.join(['%s'] * len(id_numbers))
+        await cursor.execute(f"SELECT * FROM employees WHERE id_number IN ({placeholders}) ORDER BY id", tuple(id_numbers))
+        return await cursor.fetchall()
+
+
+async def insert_employee(fields: dict):
+    columns = ', '.join(fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    async with transaction() as cursor:
+        await cursor.execute(f"INSERT INTO employees ({columns}) VALUES ({placeholders})", tuple(fields.values()))
+        employee_id = cursor.lastrowid
+        await _bump_versions(cursor, 'employees')
+        await cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
+        return await cursor.fetchone()
+
+
+async def update_employee(employee_id: int, fields: dict):
+    sets, values = _set_clause(fields)
+    async with transaction() as cursor:
+        await cursor.execute(f"UPDATE employees SET {sets} WHERE id = %s", tuple(values + [employee_id]))
+        await _bump_versions(cursor, 'employees')
+        await cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
+        return await cursor.fetchone()
+
+
+async def delete_employee(employee_id: int):
+    async with transaction() as cursor:
+        # Related rows first, then the employee itself
+        await cursor.execute("DELETE FROM erklaerung_form WHERE employee_id = %s", (employee_id,))
+        await cursor.execute("DELETE FROM einkommensbescheinigung WHERE employee_id = %s", (employee_id,))
+        await cursor.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
+        await _bump_versions(cursor, 'employees', 'erklaerung_form', 'einkommensbescheinigung')
+
+
+# --- Arbeitsvertrag (employees JOIN erklaerung_form) ---
+
+ARBEITSVERTRAG_SELECT = '''
+    SELECT
+        e.id AS id,
+        CONCAT(e.vorname, ' ', e.geburtsname) AS name,
+        e.strasse_hausnummer AS strasse,
+        e.plz_ort AS plz_ort,
+        e.land AS land,
+        e.contract_type AS contract_type,
+        f.beschaeftigung_beginn AS beginn,
+        f.beschaeftigung_berufsbezeichnung AS position,
+        f.arbeitszeit_stunden AS arbeitszeit_stunden,
+        f.entgelt_pro_monat_wert AS gehalt,
+        f.urlaubsanspruch_tage AS urlaub
+    FROM employees e
+    JOIN erklaerung_form f ON e.id = f.employee_id
+'''
+
+
+async def list_arbeitsvertraege():
+    return await fetch_all(ARBEITSVERTRAG_SELECT)
+
+
+async def get_arbeitsvertrag(employee_id: int):
+    return await fetch_one(ARBEITSVERTRAG_SELECT + " WHERE e.id = %s", (employee_id,))
+
+
+async def list_arbeitsvertraege_for_export(employee_ids=None, contract_type=None, eintritt_von=None, eintritt_bis=None,
+                                           limit=None):
+    """Contract rows for a bulk export; every given filter must match. At most limit rows if given."""
+    conditions, args = [], []
+    if employee_ids:
+        conditions.append(f"e.id IN ({', '.join(['%s'] * len(employee_ids))})")
+        args.extend(employee_ids)
+    if contract_type:
+        conditions.append("e.contract_type = %s")
+        args.append(contract_type)
+    if eintritt_von:
+        conditions.append("e.eintrittsdatum >= %s")
+        args.append(eintritt_von)
+    if eintritt_bis:
+        conditions.append("e.eintrittsdatum <= %s")
+        args.append(eintritt_bis)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = ARBEITSVERTRAG_SELECT + where + " ORDER BY e.id"
+    if limit is not None:
+        query += " LIMIT %s"
+        args.append(limit)
+    return await fetch_all(query, tuple(args))
+
+
+async def update_arbeitsvertrag(employee_id: int, emp_fields: dict, erk_fields: dict):
+    async with transaction() as cursor:
+        if emp_fields:
+            sets, values = _set_clause(emp_fields)
+            await cursor.execute(f"UPDATE employees SET {sets} WHERE id = %s", tuple(values + [employee_id]))
+        if erk_fields:
+            sets, values = _set_clause(erk_fields)
+            await cursor.execute(f"UPDATE erklaerung_form SET {sets} WHERE employee_id = %s", tuple(values + [employee_id]))
+        await _bump_versions(cursor, 'employees', 'erklaerung_form')
+        await cursor.execute(ARBEITSVERTRAG_SELECT + " WHERE e.id = %s", (employee_id,))
+        return await cursor.fetchone()
+
+
+# --- Einkommensbescheinigung ---
+
+async def find_einkommensbescheinigung_by_hash(employee_id: int, content_hash: str):
+    return await fetch_one(
+        "SELECT id FROM einkommensbescheinigung WHERE employee_id = %s AND content_hash = %s ORDER BY id LIMIT 1",
+        (employee_id, content_hash),
+    )
+
+
+async def find_einkommensbescheinigungen_by_hashes(content_hashes):
+    """Already imported payslips among the given file hashes: [{id, employee_id, content_hash}]."""
+    if not content_hashes:
+        return []
+    return await fetch_all(
+        f"SELECT id, employee_id, content_hash FROM einkommensbescheinigung "
+        f"WHERE content_hash IN ({', '.join(['%s'] * len(content_hashes))})",
+        tuple(content_hashes),
+    )
+
+
+async def insert_einkommensbescheinigung(employee_id: int, record, employee_updates: dict):
+    """
+    Insert one payslip row and apply the extracted employee fields in the same transaction.
+    With record=None only the employee fields are updated (re-upload of a known payslip).
+    """
+    record_id = None
+    async with transaction() as cursor:
+        if record is not None:
+            columns = ', '.join(['employee_id'] + list(record))
+            placeholders = ', '.join(['%s'] * (len(record) + 1))
+            await cursor.execute(
+                f"INSERT INTO einkommensbescheinigung ({columns}) VALUES ({placeholders})",
+                (employee_id, *record.values()),
+            )
+            record_id = cursor.lastrowid
+        if employee_updates:
+            sets, values = _set_clause(employee_updates)
+            await cursor.execute(f"UPDATE employees SET {sets} WHERE id = %s", tuple(values + [employee_id]))
+        await _bump_versions(cursor, 'einkommensbescheinigung', 'employees')
+        return record_id
+
+
+async def bulk_insert_einkommensbescheinigungen(records, employee_updates):
+    """
+    Insert many payslip rows and apply the matching employee updates in one transaction.
+    records: [(employee_id, record_dict)], all with the same keys
+    employee_updates: [(employee_id, fields_dict)]; grouped by column set so each group is one executemany
+    """
+    async with transaction() as cursor:
+        if records:
+            keys = list(records[0][1])
+            columns = ', '.join(['employee_id'] + keys)
+            placeholders = ', '.join(['%s'] * (len(keys) + 1))
+            await cursor.executemany(
+                f"INSERT INTO einkommensbescheinigung ({columns}) VALUES ({placeholders})",
+                [(employee_id, *(record[k] for k in keys)) for employee_id, record in records],
+            )
+        groups = {}
+        for employee_id, fields in employee_updates:
+            if fields:
+                groups.setdefault(tuple(fields), []).append((*fields.values(), employee_id))
+        for columns, rows in groups.items():
+            sets = ', '.join(f"{k} = %s" for k in columns)
+            await cursor.executemany(f"UPDATE employees SET {sets} WHERE id = %s", rows)
+        await _bump_versions(cursor, 'einkommensbescheinigung', 'employees')
+
+
+async def list_einkommensbescheinigungen(employee_id: int):
+    return await fetch_all("""
+        SELECT * FROM einkommensbescheinigung
+        WHERE employee_id = %s
+        ORDER BY jahr DESC, monat DESC, created_at DESC
+    """, (employee_id,))
+
+
+async def list_entries(employee_id: int, year, month=None):
+    if month is None:
+        return await fetch_all(
+            "SELECT * FROM einkommensbescheinigung WHERE employee_id = %s AND jahr = %s",
+            (employee_id, str(year)),
+        )
+    return await fetch_all(
+        "SELECT * FROM einkommensbescheinigung WHERE employee_id = %s AND jahr = %s AND monat = %s",
+        (employee_id, str(year), str(month)),
+    )
+
+
+async def list_entries_for_employees(employee_ids, year, month=None):
+    """Entries of several employees in one query, grouped as {employee_id: [rows]}."""
+    if not employee_ids:
+        return {}
+    sql = (
+        f"SELECT * FROM einkommensbescheinigung WHERE employee_id IN ({', '.join(['%s'] * len(employee_ids))}) "
+        "AND jahr = %s"
+    )
+    args = list(employee_ids) + [str(year)]
+    if month is not None:
+        sql += " AND monat = %s"
+        args.append(str(month))
+    grouped = {employee_id: [] for employee_id in employee_ids}
+    for row in await fetch_all(sql, tuple(args)):
+        grouped.setdefault(row['employee_id'], []).append(row)
+    return grouped
+
+
+async def update_einkommensbescheinigung(record_id: int, fields: dict):
+    sets, values = _set_clause(fields)
+    async with transaction() as cursor:
+        await cursor.execute(f"UPDATE einkommensbescheinigung SET {sets} WHERE id = %s", tuple(values + [record_id]))
+        rowcount = cursor.rowcount
+        await _bump_versions(cursor, 'einkommensbescheinigung')
+        return rowcount
+
+
+async def delete_einkommensbescheinigung(record_id: int):
+    """Returns False if the record did not exist."""
+    async with transaction() as cursor:
+        await cursor.execute("SELECT id FROM einkommensbescheinigung WHERE id = %s", (record_id,))
+        if not await cursor.fetchone():
+            return False
+        await cursor.execute("DELETE FROM einkommensbescheinigung WHERE id = %s", (record_id,))
+        await _bump_versions(cursor, 'einkommensbescheinigung')
+        return True
+
+
+# --- Erklaerung form ---
+
+async def get_erklaerung_form(employee_id: int):
+    return await fetch_one("SELECT * FROM erklaerung_form WHERE employee_id = %s", (employee_id,))
+
+
+async def get_latest_erklaerung_form(employee_id: int):
+    return await fetch_one('SELECT * FROM erklaerung_form WHERE employee_id = %s ORDER BY id DESC LIMIT 1', (employee_id,))
+
+
+async def save_erklaerung_form(employee_id: int, employee_update: dict, form_data: dict):
+    """Update the employee columns and insert-or-update the erklaerung_form row atomically."""
+    async with transaction() as cursor:
+        if employee_update:
+            sets, values = _set_clause(employee_update)
+            await cursor.execute(f"UPDATE employees SET {sets} WHERE id = %s", tuple(values + [employee_id]))
+        await cursor.execute("SELECT id FROM erklaerung_form WHERE employee_id = %s", (employee_id,))
+        exists = await cursor.fetchone()
+        if exists:
+            if form_data:
+                sets, values = _set_clause(form_data)
+                await cursor.execute(f"UPDATE erklaerung_form SET {sets} WHERE employee_id = %s", tuple(values + [employee_id]))
+        else:
+            columns = ', '.join(['employee_id'] + list(form_data.keys()))
+            placeholders = ', '.join(['%s'] * (len(form_data) + 1))
+            await cursor.execute(
+                f"INSERT INTO erklaerung_form ({columns}) VALUES ({placeholders})",
+                tuple([employee_id] + list(form_data.values())),
+            )
+        await _bump_versions(cursor, 'employees', 'erklaerung_form')
+
+
+# --- Stundenzettel downloads ---
+
+async def insert_stundenzettel_download(user_id, employee_ids_json, employee_names_json, month, year, download_date, filename, file_key):
+    _, download_id = await execute(
+        """
+        INSERT INTO stundenzettel_downloads (user_id, employee_ids, employee_names, month, year, download_date, filename, file_key)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (user_id, employee_ids_json, employee_names_json, month, year, download_date, filename, file_key),
+    )
+    return download_id
+
+
+async def list_stundenzettel_downloads(user_id):
+    return await fetch_all(
+        "SELECT id, employee_names, month, year, download_date, filename FROM stundenzettel_downloads WHERE user_id = %s ORDER BY download_date DESC",
+        (user_id,),
+    )
+
+
+async def get_stundenzettel_download(download_id: int):
+    """Metadata only; rows written before the blob store keep their bytes in file_blob (has_blob)."""
+    return await fetch_one(
+        "SELECT file_key, filename, user_id, file_blob IS NOT NULL AS has_blob FROM stundenzettel_downloads WHERE id = %s",
+        (download_id,),
+    )
+
+
+async def get_stundenzettel_download_blob(download_id: int):
+    row = await fetch_one("SELECT file_blob FROM stundenzettel_downloads WHERE id = %s", (download_id,))
+    return row['file_blob'] if row else None
+
+
+# --- Users ---
+
+async def get_user_by_login(login: str):
+    return await fetch_one("SELECT * FROM users WHERE username = %s OR email = %s", (login, login))
+
+
+async def get_user_by_id(user_id: int):
+    return await fetch_one("SELECT id, username, role FROM users WHERE id=%s", (user_id,))
+
+
+async def get_user_by_email(email: str):
+    return await fetch_one("SELECT id, username FROM users WHERE email=%s", (email,))
+
+
+async def list_users():
+    return await fetch_all("SELECT id, username, email, role FROM users")
+
+
+async def create_user(username, email, hashed_password, role):
+    _, user_id = await execute(
+        "INSERT INTO users (username, email, password, role) VALUES (%s, %s, %s, %s)",
+        (username, email, hashed_password, role),
+    )
+    return user_id
+
+
+async def update_user(user_id: int, fields: dict):
+    sets, values = _set_clause(fields)
+    await execute(f"UPDATE users SET {sets} WHERE id=%s", tuple(values + [user_id]))
+
+
+async def rehash_user_password(user_id: int, old_hash: str, new_hash: str):
+    # Only replaces the hash it was computed from, so a concurrent password change wins
+    await execute("UPDATE users SET password=%s WHERE id=%s AND password=%s", (new_hash, user_id, old_hash))
+
+
+async def delete_user(user_id: int):
+    await execute("DELETE FROM users WHERE id=%s", (user_id,))
+
+
+async def revoke_user_tokens(user_id: int, revoked_at: float):
+    await execute(
+        "INSERT INTO token_revocations (user_id, revoked_at) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE revoked_at = VALUES(revoked_at)",
+        (user_id, revoked_at),
+    )
+
+
+async def list_token_revocations(since: float):
+    return await fetch_all("SELECT user_id, revoked_at FROM token_revocations WHERE revoked_at > %s", (since,))
+
+
+async def create_password_reset(user_id, token, expires_at):
+    await execute("INSERT INTO password_resets (user_id, token, expires_at) VALUES (%s, %s, %s)", (user_id, token, expires_at))
+
+
+async def get_password_reset(token: str):
+    return await fetch_one("SELECT user_id, expires_at FROM password_resets WHERE token=%s", (token,))
+
+
+async def delete_password_reset(token: str):
+    await execute("DELETE FROM password_resets WHERE token=%s", (token,))
+
+
+async def reset_user_password(user_id, hashed_password, token):
+    async with transaction() as cursor:
+        await cursor.execute("UPDATE users SET password=%s WHERE id=%s", (hashed_password, user_id))
+        await cursor.execute("DELETE FROM password_resets WHERE token=%s", (token,))
+
+
+# --- Dashboard ---
+
+CONTRACT_MINIJOB = 'TEILZEITTÄTIGKEIT - "MINIJOB"'
+CONTRACT_FULLTIME = 'VOLLZEITTÄTIGKEIT'
+CONTRACT_PARTTIME = 'TEILZEITTÄTIGKEIT'
+
+
+async def dashboard_stats(first_month, last_month):
+    """
+    (counts, hires, payslips) from three queries on one connection. counts are the six dashboard totals;
+    hires and payslips are [{'month': 'YYYY-MM', 'value': n}] for the months
+    first_month..last_month ('YYYY-MM') that have any rows.
+    """
+    async with transaction() as cursor:
+        # Both tables are aggregated in a single statement instead of one COUNT(*) per figure
+        await cursor.execute("""
+            SELECT u.total_users, u.total_admins, e.total_employees,
+                   e.total_minijobs, e.total_fulltime, e.total_parttime
+            FROM (
+                SELECT COUNT(*) AS total_users, COALESCE(SUM(role = 'admin'), 0) AS total_admins
+                FROM users
+            ) u CROSS JOIN (
+                SELECT COUNT(*) AS total_employees,
+                       COALESCE(SUM(contract_type = %s), 0) AS total_minijobs,
+                       COALESCE(SUM(contract_type = %s), 0) AS total_fulltime,
+                       COALESCE(SUM(contract_type = %s), 0) AS total_parttime
+                FROM employees
+            ) e
+        """, (CONTRACT_MINIJOB, CONTRACT_FULLTIME, CONTRACT_PARTTIME))
+        counts = {k: int(v) for k, v in (await cursor.fetchone()).items()}
+        await cursor.execute("""
+            SELECT DATE_FORMAT(eintrittsdatum, '%%Y-%%m') AS month, COUNT(*) AS value
+            FROM employees
+            WHERE eintrittsdatum >= %s AND eintrittsdatum < %s + INTERVAL 1 MONTH
+            GROUP BY month
+        """, (f"{first_month}-01", f"{last_month}-01"))
+        hires = await cursor.fetchall()
+        # monat is free text ('3' or '03'): filter on the indexed jahr and normalise only the grouped rows
+        await cursor.execute("""
+            SELECT CONCAT(jahr, '-', LPAD(TRIM(monat), 2, '0')) AS month, COUNT(*) AS value
+            FROM einkommensbescheinigung
+            WHERE jahr BETWEEN %s AND %s
+            GROUP BY month
+            HAVING month BETWEEN %s AND %s
+        """, (first_month[:4], last_month[:4], first_month, last_month))
+        payslips = await cursor.fetchall()
+        return counts, list(hires), list(payslips)
@@ -1,257 +1,371 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Query, status, Body, Depends
-from db import get_connection
-from pdf_extract_utils import extract_einkommensbescheinigung_fields
-import tempfile
-import shutil
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, status, Body, Depends, Form, Request
+from starlette.concurrency import run_in_threadpool
+from pypdf import PdfReader, PdfWriter
+from typing import List
+import repositories
+from extraction_executor import executor as extraction_executor, ExtractionQueueFull, ExtractionTimeout
+from extraction_cache import content_hash
+from conditional_get import conditional_json
+import dashboard_stats
+import asyncio
+import io
 import os
+import zipfile
 import logging
 from auth import get_current_user
 
 router = APIRouter()
 
+BULK_UPLOAD_MAX_DOCUMENTS = int(os.getenv("BULK_UPLOAD_MAX_DOCUMENTS", "1000"))
+
+def _payslip_record(extracted):
+    """Columns of the einkommensbescheinigung row for one extraction result."""
+    return {
+        'eintritt': extracted.get('Eintritt'),
+        'stkl': extracted.get('StKl'),
+        'krankenkasse': extracted.get('Krankenkasse'),
+        'betrag': extracted.get('Betrag'),
+        'kv_brutto': extracted.get('KV-Brutto'),
+        'sv_abzug': extracted.get('SV-Abzug'),
+        'netto': extracted.get('Netto'),
+        'monat': extracted.get('monat'),
+        'jahr': extracted.get('jahr'),
+    }
+
+def _employee_updates(extracted):
+    """Employee columns to overwrite from an extraction result (only values that are not None)."""
+    update_fields = {}
+    
+    if extracted.get('StKl') is not None:
+        update_fields['steuerklasse'] = extracted.get('StKl')
+        logging.info(f"Updating steuerklasse: {extracted.get('StKl')}")
+    
+    if extracted.get('Krankenkasse') is not None:
+        update_fields['gesetzliche_krankenkasse'] = extracted.get('Krankenkasse')
+        logging.info(f"Updating gesetzliche_krankenkasse: {extracted.get('Krankenkasse')}")
+    
+    if extracted.get('Eintritt') is not None:
+        # Convert DD.MM.YY format to YYYY-MM-DD for database
+        eintritt_date = extracted.get('Eintritt')
+        if eintritt_date and '.' in eintritt_date:
+            try:
+                day, month, year = eintritt_date.split('.')
+                # Assume 20xx for years < 50, 19xx for years >= 50
+                if len(year) == 2:
+                    if int(year) < 50:
+                        year = f"20{year}"
+                    else:
+                        year = f"19{year}"
+                eintritt_date = f"{year}-{month}-{day}"
+            except:
+                pass  # Keep original format if conversion fails
+        
+        update_fields['eintrittsdatum'] = eintritt_date
+        logging.info(f"Updating eintrittsdatum: {eintritt_date}")
+    
+    if extracted.get('Personal-Nr') is not None:
+        update_fields['arbeitnehmernummer'] = extracted.get('Personal-Nr')
+        logging.info(f"Updating arbeitnehmernummer: {extracted.get('Personal-Nr')}")
+    
+    if extracted.get('Ki.Frbtr') is not None and extracted.get('Ki.Frbtr') != '':
+        update_fields['kinderfreibetraege'] = extracted.get('Ki.Frbtr')
+        logging.info(f"Updating kinderfreibetraege: {extracted.get('Ki.Frbtr')}")
+    else:
+        logging.info("Ki.Frbtr is empty or None - not updating kinderfreibetraege")
+    
+    if extracted.get('SV-Nummer') is not None:
+        update_fields['versicherungsnummer'] = extracted.get('SV-Nummer')
+        logging.info(f"Updating versicherungsnummer: {extracted.get('SV-Nummer')}")
+    
+    if extracted.get('Steuer-ID') is not None:
+        update_fields['identifikationsnummer'] = extracted.get('Steuer-ID')
+        logging.info(f"Updating identifikationsnummer: {extracted.get('Steuer-ID')}")
+    
+    if extracted.get('strasse_hausnummer') is not None:
+        update_fields['strasse_hausnummer'] = extracted.get('strasse_hausnummer')
+        logging.info(f"Updating strasse_hausnummer: {extracted.get('strasse_hausnummer')}")
+    
+    if extracted.get('plz_ort') is not None:
+        update_fields['plz_ort'] = extracted.get('plz_ort')
+        logging.info(f"Updating plz_ort: {extracted.get('plz_ort')}")
+    
+    if extracted.get('Bank') is not None:
+        update_fields['bic'] = extracted.get('Bank')
+        logging.info(f"Updating bic: {extracted.get('Bank')}")
+    
+    if extracted.get('Konto') is not None:
+        update_fields['iban'] = extracted.get('Konto')
+        logging.info(f"Updating iban: {extracted.get('Konto')}")
+    
+    if extracted.get('KV-Beitrag') is not None:
+        update_fields['kv'] = extracted.get('KV-Beitrag')
+        logging.info(f"Updating kv: {extracted.get('KV-Beitrag')}")
+    
+    if extracted.get('RV-Beitrag') is not None:
+        update_fields['rv'] = extracted.get('RV-Beitrag')
+        logging.info(f"Updating rv: {extracted.get('RV-Beitrag')}")
+    
+    if extracted.get('AV-Beitrag') is not None:
+        update_fields['av'] = extracted.get('AV-Beitrag')
+        logging.info(f"Updating av: {extracted.get('AV-Beitrag')}")
+    
+    if extracted.get('PV-Beitrag') is not None:
+        update_fields['pv'] = extracted.get('PV-Beitrag')
+        logging.info(f"Updating pv: {extracted.get('PV-Beitrag')}")
+    return update_fields
+
+def _unpack_payslip_uploads(uploads, split_pages):
+    """
+    Expand ZIP archives into their PDFs and, if split_pages is set, multi-page PDFs into one
+    document per page. Returns ([(label, pdf_bytes)], [error results]).
+    """
+    pdfs, errors = [], []
+    for filename, content in uploads:
+        if content[:4] == b'PK\x03\x04':
+            try:
+                with zipfile.ZipFile(io.BytesIO(content)) as archive:
+                    for info in archive.infolist():
+                        name = info.filename
+                        if info.is_dir() or name.startswith('__MACOSX/') or not name.lower().endswith('.pdf'):
+                            continue
+                        pdfs.append((f"{filename}/{name}", archive.read(info)))
+            except zipfile.BadZipFile as e:
+                errors.append({"file": filename, "status": "error", "error": f"Ungültige ZIP-Datei: {e}"})
+        else:
+            pdfs.append((filename, content))
+    if not split_pages:
+        return pdfs, errors
+    documents = []
+    for label, content in pdfs:
+        try:
+            reader = PdfReader(io.BytesIO(content))
+            if len(reader.pages) <= 1:
+                documents.append((label, content))
+                continue
+            for page_no, page in enumerate(reader.pages, start=1):
+                writer = PdfWriter()
+                writer.add_page(page)
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                documents.append((f"{label}#Seite {page_no}", buffer.getvalue()))
+        except Exception as e:
+            errors.append({"file": label, "status": "error", "error": f"PDF konnte nicht gelesen werden: {e}"})
+    return documents, errors
+
 @router.post("/employees/{employee_id}/einkommensbescheinigung/upload", status_code=status.HTTP_201_CREATED)
-async def upload_einkommensbescheinigung(employee_id: int, file: UploadFile = File(...), user=Depends(get_current_user)):
-    # Save uploaded file to a temp location
+async def upload_einkommensbescheinigung(
+    employee_id: int,
+    file: UploadFile = File(...),
+    allow_duplicate: bool = Query(False),
+    user=Depends(get_current_user)
+):
+    # Read the upload; parsing happens on the extraction process pool
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
+        content = await file.read()
     except Exception as e:
-        logging.error(f"Failed to save uploaded file: {e}")
+        logging.error(f"Failed to read uploaded file: {e}")
         raise HTTPException(status_code=500, detail=f"Fehler beim Speichern der Datei: {str(e)}")
+    digest = content_hash(content)
     
-    # Extract fields using the utility
+    # Extract fields using the utility (cached per file hash)
     try:
-        extracted = extract_einkommensbescheinigung_fields(tmp_path)
+        extracted = await extraction_executor.extract_einkommensbescheinigung(content, content_hash=digest)
+    except ExtractionQueueFull:
+        raise HTTPException(status_code=503, detail="Zu viele PDF-Uploads gleichzeitig, bitte später erneut versuchen")
+    except ExtractionTimeout as e:
+        logging.error(f"PDF extraction timeout: {e}")
+        raise HTTPException(status_code=504, detail=f"PDF extraction error: {str(e)}")
     except Exception as e:
-        os.remove(tmp_path)
         logging.error(f"PDF extraction error: {e}")
         raise HTTPException(status_code=500, detail=f"PDF extraction error: {str(e)}")
     
     # Store in DB using extracted data and update employee record
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Start transaction
-        cursor.execute("START TRANSACTION")
-        
-        # Insert einkommensbescheinigung record
-        cursor.execute("""
-            INSERT INTO einkommensbescheinigung
-            (employee_id, eintritt, stkl, krankenkasse, betrag, kv_brutto, sv_abzug, netto, monat, jahr)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            employee_id,
-            extracted.get('Eintritt'),
-            extracted.get('StKl'),
-            extracted.get('Krankenkasse'),
-            extracted.get('Betrag'),
-            extracted.get('KV-Brutto'),
-            extracted.get('SV-Abzug'),
-            extracted.get('Netto'),
-            extracted.get('monat'),
-            extracted.get('jahr')
-        ))
-        
-        # Update employee record with extracted values (only if values are not None)
-        update_fields = []
-        update_values = []
+        record = _payslip_record(extracted)
         
         # Debug logging
         logging.info(f"Extracted data: {extracted}")
         
-        if extracted.get('StKl') is not None:
-            update_fields.append("steuerklasse = %s")
-            update_values.append(extracted.get('StKl'))
-            logging.info(f"Updating steuerklasse: {extracted.get('StKl')}")
-        
-        if extracted.get('Krankenkasse') is not None:
-            update_fields.append("gesetzliche_krankenkasse = %s")
-            update_values.append(extracted.get('Krankenkasse'))
-            logging.info(f"Updating gesetzliche_krankenkasse: {extracted.get('Krankenkasse')}")
-        
-        if extracted.get('Eintritt') is not None:
-            # Convert DD.MM.YY format to YYYY-MM-DD for database
-            eintritt_date = extracted.get('Eintritt')
-            if eintritt_date and '.' in eintritt_date:
-                try:
-                    day, month, year = eintritt_date.split('.')
-                    # Assume 20xx for years < 50, 19xx for years >= 50
-                    if len(year) == 2:
-                        if int(year) < 50:
-                            year = f"20{year}"
-                        else:
-                            year = f"19{year}"
-                    eintritt_date = f"{year}-{month}-{day}"
-                except:
-                    pass  # Keep original format if conversion fails
-            
-            update_fields.append("eintrittsdatum = %s")
-            update_values.append(eintritt_date)
-            logging.info(f"Updating eintrittsdatum: {eintritt_date}")
-        
-        if extracted.get('Personal-Nr') is not None:
-            update_fields.append("arbeitnehmernummer = %s")
-            update_values.append(extracted.get('Personal-Nr'))
-            logging.info(f"Updating arbeitnehmernummer: {extracted.get('Personal-Nr')}")
-        
-        if extracted.get('Ki.Frbtr') is not None and extracted.get('Ki.Frbtr') != '':
-            update_fields.append("kinderfreibetraege = %s")
-            update_values.append(extracted.get('Ki.Frbtr'))
-            logging.info(f"Updating kinderfreibetraege: {extracted.get('Ki.Frbtr')}")
-        else:
-            logging.info("Ki.Frbtr is empty or None - not updating kinderfreibetraege")
-        
-        if extracted.get('SV-Nummer') is not None:
-            update_fields.append("versicherungsnummer = %s")
-            update_values.append(extracted.get('SV-Nummer'))
-            logging.info(f"Updating versicherungsnummer: {extracted.get('SV-Nummer')}")
-        
-        if extracted.get('Steuer-ID') is not None:
-            update_fields.append("identifikationsnummer = %s")
-            update_values.append(extracted.get('Steuer-ID'))
-            logging.info(f"Updating identifikationsnummer: {extracted.get('Steuer-ID')}")
-        
-        if extracted.get('strasse_hausnummer') is not None:
-            update_fields.append("strasse_hausnummer = %s")
-            update_values.append(extracted.get('strasse_hausnummer'))
-            logging.info(f"Updating strasse_hausnummer: {extracted.get('strasse_hausnummer')}")
-        
-        if extracted.get('plz_ort') is not None:
-            update_fields.append("plz_ort = %s")
-            update_values.append(extracted.get('plz_ort'))
-            logging.info(f"Updating plz_ort: {extracted.get('plz_ort')}")
-        
-        if extracted.get('Bank') is not None:
-            update_fields.append("bic = %s")
-            update_values.append(extracted.get('Bank'))
-            logging.info(f"Updating bic: {extracted.get('Bank')}")
-        
-        if extracted.get('Konto') is not None:
-            update_fields.append("iban = %s")
-            update_values.append(extracted.get('Konto'))
-            logging.info(f"Updating iban: {extracted.get('Konto')}")
-        
-        if extracted.get('KV-Beitrag') is not None:
-            update_fields.append("kv = %s")
-            update_values.append(extracted.get('KV-Beitrag'))
-            logging.info(f"Updating kv: {extracted.get('KV-Beitrag')}")
-        
-        if extracted.get('RV-Beitrag') is not None:
-            update_fields.append("rv = %s")
-            update_values.append(extracted.get('RV-Beitrag'))
-            logging.info(f"Updating rv: {extracted.get('RV-Beitrag')}")
-        
-        if extracted.get('AV-Beitrag') is not None:
-            update_fields.append("av = %s")
-            update_values.append(extracted.get('AV-Beitrag'))
-            logging.info(f"Updating av: {extracted.get('AV-Beitrag')}")
-        
-        if extracted.get('PV-Beitrag') is not None:
-            update_fields.append("pv = %s")
-            update_values.append(extracted.get('PV-Beitrag'))
-            logging.info(f"Updating pv: {extracted.get('PV-Beitrag')}")
+        # Update employee record with extracted values (only if values are not None)
+        update_fields = _employee_updates(extracted)
         
         # Only update if we have fields to update
         if update_fields:
-            update_values.append(employee_id)
-            logging.info(f"Updating employee {employee_id} with fields: {update_fields}")
-            cursor.execute(f"""
-                UPDATE employees 
-                SET {', '.join(update_fields)}
-                WHERE id = %s
-            """, tuple(update_values))
+            logging.info(f"Updating employee {employee_id} with fields: {list(update_fields)}")
         else:
             logging.info("No fields to update for employee")
         
-        # Commit transaction
-        cursor.execute("COMMIT")
-        cursor.close()
-        conn.close()
+        # The same file uploaded again for this employee only refreshes the employee fields
+        existing = await repositories.find_einkommensbescheinigung_by_hash(employee_id, digest)
+        if existing and not allow_duplicate:
+            logging.info(f"Payslip {digest[:12]} already imported as {existing['id']}, not inserting another row")
+            record = None
+        else:
+            record['content_hash'] = digest
+        
+        # Insert and employee update run in one transaction (rolled back on error)
+        record_id = await repositories.insert_einkommensbescheinigung(employee_id, record, update_fields)
+        dashboard_stats.invalidate()
         
     except Exception as e:
-        # Rollback on error
-        try:
-            cursor.execute("ROLLBACK")
-        except:
-            pass
-        os.remove(tmp_path)
         logging.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
-    os.remove(tmp_path)
+    if record is None:
+        message = "Diese Einkommensbescheinigung wurde bereits hochgeladen; nur die Mitarbeiterdaten wurden aktualisiert"
+    else:
+        message = "Einkommensbescheinigung gespeichert und Mitarbeiterdaten aktualisiert (Steuerklasse, Krankenkasse, Eintrittsdatum, Personal-Nr, Kinderfreibetrag, SV-Nummer, Steuer-ID, Adresse, Bankdaten, IBAN, KV-Beitrag, RV-Beitrag, AV-Beitrag, PV-Beitrag)"
     return {
-        "message": "Einkommensbescheinigung gespeichert und Mitarbeiterdaten aktualisiert (Steuerklasse, Krankenkasse, Eintrittsdatum, Personal-Nr, Kinderfreibetrag, SV-Nummer, Steuer-ID, Adresse, Bankdaten, IBAN, KV-Beitrag, RV-Beitrag, AV-Beitrag, PV-Beitrag)", 
+        "message": message,
+        "id": record_id,
         "data": extracted, 
         "monat": extracted.get('monat'), 
         "jahr": extracted.get('jahr'),
-        "employee_updated": bool(update_fields)
+        "employee_updated": bool(update_fields),
+        "duplicate": existing is not None,
+        "existing_id": existing['id'] if existing else None,
     }
 
-@router.get("/einkommensbescheinigung/list")
-def list_einkommensbescheinigung(employeeId: int = Query(...), user=Depends(get_current_user)):
+@router.post("/einkommensbescheinigung/bulk-upload", status_code=status.HTTP_201_CREATED)
+async def bulk_upload_einkommensbescheinigung(
+    files: List[UploadFile] = File(...),
+    split_pages: bool = Form(False),
+    user=Depends(get_current_user)
+):
+    """
+    Import many Lohnabrechnungen at once: plain PDFs, ZIP archives of PDFs, or (with split_pages)
+    combined PDFs with one payslip per page. Each document is matched to an employee by
+    SV-Nummer, falling back to Personal-Nr, and all rows are written in a single transaction.
+    Files already imported for the matched employee (same content hash) are reported as
+    'duplicate' and only refresh the employee fields.
+    """
+    uploads = [(f.filename, await f.read()) for f in files]
+    documents, results = await run_in_threadpool(_unpack_payslip_uploads, uploads, split_pages)
+    if len(documents) > BULK_UPLOAD_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"Zu viele Dokumente ({len(documents)}), maximal {BULK_UPLOAD_MAX_DOCUMENTS}")
+
+    digests = await run_in_threadpool(lambda: [content_hash(content) for _, content in documents])
+    # Extract in parallel, but never queue more than the pool can work on at once
+    limit = asyncio.Semaphore(extraction_executor.workers)
+    async def extract(content, digest):
+        async with limit:
+            try:
+                return await extraction_executor.extract_einkommensbescheinigung(content, content_hash=digest)
+            except Exception as e:
+                return e
+    extracted_list = await asyncio.gather(*(extract(content, digest) for (_, content), digest in zip(documents, digests)))
+
+    def normalize_sv(value):
+        return value.replace(' ', '').upper() if value else None
+
+    sv_numbers = {normalize_sv(e.get('SV-Nummer')) for e in extracted_list if isinstance(e, dict) and e.get('SV-Nummer')}
+    personal_numbers = {e.get('Personal-Nr') for e in extracted_list if isinstance(e, dict) and e.get('Personal-Nr')}
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT * FROM einkommensbescheinigung
-            WHERE employee_id = %s
-            ORDER BY jahr DESC, monat DESC, created_at DESC
-        """, (employeeId,))
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return rows
+        candidates, imported = await asyncio.gather(
+            repositories.find_employees_by_payslip_ids(sorted(sv_numbers), sorted(personal_numbers)),
+            repositories.find_einkommensbescheinigungen_by_hashes(sorted(set(digests))),
+        )
     except Exception as e:
         logging.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    by_sv = {normalize_sv(c['versicherungsnummer']): c['id'] for c in candidates if c.get('versicherungsnummer')}
+    by_personal_nr = {c['arbeitnehmernummer']: c['id'] for c in candidates if c.get('arbeitnehmernummer')}
+    known_files = {}
+    for row in sorted(imported, key=lambda row: row['id']):
+        known_files.setdefault((row['employee_id'], row['content_hash']), row['id'])
+
+    records = []
+    latest_updates = {}  # employee_id -> ((jahr, monat), update_fields); the newest payslip wins
+    for (label, _), digest, extracted in zip(documents, digests, extracted_list):
+        if isinstance(extracted, Exception):
+            results.append({"file": label, "status": "error", "error": f"PDF extraction error: {extracted}"})
+            continue
+        sv_number = normalize_sv(extracted.get('SV-Nummer'))
+        personal_nr = extracted.get('Personal-Nr')
+        employee_id = by_sv.get(sv_number) or by_personal_nr.get(personal_nr)
+        result = {
+            "file": label,
+            "personal_nr": personal_nr,
+            "sv_nummer": sv_number,
+            "monat": extracted.get('monat'),
+            "jahr": extracted.get('jahr'),
+        }
+        if not employee_id:
+            results.append({**result, "status": "unmatched", "error": "Kein Mitarbeiter mit dieser SV-Nummer/Personal-Nr gefunden"})
+            continue
+        period = (str(extracted.get('jahr') or ''), str(extracted.get('monat') or ''))
+        if employee_id not in latest_updates or period >= latest_updates[employee_id][0]:
+            latest_updates[employee_id] = (period, _employee_updates(extracted))
+        if (employee_id, digest) in known_files:
+            results.append({**result, "status": "duplicate", "employee_id": employee_id, "existing_id": known_files[(employee_id, digest)]})
+            continue
+        # Later copies of the same file within this upload are duplicates of the first one
+        known_files[(employee_id, digest)] = None
+        records.append((employee_id, {**_payslip_record(extracted), 'content_hash': digest}))
+        results.append({**result, "status": "imported", "employee_id": employee_id})
+
+    if records or latest_updates:
+        try:
+            await repositories.bulk_insert_einkommensbescheinigungen(
+                records,
+                [(employee_id, fields) for employee_id, (_, fields) in latest_updates.items()],
+            )
+            dashboard_stats.invalidate()
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    counts = {"imported": 0, "duplicate": 0, "unmatched": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {
+        "message": f"{counts['imported']} Einkommensbescheinigungen importiert",
+        "imported": counts["imported"],
+        "duplicates": counts["duplicate"],
+        "unmatched": counts["unmatched"],
+        "errors": counts["error"],
+        "results": results,
+    }
+
+@router.get("/einkommensbescheinigung/list")
+async def list_einkommensbescheinigung(request: Request, employeeId: int = Query(...), user=Depends(get_current_user)):
+    async def produce():
+        try:
+            return await repositories.list_einkommensbescheinigungen(employeeId)
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    return await conditional_json(request, ('einkommensbescheinigung',), produce)
 
 @router.get("/employees/{employee_id}")
-def get_employee(employee_id: int, user=Depends(get_current_user)):
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
-        employee = cursor.fetchone()
-        cursor.close()
-        conn.close()
+async def get_employee(request: Request, employee_id: int, user=Depends(get_current_user)):
+    async def produce():
+        try:
+            employee = await repositories.get_employee(employee_id)
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
         if not employee:
             raise HTTPException(status_code=404, detail="Employee not found")
         return employee
-    except Exception as e:
-        logging.error(f"Database error: {e}")
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    return await conditional_json(request, ('employees',), produce)
 
 @router.get('/erklaerung_form/{employee_id}')
-def get_erklaerung_form(employee_id: int, user=Depends(get_current_user)):
+async def get_erklaerung_form(employee_id: int, user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM erklaerung_form WHERE employee_id = %s ORDER BY id DESC LIMIT 1', (employee_id,))
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if not row:
-            raise HTTPException(status_code=404, detail='Not found')
-        return row
+        row = await repositories.get_latest_erklaerung_form(employee_id)
     except Exception as e:
         logging.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not row:
+        raise HTTPException(status_code=404, detail='Not found')
+    return row
 
 @router.put("/einkommensbescheinigung/{record_id}")
-def edit_einkommensbescheinigung(record_id: int, data: dict = Body(...), user=Depends(get_current_user)):
+async def edit_einkommensbescheinigung(record_id: int, data: dict = Body(...), user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Start transaction
-        cursor.execute("START TRANSACTION")
-        
-        # Update einkommensbescheinigung record
-        update_fields = []
-        update_values = []
-        
         # Map the fields that can be updated
         field_mapping = {
             'eintritt': 'eintritt',
@@ -265,69 +379,31 @@ def edit_einkommensbescheinigung(record_id: int, data: dict = Body(...), user=De
             'jahr': 'jahr'
         }
         
+        update_fields = {}
         for frontend_field, db_field in field_mapping.items():
             if frontend_field in data and data[frontend_field] is not None:
-                update_fields.append(f"{db_field} = %s")
-                update_values.append(data[frontend_field])
+                update_fields[db_field] = data[frontend_field]
                 logging.info(f"Updating {db_field}: {data[frontend_field]}")
         
         if update_fields:
-            update_values.append(record_id)
-            cursor.execute(f"""
-                UPDATE einkommensbescheinigung 
-                SET {', '.join(update_fields)}
-                WHERE id = %s
-            """, tuple(update_values))
-            
-            # Commit transaction
-            cursor.execute("COMMIT")
-            cursor.close()
-            conn.close()
-            
+            await repositories.update_einkommensbescheinigung(record_id, update_fields)
+            dashboard_stats.invalidate()
             return {"message": "Einkommensbescheinigung erfolgreich aktualisiert", "updated": True}
         else:
-            cursor.execute("ROLLBACK")
-            cursor.close()
-            conn.close()
             return {"message": "Keine Änderungen vorgenommen", "updated": False}
             
     except Exception as e:
-        # Rollback on error
-        try:
-            cursor.execute("ROLLBACK")
-        except:
-            pass
         logging.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.delete("/einkommensbescheinigung/{record_id}")
-def delete_einkommensbescheinigung(record_id: int, user=Depends(get_current_user)):
+async def delete_einkommensbescheinigung(record_id: int, user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Check if record exists
-        cursor.execute("SELECT id FROM einkommensbescheinigung WHERE id = %s", (record_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Einkommensbescheinigung nicht gefunden")
-        
-        # Delete the record
-        cursor.execute("DELETE FROM einkommensbescheinigung WHERE id = %s", (record_id,))
-        
-        # Commit transaction
-        cursor.execute("COMMIT")
-        cursor.close()
-        conn.close()
-        
-        return {"message": "Einkommensbescheinigung erfolgreich gelöscht", "deleted": True}
-        
-    except HTTPException:
-        raise
+        deleted = await repositories.delete_einkommensbescheinigung(record_id)
+        dashboard_stats.invalidate()
     except Exception as e:
-        # Rollback on error
-        try:
-            cursor.execute("ROLLBACK")
-        except:
-            pass
         logging.error(f"Database error: {e}")
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Einkommensbescheinigung nicht gefunden")
+    return {"message": "Einkommensbescheinigung erfolgreich gelöscht", "deleted": True}
@@ -1,169 +1,214 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Request, Body, Depends
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
-import tempfile
-from mindee import Client, product, AsyncPredictResponse
+from fastapi.responses import StreamingResponse
 import os
-from db import get_connection
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from pypdf import PdfReader, PdfWriter
-import shutil
-import tempfile
-from pypdf.generic import NameObject, BooleanObject, DictionaryObject
-from docx import Document
+from starlette.concurrency import run_in_threadpool
+import repositories
+import docx_template
+import stundenzettel_grid
+import stundenzettel_pdf
 import datetime
-import pdfplumber
-import re
-from pdf_extract_utils import extract_einkommensbescheinigung_fields
-from fastapi import Depends
 from auth import get_current_user
 import io
-import datetime
 import json
-
-MINDEE_API_KEY = os.getenv("MINDEE_API_KEY", "your_mindee_api_key")
-mindee_client = Client(api_key=MINDEE_API_KEY)
+from document_response import new_buffer, document_response, content_disposition, ranged_response
+import blob_store
+import dashboard_stats
+import holiday_calendar
+import background_jobs
+from background_jobs import JobFailed
+import id_scan
+from fastapi.encoders import jsonable_encoder
+from conditional_get import conditional_json
+import asyncio
+import base64
+import logging
+import zipfile
+from typing import List
 
 router = APIRouter()
 
 
 
-@router.post("/employees/add")
+async def _onboard_from_scan(job, content, filename):
+    """Background job behind /employees/add: scan the ID card, then create the employee."""
+    def scanning():
+        job.status = "scanning"
+    try:
+        fields = await id_scan.scanner.scan(content, filename, on_start=scanning)
+    except id_scan.IdScanError as e:
+        raise JobFailed(f"Mindee extraction error: {e}")
+    job.status = "saving"
+    # Prevent duplicate id_number
+    if await repositories.find_employee_by_id_number(fields["id_number"]):
+        raise JobFailed("Employee with this ID Number already exists.")
+    new_emp = await repositories.insert_employee(fields)
+    dashboard_stats.invalidate()
+    return {"message": "Employee added successfully", "employee": jsonable_encoder(new_emp)}
+
+@router.post("/employees/add", status_code=202)
 async def add_employee(file: UploadFile = File(...)):
+    """Queue the ID card for extraction; follow the job at /employees/add/jobs/{job_id}."""
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
+        content = await file.read()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {str(e)}")
-    try:
-        input_doc = mindee_client.source_from_path(tmp_path)
-        result: AsyncPredictResponse = mindee_client.enqueue_and_parse(
-            product.InternationalIdV2,
-            input_doc,
-        )
-        doc = result.document
-        vorname = " ".join([n.value for n in getattr(doc, 'given_names', []) if hasattr(n, 'value') and n.value])
-        # Try to extract geburtsname (birth name) if available
-        geburtsname = None
-        if hasattr(doc, 'surnames'):
-            geburtsname = " ".join([s.value for s in getattr(doc, 'surnames', []) if hasattr(s, 'value') and s.value]) or None
-        id_number = getattr(doc, 'document_number', None)
-        id_number = id_number.value if id_number and hasattr(id_number, 'value') else None
-        geburtsdatum = getattr(doc, 'birth_date', None)
-        geburtsdatum = geburtsdatum.value if geburtsdatum and hasattr(geburtsdatum, 'value') else None
-        geschlecht = getattr(doc, 'sex', None)
-        geschlecht = geschlecht.value if geschlecht and hasattr(geschlecht, 'value') else None
-        # Map M/F/D to German values
-        if geschlecht == 'M':
-            geschlecht = 'männlich'
-        elif geschlecht == 'F':
-            geschlecht = 'weiblich'
-        elif geschlecht == 'D':
-            geschlecht = 'divers'
-        staatsangehoerigkeit = getattr(doc, 'nationality', None)
-        staatsangehoerigkeit = staatsangehoerigkeit.value if staatsangehoerigkeit and hasattr(staatsangehoerigkeit, 'value') else None
-        personal_number = getattr(doc, 'personal_number', None)
-        personal_number = personal_number.value if personal_number and hasattr(personal_number, 'value') else None
-        # Fallback extraction if Mindee fields are empty
-        if not any([vorname, id_number, geburtsdatum, geschlecht, staatsangehoerigkeit, personal_number]):
-            import re
-            doc_str = str(doc)
-            def extract(pattern):
-                match = re.search(pattern, doc_str)
-                return match.group(1).strip() if match else None
-            id_number = extract(r"Document Number:\s*(.*)")
-            vorname = extract(r"Given Names:\s*(.*)")
-            geburtsname = extract(r"Surnames:\s*(.*)")
-            geschlecht = extract(r"Sex:\s*(.*)")
-            if geschlecht == 'M':
-                geschlecht = 'männlich'
-            elif geschlecht == 'F':
-                geschlecht = 'weiblich'
-            elif geschlecht == 'D':
-                geschlecht = 'divers'
-            geburtsdatum = extract(r"Birth Date:\s*(.*)")
-            staatsangehoerigkeit = extract(r"Nationality:\s*(.*)")
-            personal_number = extract(r"Personal Number:\s*(.*)")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Mindee extraction error: {str(e)}")
-    finally:
+    job = background_jobs.jobs.submit(
+        "employee_scan", lambda job: _onboard_from_scan(job, content, file.filename), filename=file.filename,
+    )
+    return job.as_dict()
+
+EMPLOYEE_BULK_MAX_FILES = int(os.getenv("EMPLOYEE_BULK_MAX_FILES", "50"))
+
+async def _onboard_batch(job, uploads):
+    """
+    Background job behind /employees/add-bulk: all scans run concurrently (bounded by the
+    scanner), existing id_numbers are looked up in one query and the new employees are
+    written with a single multi-row INSERT.
+    """
+    job.status = "scanning"
+    async def scan(filename, content):
         try:
-            os.remove(tmp_path)
-        except Exception:
-            pass
+            fields = await id_scan.scanner.scan(content, filename)
+        except Exception as e:
+            fields = e
+        job.info["scanned"] += 1
+        return fields
+    scanned = await asyncio.gather(*(scan(filename, content) for filename, content in uploads))
+
+    job.status = "saving"
+    results = []
+    candidates = {}
+    for (filename, _), fields in zip(uploads, scanned):
+        if isinstance(fields, Exception):
+            results.append({"filename": filename, "status": "error", "error": f"Mindee extraction error: {fields}"})
+        elif not fields.get("id_number"):
+            results.append({"filename": filename, "status": "error", "error": "Keine Ausweisnummer erkannt"})
+        elif fields["id_number"] in candidates:
+            results.append({"filename": filename, "status": "duplicate", "error": "Ausweisnummer mehrfach im Upload"})
+        else:
+            candidates[fields["id_number"]] = fields
+            results.append({"filename": filename, "status": "created", "id_number": fields["id_number"]})
+    existing = {row["id_number"]: row["id"] for row in await repositories.find_employees_by_id_numbers(list(candidates))}
+    for result in results:
+        if result["status"] == "created" and result["id_number"] in existing:
+            result.update(status="duplicate", employee_id=existing[result["id_number"]],
+                          error="Employee with this ID Number already exists.")
+    new_rows = [candidates[r["id_number"]] for r in results if r["status"] == "created"]
+    created = await repositories.insert_employees(new_rows) if new_rows else []
+    if created:
+        dashboard_stats.invalidate()
+    created_ids = {row["id_number"]: row["id"] for row in created}
+    for result in results:
+        if result["status"] == "created":
+            result["employee_id"] = created_ids.get(result["id_number"])
+    counts = {"created": 0, "duplicate": 0, "error": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return {**counts, "employees": jsonable_encoder(created), "results": results}
+
+@router.post("/employees/add-bulk", status_code=202)
+async def add_employees_bulk(files: List[UploadFile] = File(...), user=Depends(get_current_user)):
+    """Onboard a batch of ID cards; follow the job at /employees/add/jobs/{job_id}."""
+    if len(files) > EMPLOYEE_BULK_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Zu viele Dateien ({len(files)}), maximal {EMPLOYEE_BULK_MAX_FILES}")
+    uploads = [(f.filename, await f.read()) for f in files]
+    job = background_jobs.jobs.submit(
+        "employee_bulk_scan", lambda job: _onboard_batch(job, uploads), owner=user['id'],
+        files=len(uploads), scanned=0,
+    )
+    return job.as_dict()
+
+@router.get("/employees/add/jobs/{job_id}")
+async def add_employee_job(job_id: str, user=Depends(get_current_user)):
+    job = background_jobs.jobs.get(job_id, user)
+    if job is None or job.kind not in ("employee_scan", "employee_bulk_scan"):
+        raise HTTPException(status_code=404, detail="Job nicht gefunden")
+    return job.as_dict()
+
+EMPLOYEE_LIST_MAX_LIMIT = int(os.getenv("EMPLOYEE_LIST_MAX_LIMIT", "500"))
+
+
+def _encode_cursor(row):
+    sort_value = row['_sort_key']
+    if isinstance(sort_value, (datetime.date, datetime.datetime)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        # Prevent duplicate id_number
-        cursor.execute("SELECT id FROM employees WHERE id_number = %s", (id_number,))
-        existing = cursor.fetchone()
-        if existing:
-            cursor.close()
-            conn.close()
-            raise HTTPException(status_code=400, detail="Employee with this ID Number already exists.")
-        cursor.execute(
-            """
-            INSERT INTO employees (
-                vorname, geburtsname, geburtsdatum, geschlecht, staatsangehoerigkeit, id_number, personal_number
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """,
-            (vorname, geburtsname, geburtsdatum, geschlecht, staatsangehoerigkeit, id_number, personal_number)
-        )
-        conn.commit()
-        cursor.execute("SELECT * FROM employees WHERE id = LAST_INSERT_ID()")
-        new_emp = cursor.fetchone()
-        cursor.close()
-        conn.close()
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
-    return {"message": "Employee added successfully", "employee": new_emp}
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, employee_id = json.loads(raw)
+        return sort_value, int(employee_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor.")
+
 
 @router.get("/employees/list")
-def list_employees():
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM employees")
-        employees = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        expected_fields = [
-            "id", "id_number", "personal_number", "vorname", "geburtsname", "strasse_hausnummer", "plz_ort", "geburtsdatum", "geschlecht", "versicherungsnummer", "familienstand", "geburtsort_land", "schwerbehindert", "staatsangehoerigkeit", "arbeitnehmernummer", "iban", "bic", "eintrittsdatum", "ersteintrittsdatum", "betriebsstaette", "berufsbezeichnung", "taetigkeit", "hauptbeschaeftigung", "nebenbeschaeftigung", "weitere_beschaeftigungen", "schulabschluss", "berufsausbildung", "ausbildung_beginn", "ausbildung_ende", "baugewerbe_seit", "arbeitszeit_vollzeit", "arbeitszeit_teilzeit", "arbeitszeit_verteilung", "urlaubsanspruch", "kostenstelle", "abteilungsnummer", "personengruppe", "arbeitsverhaeltnis_befristet", "zweckbefristet", "befristung_arbeitsvertrag_zum", "schriftlicher_abschluss", "abschluss_arbeitsvertrag_am", "befristete_beschaeftigung_2monate", "weitere_angaben", "identifikationsnummer", "finanzamt_nr", "steuerklasse", "kinderfreibetraege", "konfession", "gesetzliche_krankenkasse", "elterneigenschaft", "kv", "rv", "av", "pv", "uv_gefahrtarif", "entlohnung_bezeichnung1", "entlohnung_betrag1", "entlohnung_gueltig_ab1", "entlohnung_stundenlohn1", "entlohnung_gueltig_ab_stunden1", "entlohnung_bezeichnung2", "entlohnung_betrag2", "entlohnung_gueltig_ab2", "entlohnung_stundenlohn2", "entlohnung_gueltig_ab_stunden2", "entlohnung_bezeichnung3", "entlohnung_betrag3", "entlohnung_gueltig_ab3", "entlohnung_stundenlohn3", "entlohnung_gueltig_ab_stunden3", "vwl_empfaenger", "vwl_betrag", "vwl_ag_anteil", "vwl_seit_wann", "vwl_vertragsnr", "vwl_kontonummer", "vwl_bankleitzahl", "ap_arbeitsvertrag", "ap_bescheinigung_lsta", "ap_sv_ausweis", "ap_mitgliedsbescheinigung_kk", "ap_bescheinigung_private_kk", "ap_vwl_vertrag", "ap_nachweis_elterneigenschaft", "ap_vertrag_bav", "ap_schwerbehindertenausweis", "ap_unterlagen_sozialkasse", "vorbeschaeftigung_zeitraum_von", "vorbeschaeftigung_zeitraum_bis", "vorbeschaeftigung_art", "vorbeschaeftigung_tage"
-        ]
-        for emp in employees:
-            for field in expected_fields:
-                v = emp.get(field, '')
-                if v is None:
-                    emp[field] = ''
-                elif not isinstance(v, str):
-                    emp[field] = str(v)
-        return JSONResponse(content=employees, status_code=200)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+async def list_employees(
+    request: Request,
+    fields: str = None,
+    contract_type: str = None,
+    q: str = None,
+    eintritt_von: str = None,
+    eintritt_bis: str = None,
+    sort: str = 'id',
+    order: str = 'asc',
+    cursor: str = None,
+    limit: int = None,
+):
+    """
+    Without limit: every matching employee as a plain list (what the frontend expects).
+    With limit: {"items": [...], "next_cursor": ...}; pass next_cursor back as cursor for the next page.
+    fields is a comma separated column list; values are strings with NULL as ''.
+    """
+    if fields:
+        columns = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in columns if f not in repositories.EMPLOYEE_LIST_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unbekannte Felder: {', '.join(unknown)}")
+        if 'id' not in columns:
+            columns.insert(0, 'id')
+    else:
+        columns = repositories.EMPLOYEE_LIST_COLUMNS
+    if sort not in repositories.EMPLOYEE_SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Sortierung: {sort}")
+    if order not in ('asc', 'desc'):
+        raise HTTPException(status_code=400, detail="order muss 'asc' oder 'desc' sein.")
+    if limit is not None and not 1 <= limit <= EMPLOYEE_LIST_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit muss zwischen 1 und {EMPLOYEE_LIST_MAX_LIMIT} liegen.")
+    after = _decode_cursor(cursor) if cursor else None
+
+    async def produce():
+        try:
+            # One extra row tells whether there is a next page
+            rows = await repositories.list_employees(
+                tuple(columns), contract_type=contract_type, search=q, eintritt_von=eintritt_von,
+                eintritt_bis=eintritt_bis, sort=sort, descending=order == 'desc', after=after,
+                limit=None if limit is None else limit + 1,
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1])
+        for row in rows:
+            del row['_sort_key']
+        if limit is None:
+            return rows
+        return {"items": rows, "next_cursor": next_cursor}
+
+    return await conditional_json(request, ('employees',), produce)
 
 # All endpoints below this require authentication
 @router.delete("/employees/delete/{employee_id}")
-def delete_employee(employee_id: int, user=Depends(get_current_user)):
+async def delete_employee(employee_id: int, user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # First, delete related records from erklaerung_form table
-        cursor.execute("DELETE FROM erklaerung_form WHERE employee_id = %s", (employee_id,))
-        
-        # Then delete related records from einkommensbescheinigung table if it exists
-        cursor.execute("DELETE FROM einkommensbescheinigung WHERE employee_id = %s", (employee_id,))
-        
-        # Finally delete the employee
-        cursor.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        # erklaerung_form and einkommensbescheinigung rows go first, then the employee
+        await repositories.delete_employee(employee_id)
+        dashboard_stats.invalidate()
         return {"message": f"Employee with id {employee_id} deleted successfully."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -188,88 +233,54 @@ async def edit_employee(employee_id: int, req: Request, user=Depends(get_current
     allowed_fields = [
         "vorname", "geburtsname", "strasse_hausnummer", "plz_ort", "geburtsdatum", "geschlecht", "versicherungsnummer", "familienstand", "geburtsort_land", "schwerbehindert", "staatsangehoerigkeit", "arbeitnehmernummer", "iban", "bic", "eintrittsdatum", "ersteintrittsdatum", "betriebsstaette", "berufsbezeichnung", "taetigkeit", "hauptbeschaeftigung", "nebenbeschaeftigung", "weitere_beschaeftigungen", "schulabschluss", "berufsausbildung", "ausbildung_beginn", "ausbildung_ende", "baugewerbe_seit", "arbeitszeit_vollzeit", "arbeitszeit_teilzeit", "arbeitszeit_verteilung", "urlaubsanspruch", "kostenstelle", "abteilungsnummer", "personengruppe", "arbeitsverhaeltnis_befristet", "zweckbefristet", "befristung_arbeitsvertrag_zum", "schriftlicher_abschluss", "abschluss_arbeitsvertrag_am", "befristete_beschaeftigung_2monate", "weitere_angaben", "identifikationsnummer", "finanzamt_nr", "steuerklasse", "kinderfreibetraege", "konfession", "gesetzliche_krankenkasse", "elterneigenschaft", "kv", "rv", "av", "pv", "uv_gefahrtarif", "entlohnung_bezeichnung1", "entlohnung_betrag1", "entlohnung_gueltig_ab1", "entlohnung_stundenlohn1", "entlohnung_gueltig_ab_stunden1", "entlohnung_bezeichnung2", "entlohnung_betrag2", "entlohnung_gueltig_ab2", "entlohnung_stundenlohn2", "entlohnung_gueltig_ab_stunden2", "entlohnung_bezeichnung3", "entlohnung_betrag3", "entlohnung_gueltig_ab3", "entlohnung_stundenlohn3", "entlohnung_gueltig_ab_stunden3", "vwl_empfaenger", "vwl_betrag", "vwl_ag_anteil", "vwl_seit_wann", "vwl_vertragsnr", "vwl_kontonummer", "vwl_bankleitzahl", "ap_arbeitsvertrag", "ap_bescheinigung_lsta", "ap_sv_ausweis", "ap_mitgliedsbescheinigung_kk", "ap_bescheinigung_private_kk", "ap_vwl_vertrag", "ap_nachweis_elterneigenschaft", "ap_vertrag_bav", "ap_schwerbehindertenausweis", "ap_unterlagen_sozialkasse", "vorbeschaeftigung_zeitraum_von", "vorbeschaeftigung_zeitraum_bis", "vorbeschaeftigung_art", "vorbeschaeftigung_tage", "id_number", "personal_number"
     ]
-    fields = []
-    values = []
+    fields = {}
     for field in allowed_fields:
         if field in data:
             # If value is None or empty string, store as NULL in DB
             val = data[field]
             if val is None or (isinstance(val, str) and val.strip() == ""):
                 val = None
-            fields.append(f"{field} = %s")
-            values.append(val)
+            fields[field] = val
     if not fields:
         raise HTTPException(status_code=400, detail="No valid fields provided for update.")
-    values.append(employee_id)
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(f"UPDATE employees SET {', '.join(fields)} WHERE id = %s", tuple(values))
-        conn.commit()
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
-        updated = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if not updated:
-            raise HTTPException(status_code=404, detail="Employee not found.")
-        return {"message": "Employee updated successfully", "employee": updated}
+        updated = await repositories.update_employee(employee_id, fields)
+        dashboard_stats.invalidate()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if not updated:
+        raise HTTPException(status_code=404, detail="Employee not found.")
+    return {"message": "Employee updated successfully", "employee": updated}
 
 @router.get("/employees/pdf/{employee_id}")
-def download_employee_pdf(employee_id: int, user=Depends(get_current_user)):
+async def download_employee_pdf(employee_id: int, user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
-        emp = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if not emp:
-            raise HTTPException(status_code=404, detail="Employee not found.")
-        return emp
+        emp = await repositories.get_employee(employee_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF generation error: {str(e)}")
+    if not emp:
+        raise HTTPException(status_code=404, detail="Employee not found.")
+    return emp
 
 @router.get("/arbeitsvertrag/list")
-def arbeitsvertrag_list(user=Depends(get_current_user)):
-    try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT
-                e.id AS id,
-                CONCAT(e.vorname, ' ', e.geburtsname) AS name,
-                e.strasse_hausnummer AS strasse,
-                e.plz_ort AS plz_ort,
-                e.land AS land,
-                e.contract_type AS contract_type,
-                f.beschaeftigung_beginn AS beginn,
-                f.beschaeftigung_berufsbezeichnung AS position,
-                f.arbeitszeit_stunden AS arbeitszeit_stunden,
-                f.entgelt_pro_monat_wert AS gehalt,
-                f.urlaubsanspruch_tage AS urlaub
-            FROM employees e
-            JOIN erklaerung_form f ON e.id = f.employee_id
-        ''')
-        rows = cursor.fetchall()
+async def arbeitsvertrag_list(request: Request, user=Depends(get_current_user)):
+    async def produce():
+        try:
+            rows = await repositories.list_arbeitsvertraege()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
         # Replace None with '' for frontend compatibility
         for row in rows:
             for k, v in row.items():
                 if v is None:
                     row[k] = ''
-        cursor.close()
-        conn.close()
         return rows
-    except Exception as e:
-        from fastapi import HTTPException
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    return await conditional_json(request, ('employees', 'erklaerung_form'), produce)
 
 @router.patch("/arbeitsvertrag/edit/{employee_id}")
-def arbeitsvertrag_edit(employee_id: int, data: dict = Body(...), user=Depends(get_current_user)):
+async def arbeitsvertrag_edit(employee_id: int, data: dict = Body(...), user=Depends(get_current_user)):
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
         # Employees table fields
         emp_fields = {}
         if 'name' in data:
@@ -280,10 +291,6 @@ def arbeitsvertrag_edit(employee_id: int, data: dict = Body(...), user=Depends(g
             if f in data:
                 dbf = 'strasse_hausnummer' if f == 'strasse' else f
                 emp_fields[dbf] = data[f]
-        if emp_fields:
-            sets = ', '.join([f"{k} = %s" for k in emp_fields])
-            vals = list(emp_fields.values()) + [employee_id]
-            cursor.execute(f"UPDATE employees SET {sets} WHERE id = %s", vals)
         # Erklaerung_form table fields
         erk_fields = {}
         if 'beginn' in data:
@@ -296,335 +303,317 @@ def arbeitsvertrag_edit(employee_id: int, data: dict = Body(...), user=Depends(g
             erk_fields['entgelt_pro_monat_wert'] = data['gehalt']
         if 'urlaub' in data:
             erk_fields['urlaubsanspruch_tage'] = data['urlaub']
-        if erk_fields:
-            sets = ', '.join([f"{k} = %s" for k in erk_fields])
-            vals = list(erk_fields.values()) + [employee_id]
-            cursor.execute(f"UPDATE erklaerung_form SET {sets} WHERE employee_id = %s", vals)
-        conn.commit()
-        # Return updated row
-        cursor.execute('''
-            SELECT
-                e.id AS id,
-                CONCAT(e.vorname, ' ', e.geburtsname) AS name,
-                e.strasse_hausnummer AS strasse,
-                e.plz_ort AS plz_ort,
-                e.land AS land,
-                e.contract_type AS contract_type,
-                f.beschaeftigung_beginn AS beginn,
-                f.beschaeftigung_berufsbezeichnung AS position,
-                f.arbeitszeit_stunden AS arbeitszeit_stunden,
-                f.entgelt_pro_monat_wert AS gehalt,
-                f.urlaubsanspruch_tage AS urlaub
-            FROM employees e
-            JOIN erklaerung_form f ON e.id = f.employee_id
-            WHERE e.id = %s
-        ''', (employee_id,))
-        row = cursor.fetchone()
+        # Apply both updates and return the updated row
+        row = await repositories.update_arbeitsvertrag(employee_id, emp_fields, erk_fields)
+        dashboard_stats.invalidate()
         for k, v in row.items():
             if v is None:
                 row[k] = ''
-        cursor.close()
-        conn.close()
         return row
     except Exception as e:
         from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+def _render_arbeitsvertrag(row, template_path, buffer=None):
+    def to_str(val):
+        if isinstance(val, (datetime.date, datetime.datetime)):
+            return val.strftime("%d.%m.%Y")
+        return str(val) if val is not None else ''
+    values = {
+        'name': to_str(row['name']),
+        'strasse': to_str(row['strasse']),
+        'plz_ort': to_str(row['plz_ort']),
+        'land': to_str(row['land']),
+        'beginn': to_str(row['beginn']),
+        'position': to_str(row['position']),
+        'arbeitszeit_stunden': to_str(row.get('arbeitszeit_stunden', '')),
+        'gehalt': to_str(row['gehalt']),
+        'urlaub': to_str(row['urlaub']),
+    }
+    # Parsed once per template file; only the runs holding placeholders are rewritten
+    template = docx_template.get_template(template_path)
+    buffer = new_buffer() if buffer is None else buffer
+    try:
+        template.render_into(buffer, values)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer
+
+ARBEITSVERTRAG_TEMPLATES = {
+    'TEILZEITTÄTIGKEIT': 'Arbeitsvertrag Teilzeit.docx',
+    'VOLLZEITTÄTIGKEIT': 'Arbeitsvertrag fuer Arbeitnehmer - Vollzeit .docx',
+    'TEILZEITTÄTIGKEIT - "MINIJOB"': 'Minijob-Vertrag.docx',
+}
+DOCX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+# Contracts rendered concurrently (and held in memory) while a bulk ZIP is streamed
+ARBEITSVERTRAG_EXPORT_WORKERS = int(os.getenv("ARBEITSVERTRAG_EXPORT_WORKERS", "4"))
+# Most contracts in one bulk export, whether selected by id or by filter
+ARBEITSVERTRAG_EXPORT_MAX = int(os.getenv("ARBEITSVERTRAG_EXPORT_MAX", "500"))
+
+
+def _arbeitsvertrag_template_path(contract_type):
+    # Allow download for all contract types and select template accordingly
+    if not contract_type:
+        raise HTTPException(status_code=400, detail="Vertragsart nicht gesetzt.")
+    template_file = ARBEITSVERTRAG_TEMPLATES.get(contract_type)
+    if not template_file:
+        raise HTTPException(status_code=400, detail=f"Kein Template für Vertragsart: {contract_type}")
+    template_path = os.path.join(os.path.dirname(__file__), 'filesDoc', template_file)
+    if not os.path.exists(template_path):
+        raise HTTPException(status_code=500, detail=f"Template nicht gefunden: {template_file}")
+    return template_path
+
+
+def _arbeitsvertrag_filename(row):
+    return f"Arbeitsvertrag_{row['contract_type']}_{row['name'].replace(' ', '_')}.docx"
+
+
 @router.get("/arbeitsvertrag/download/{employee_id}")
-def arbeitsvertrag_download(employee_id: int):
+async def arbeitsvertrag_download(employee_id: int):
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT
-                e.id AS id,
-                CONCAT(e.vorname, ' ', e.geburtsname) AS name,
-                e.strasse_hausnummer AS strasse,
-                e.plz_ort AS plz_ort,
-                e.land AS land,
-                e.contract_type AS contract_type,
-                f.beschaeftigung_beginn AS beginn,
-                f.beschaeftigung_berufsbezeichnung AS position,
-                f.arbeitszeit_stunden AS arbeitszeit_stunden,
-                f.entgelt_pro_monat_wert AS gehalt,
-                f.urlaubsanspruch_tage AS urlaub
-            FROM employees e
-            JOIN erklaerung_form f ON e.id = f.employee_id
-            WHERE e.id = %s
-        ''', (employee_id,))
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        row = await repositories.get_arbeitsvertrag(employee_id)
         if not row:
             raise HTTPException(status_code=404, detail="Employee/contract not found.")
-        # Allow download for all contract types and select template accordingly
-        contract_type = row['contract_type']
-        if not contract_type:
-            raise HTTPException(status_code=400, detail="Vertragsart nicht gesetzt.")
-        # Map contract type to template file
-        template_map = {
-            'TEILZEITTÄTIGKEIT': 'Arbeitsvertrag Teilzeit.docx',
-            'VOLLZEITTÄTIGKEIT': 'Arbeitsvertrag fuer Arbeitnehmer - Vollzeit .docx',
-            'TEILZEITTÄTIGKEIT - "MINIJOB"': 'Minijob-Vertrag.docx',
-        }
-        template_file = template_map.get(contract_type)
-        if not template_file:
-            raise HTTPException(status_code=400, detail=f"Kein Template für Vertragsart: {contract_type}")
-        template_path = os.path.join(os.path.dirname(__file__), 'filesDoc', template_file)
-        if not os.path.exists(template_path):
-            raise HTTPException(status_code=500, detail=f"Template nicht gefunden: {template_file}")
-        doc = Document(template_path)
-        # Replace placeholders
-        def to_str(val):
-            if isinstance(val, (datetime.date, datetime.datetime)):
-                return val.strftime("%d.%m.%Y")
-            return str(val) if val is not None else ''
-        replacements = {
-            '{{name}}': to_str(row['name']),
-            '{{strasse}}': to_str(row['strasse']),
-            '{{plz_ort}}': to_str(row['plz_ort']),
-            '{{land}}': to_str(row['land']),
-            '{{beginn}}': to_str(row['beginn']),
-            '{{position}}': to_str(row['position']),
-            '{{arbeitszeit_stunden}}': to_str(row.get('arbeitszeit_stunden', '')),
-            '{{gehalt}}': to_str(row['gehalt']),
-            '{{urlaub}}': to_str(row['urlaub']),
-        }
-        # Replace in paragraphs (handles split runs)
-        for p in doc.paragraphs:
-            for k, v in replacements.items():
-                if k in p.text:
-                    p.text = p.text.replace(k, v)
-        # Replace in tables
-        for table in doc.tables:
-            for row_cells in table.rows:
-                for cell in row_cells.cells:
-                    for k, v in replacements.items():
-                        if k in cell.text:
-                            cell.text = cell.text.replace(k, v)
-        # Save to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp:
-            doc.save(tmp.name)
-            tmp_path = tmp.name
+        template_path = _arbeitsvertrag_template_path(row['contract_type'])
+        buffer = await run_in_threadpool(_render_arbeitsvertrag, row, template_path)
         # Return file
-        filename = f"Arbeitsvertrag_{contract_type}_{row['name'].replace(' ', '_')}.docx"
-        return FileResponse(tmp_path, filename=filename, media_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document', headers={"Content-Disposition": f"attachment; filename={filename}"})
+        return document_response(buffer, _arbeitsvertrag_filename(row), DOCX_MEDIA_TYPE)
     except HTTPException:
         raise
     except Exception as e:
-        import traceback
-        print('--- Arbeitsvertrag Download Error ---')
-        print(traceback.format_exc())
+        logging.exception("Arbeitsvertrag download failed")
         raise HTTPException(status_code=500, detail=f"Docx generation error: {str(e)}")
 
+
+class _ZipChunks:
+    """Write-only sink for zipfile; the streamed archive is drained after every entry."""
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _export_employee_ids(data):
+    employee_ids = data.get('employee_ids')
+    if employee_ids is None:
+        return []
+    if not isinstance(employee_ids, list):
+        raise HTTPException(status_code=400, detail="employee_ids muss eine Liste sein.")
+    if not employee_ids:
+        raise HTTPException(status_code=400, detail="employee_ids ist leer.")
+    if len(employee_ids) > ARBEITSVERTRAG_EXPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"Zu viele Mitarbeiter ({len(employee_ids)}), maximal {ARBEITSVERTRAG_EXPORT_MAX}.")
+    try:
+        # bool is an int subclass; a float id is a client bug, not an id
+        if any(isinstance(i, (bool, float)) for i in employee_ids):
+            raise ValueError
+        return [int(i) for i in employee_ids]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="employee_ids darf nur ganze Zahlen enthalten.")
+
+
+def _render_arbeitsvertrag_bytes(row):
+    template_path = _arbeitsvertrag_template_path(row['contract_type'])
+    return _render_arbeitsvertrag(row, template_path, io.BytesIO()).getvalue()
+
+
+@router.post("/arbeitsvertrag/download-bulk")
+async def arbeitsvertrag_download_bulk(data: dict = Body(...), user=Depends(get_current_user)):
+    """
+    Contracts for many employees as one ZIP, selected by employee_ids and/or contract_type and an
+    eintrittsdatum_von/eintrittsdatum_bis range. Rows come from a single query; the archive is
+    streamed while the next contracts are rendered, so memory does not grow with the cohort.
+    Employees whose contract cannot be rendered are listed in fehler.txt inside the archive.
+    """
+    employee_ids = _export_employee_ids(data)
+    filters = {
+        'contract_type': data.get('contract_type') or None,
+        'eintritt_von': data.get('eintrittsdatum_von') or None,
+        'eintritt_bis': data.get('eintrittsdatum_bis') or None,
+    }
+    if not employee_ids and not any(filters.values()):
+        raise HTTPException(status_code=400, detail="Keine Mitarbeiter oder Filter angegeben.")
+    try:
+        # One row over the maximum tells a too-large cohort apart without loading all of it
+        rows = await repositories.list_arbeitsvertraege_for_export(
+            employee_ids, limit=ARBEITSVERTRAG_EXPORT_MAX + 1, **filters)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    if len(rows) > ARBEITSVERTRAG_EXPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"Mehr als {ARBEITSVERTRAG_EXPORT_MAX} Arbeitsverträge ausgewählt, bitte Filter einschränken.")
+    # An employee with several erklaerung_form rows appears once, like the single download
+    unique = {}
+    for row in rows:
+        unique.setdefault(row['id'], row)
+    rows = list(unique.values())
+    if not rows:
+        raise HTTPException(status_code=404, detail="Keine Arbeitsverträge gefunden.")
+
+    async def render(row):
+        try:
+            return row, await run_in_threadpool(_render_arbeitsvertrag_bytes, row)
+        except HTTPException as e:
+            return row, e.detail
+        except Exception as e:
+            logging.error(f"Arbeitsvertrag {row['id']} could not be rendered: {e}")
+            return row, f"Docx generation error: {e}"
+
+    async def stream():
+        sink = _ZipChunks()
+        errors = []
+        # Entries are stored as-is: a .docx is already deflated
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+            step = max(ARBEITSVERTRAG_EXPORT_WORKERS, 1)
+            for i in range(0, len(rows), step):
+                for row, result in await asyncio.gather(*(render(row) for row in rows[i:i + step])):
+                    if isinstance(result, bytes):
+                        archive.writestr(f"{row['id']}_{_arbeitsvertrag_filename(row)}", result)
+                    else:
+                        errors.append(f"{row['id']} {row['name']}: {result}")
+                    yield sink.drain()
+            if errors:
+                archive.writestr("fehler.txt", "\n".join(errors) + "\n")
+        yield sink.drain()
+
+    filename = f"Arbeitsvertraege_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.zip"
+    return StreamingResponse(stream(), media_type="application/zip",
+                             headers={"Content-Disposition": content_disposition(filename)})
+
 @router.get("/employees/stundenzettel-data/{employee_id}")
-def get_stundenzettel_data(employee_id: int, year: int, user=Depends(get_current_user)):
+async def get_stundenzettel_data(employee_id: int, year: int, state: str = holiday_calendar.HOLIDAY_DEFAULT_STATE,
+                                 user=Depends(get_current_user)):
+    state = _holiday_state(state)
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
-        emp = cursor.fetchone()
+        emp = await repositories.get_employee(employee_id)
         if not emp:
-            cursor.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Employee not found.")
-        cursor.execute("SELECT * FROM company LIMIT 1")
-        company = cursor.fetchone()
+        company = await repositories.get_first_company()
         # Fetch daily entries for the year
-        cursor.execute("""
-            SELECT * FROM einkommensbescheinigung
-            WHERE employee_id = %s AND jahr = %s
-        """, (employee_id, str(year)))
-        rows = cursor.fetchall()
+        rows = await repositories.list_entries(employee_id, year)
         # Build entries dict: entries[month][day] = {...}
-        entries = {}
-        for row in rows:
-            month = int(row.get('monat', '0'))
-            # Assume 'tag' field exists, else skip (if not, you need to add day info to your table)
-            day = row.get('tag')
-            if not day:
-                continue
-            day = str(day).zfill(2)
-            if month not in entries:
-                entries[month] = {}
-            entries[month][day] = {
-                'beginn': row.get('beginn', ''),
-                'pause': row.get('pause', ''),
-                'ende': row.get('ende', ''),
-                'dauer': row.get('dauer', ''),
-                'code': row.get('code', ''),
-                'aufgezeichnet_am': row.get('aufgezeichnet_am', ''),
-                'bemerkungen': row.get('bemerkungen', ''),
-            }
-        cursor.close()
-        conn.close()
+        entries = stundenzettel_grid.year_entries(rows)
         company_name = company["name"] if company else ""
         employee_name = f"{emp.get('vorname', '')} {emp.get('geburtsname', '')}".strip()
         employee_number = emp.get('personal_number', '')
         arbeitszeit_verteilung = emp.get('arbeitszeit_verteilung', '')
+        # Same calendar as the server-side PDF, so the frontend renderer marks the same days
+        holidays = holiday_calendar.holiday_map(await holiday_calendar.calendar.holidays(year, state))
         return {
             "companyName": company_name,
             "employeeName": employee_name,
             "employeeNumber": employee_number,
             "year": year,
             "entries": entries,
-            "arbeitszeitVerteilung": arbeitszeit_verteilung
+            "arbeitszeitVerteilung": arbeitszeit_verteilung,
+            "holidays": holidays,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 # --- NEW: Stundenzettel Multi-Employee PDF and History ---
 
+async def _load_stundenzettel_employees(employee_ids, year, month):
+    """
+    Employees (in request order, unknown ids skipped), the company and each employee's
+    entries for the month: three queries however many employees are requested.
+    """
+    ids = list(dict.fromkeys(int(eid) for eid in employee_ids))
+    emps, company, entries_by_employee = await asyncio.gather(
+        repositories.get_employees(ids),
+        repositories.get_first_company(),
+        repositories.list_entries_for_employees(ids, year, month),
+    )
+    emps_by_id = {emp['id']: emp for emp in emps}
+    found = [(emps_by_id[eid], entries_by_employee.get(eid, [])) for eid in ids if eid in emps_by_id]
+    return found, company
+
+def _month_holidays(holidays, month):
+    """Holiday days of the month from a list of days or the /holidays map {month: {day: true}}."""
+    if isinstance(holidays, dict):
+        holidays = holidays.get(str(month)) or holidays.get(month) or {}
+    return {str(day).zfill(2) for day in holidays or []}
+
+def _holiday_state(state):
+    state = state or holiday_calendar.HOLIDAY_DEFAULT_STATE
+    if not holiday_calendar.is_valid_state(state):
+        raise HTTPException(status_code=400, detail=f"Unbekanntes Bundesland: {state}")
+    return state
+
+async def _stundenzettel_holidays(data, year, month):
+    """Holiday days of the month: the client's own list if it sends one, else the holiday calendar for 'state'."""
+    if data.get('holidays') is not None:
+        return _month_holidays(data['holidays'], month)
+    return await holiday_calendar.calendar.month_days(year, month, _holiday_state(data.get('state')))
+
 @router.post("/employees/stundenzettel-pdf")
-def generate_stundenzettel_pdf(data: dict = Body(...), user=Depends(get_current_user)):
+async def generate_stundenzettel_pdf(data: dict = Body(...), user=Depends(get_current_user)):
     employee_ids = data.get('employee_ids', [])
     month = int(data.get('month'))
     year = int(data.get('year'))
     if not employee_ids or not month or not year:
         raise HTTPException(status_code=400, detail="Missing parameters.")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    holidays = await _stundenzettel_holidays(data, year, month)
     employees = []
-    for eid in employee_ids:
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (eid,))
-        emp = cursor.fetchone()
-        if not emp:
-            continue
-        cursor.execute("SELECT * FROM company LIMIT 1")
-        company = cursor.fetchone()
-        cursor.execute("SELECT * FROM einkommensbescheinigung WHERE employee_id = %s AND jahr = %s AND monat = %s", (eid, str(year), str(month)))
-        rows = cursor.fetchall()
-        entries = {}
-        for row in rows:
-            day = row.get('tag')
-            if not day:
-                continue
-            day = str(day).zfill(2)
-            entries[day] = {
-                'beginn': row.get('beginn', ''),
-                'pause': row.get('pause', ''),
-                'ende': row.get('ende', ''),
-                'dauer': row.get('dauer', ''),
-                'code': row.get('code', ''),
-                'aufgezeichnet_am': row.get('aufgezeichnet_am', ''),
-                'bemerkungen': row.get('bemerkungen', ''),
-            }
+    found, company = await _load_stundenzettel_employees(employee_ids, year, month)
+    for emp, rows in found:
+        arbeitszeit_verteilung = emp.get('arbeitszeit_verteilung', '')
         employees.append({
             'companyName': company["name"] if company else "",
             'employeeName': f"{emp.get('vorname', '')} {emp.get('geburtsname', '')}".strip(),
             'employeeNumber': emp.get('personal_number', ''),
-            'entries': entries,
-            'arbeitszeitVerteilung': emp.get('arbeitszeit_verteilung', ''),
+            'entries': stundenzettel_grid.build_month_grid(rows, year, month, arbeitszeit_verteilung, holidays),
+            'arbeitszeitVerteilung': arbeitszeit_verteilung,
         })
-    cursor.close()
-    conn.close()
     if not employees:
         raise HTTPException(status_code=404, detail="No employees found.")
-    # Generate PDF using ReportLab (placeholder)
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    import io
-    import json
-    from datetime import datetime
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    c.drawString(100, 800, f"Stundenzettel PDF for {len(employees)} employees, {month}/{year}")
-    for idx, emp in enumerate(employees):
-        c.drawString(100, 780 - idx*20, f"{emp['employeeName']} ({emp['employeeNumber']})")
-    c.showPage()
-    c.save()
-    buffer.seek(0)
-    # Save download log
-    conn = get_connection()
-    cursor = conn.cursor()
+    try:
+        file_blob = await stundenzettel_pdf.render_stundenzettel_pdf_batch(employees, year, month, holidays)
+    except Exception as e:
+        logging.error(f"Stundenzettel PDF could not be rendered: {e}")
+        raise HTTPException(status_code=500, detail=f"PDF generation error: {str(e)}")
+    # Save download log; the PDF itself goes to the blob store
+    file_key = await run_in_threadpool(blob_store.get_store().put, file_blob)
     employee_names = [emp['employeeName'] for emp in employees]
-    filename = f"Stundenzettel_{year}_{month}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-    file_blob = buffer.getvalue()
-    cursor.execute(
-        """
-        INSERT INTO stundenzettel_downloads (user_id, employee_ids, employee_names, month, year, download_date, file_blob, filename)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            user['id'],
-            json.dumps(employee_ids),
-            json.dumps(employee_names),
-            month,
-            year,
-            datetime.now(),
-            file_blob,
-            filename
-        )
+    filename = f"Stundenzettel_{year}_{month}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+    await repositories.insert_stundenzettel_download(
+        user['id'],
+        json.dumps(employee_ids),
+        json.dumps(employee_names),
+        month,
+        year,
+        datetime.datetime.now(),
+        filename,
+        file_key
     )
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return StreamingResponse(io.BytesIO(file_blob), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    return document_response(file_blob, filename, "application/pdf")
 
 @router.post("/employees/stundenzettel-pdf-data")
-def get_stundenzettel_pdf_data(data: dict = Body(...), user=Depends(get_current_user)):
+async def get_stundenzettel_pdf_data(data: dict = Body(...), user=Depends(get_current_user)):
     employee_ids = data.get('employee_ids', [])
     month = int(data.get('month'))
     year = int(data.get('year'))
     if not employee_ids or not month or not year:
         raise HTTPException(status_code=400, detail="Missing parameters.")
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    holidays = await _stundenzettel_holidays(data, year, month)
     employees = []
-    from calendar import monthrange
-    import math
-    def hours_to_hhmm(hours):
-        if not hours or math.isnan(hours):
-            return ''
-        h = int(hours)
-        m = int(round((hours - h) * 60))
-        return f"{h:02d}:{m:02d}"
-    weekday_map = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So']
-    for eid in employee_ids:
-        cursor.execute("SELECT * FROM employees WHERE id = %s", (eid,))
-        emp = cursor.fetchone()
-        if not emp:
-            continue
-        cursor.execute("SELECT * FROM company LIMIT 1")
-        company = cursor.fetchone()
-        # Get arbeitszeit_verteilung as dict {weekday: hours}
+    found, company = await _load_stundenzettel_employees(employee_ids, year, month)
+    for emp, rows in found:
         arbeitszeit_verteilung = emp.get('arbeitszeit_verteilung', '')
-        verteilung = {}
-        for part in (arbeitszeit_verteilung or '').split(','):
-            if ':' in part:
-                w, h = part.split(':')
-                try:
-                    verteilung[w.strip()] = float(h.strip())
-                except:
-                    pass
-        # Fetch all entries for the month
-        cursor.execute("SELECT * FROM einkommensbescheinigung WHERE employee_id = %s AND jahr = %s AND monat = %s", (eid, str(year), str(month)))
-        rows = cursor.fetchall()
-        # Build entries dict for all days in month
-        entries = {}
-        num_days = monthrange(year, month)[1]
-        for day in range(1, num_days + 1):
-            day_str = str(day).zfill(2)
-            # Find DB entry for this day
-            row = next((r for r in rows if str(r.get('tag')).zfill(2) == day_str), None)
-            if row:
-                dauer = row.get('dauer', '')
-            else:
-                # Get weekday for this date
-                import datetime
-                dt = datetime.date(year, month, day)
-                weekday = weekday_map[dt.weekday()]  # 0=Monday
-                hours = verteilung.get(weekday, 0)
-                dauer = hours_to_hhmm(hours) if hours else ''
-            entries[day_str] = {
-                'beginn': row.get('beginn', '') if row else '',
-                'pause': row.get('pause', '') if row else '',
-                'ende': row.get('ende', '') if row else '',
-                'dauer': dauer,
-                'code': row.get('code', '') if row else '',
-                'aufgezeichnet_am': row.get('aufgezeichnet_am', '') if row else '',
-                'bemerkungen': row.get('bemerkungen', '') if row else '',
-            }
+        # Recorded days as stored, every other day from the planned hours per weekday
+        entries = stundenzettel_grid.build_month_grid(rows, year, month, arbeitszeit_verteilung, holidays)
         employees.append({
             'companyName': company["name"] if company else "",
             'employeeName': f"{emp.get('vorname', '')} {emp.get('geburtsname', '')}".strip(),
@@ -632,14 +621,14 @@ def get_stundenzettel_pdf_data(data: dict = Body(...), user=Depends(get_current_
             'entries': entries,
             'arbeitszeitVerteilung': arbeitszeit_verteilung,
         })
-    cursor.close()
-    conn.close()
     if not employees:
         raise HTTPException(status_code=404, detail="No employees found.")
-    return {"employees": employees, "month": month, "year": year}
+    # Same {month: {day: true}} shape as /holidays, for StundenzettelPDFDocument
+    holiday_days = {month: {day: True for day in sorted(holidays)}} if holidays else {}
+    return {"employees": employees, "month": month, "year": year, "holidays": holiday_days}
 
 @router.post("/employees/stundenzettel-log-download")
-def log_stundenzettel_download(
+async def log_stundenzettel_download(
     employee_ids: str = Body(...),
     month: int = Body(...),
     year: int = Body(...),
@@ -653,56 +642,49 @@ def log_stundenzettel_download(
         employee_ids = pyjson.loads(employee_ids)
     if isinstance(employee_names, str):
         employee_names = pyjson.loads(employee_names)
-    filename = f"Stundenzettel_{year}_{month}_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
-    file_blob = None
+    filename = f"Stundenzettel_{year}_{month}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}.pdf"
+    file_key = None
     if file is not None:
-        file_blob = file.file.read()
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        INSERT INTO stundenzettel_downloads (user_id, employee_ids, employee_names, month, year, download_date, filename, file_blob)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """,
-        (
-            user['id'],
-            pyjson.dumps(employee_ids),
-            pyjson.dumps(employee_names),
-            month,
-            year,
-            datetime.now(),
-            filename,
-            file_blob
-        )
+        file_key = await run_in_threadpool(blob_store.get_store().put, await file.read())
+    await repositories.insert_stundenzettel_download(
+        user['id'],
+        pyjson.dumps(employee_ids),
+        pyjson.dumps(employee_names),
+        month,
+        year,
+        datetime.datetime.now(),
+        filename,
+        file_key
     )
-    conn.commit()
-    cursor.close()
-    conn.close()
     return {"message": "Download logged with file"}
 
 @router.get("/employees/stundenzettel-history")
-def get_stundenzettel_history(user=Depends(get_current_user)):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, employee_names, month, year, download_date, filename FROM stundenzettel_downloads WHERE user_id = %s ORDER BY download_date DESC", (user['id'],))
-    rows = cursor.fetchall()
+async def get_stundenzettel_history(user=Depends(get_current_user)):
+    rows = await repositories.list_stundenzettel_downloads(user['id'])
     for row in rows:
         try:
             row['employee_names'] = json.loads(row['employee_names'])
         except:
             row['employee_names'] = []
-    cursor.close()
-    conn.close()
     return rows
 
 @router.get("/employees/stundenzettel-history/{download_id}/download")
-def download_stundenzettel_history(download_id: int, user=Depends(get_current_user)):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT file_blob, filename, user_id FROM stundenzettel_downloads WHERE id = %s", (download_id,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
+async def download_stundenzettel_history(download_id: int, request: Request, user=Depends(get_current_user)):
+    row = await repositories.get_stundenzettel_download(download_id)
     if not row or row['user_id'] != user['id']:
         raise HTTPException(status_code=404, detail="Not found.")
-    return StreamingResponse(io.BytesIO(row['file_blob']), media_type="application/pdf", headers={"Content-Disposition": f"attachment; filename={row['filename']}"})
\ No newline at end of file
+    range_header = request.headers.get('range')
+    if row['file_key']:
+        store = blob_store.get_store()
+        try:
+            size = await run_in_threadpool(store.size, row['file_key'])
+        except blob_store.BlobNotFound:
+            raise HTTPException(status_code=404, detail="Datei nicht gefunden.")
+        return ranged_response(lambda start, end: store.iter_range(row['file_key'], start, end),
+                               size, row['filename'], "application/pdf", range_header)
+    if row['has_blob']:
+        # Logged before the blob store existed
+        blob = await repositories.get_stundenzettel_download_blob(download_id)
+        return ranged_response(lambda start, end: iter([blob[start:end + 1]]),
+                               len(blob), row['filename'], "application/pdf", range_header)
+    raise HTTPException(status_code=404, detail="Datei nicht gefunden.")
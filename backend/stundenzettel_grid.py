@@ -0,0 +1,93 @@
+"""
+Month grids for the Stundenzettel endpoints.
+
+Entry rows are indexed by day once, the calendar of a (year, month) is computed once
+per process and a parsed arbeitszeit_verteilung is cached by its text, so building a
+grid is a single pass over the days of the month.
+"""
+import calendar
+import datetime
+import math
+from functools import lru_cache
+from types import MappingProxyType
+
+WEEKDAYS = ['Mo', 'Di', 'Mi', 'Do', 'Fr', 'Sa', 'So']
+ENTRY_FIELDS = ('beginn', 'pause', 'ende', 'dauer', 'code', 'aufgezeichnet_am', 'bemerkungen')
+
+
+@lru_cache(maxsize=256)
+def month_calendar(year, month):
+    """((day '01'..'31', weekday 'Mo'..'So'), ...) for the month."""
+    return tuple(
+        (str(day).zfill(2), WEEKDAYS[datetime.date(year, month, day).weekday()])
+        for day in range(1, calendar.monthrange(year, month)[1] + 1)
+    )
+
+
+@lru_cache(maxsize=1024)
+def parse_verteilung(arbeitszeit_verteilung):
+    """'Mo:4,Di:4.5' -> {'Mo': 4.0, 'Di': 4.5}; unreadable parts are skipped."""
+    verteilung = {}
+    for part in (arbeitszeit_verteilung or '').split(','):
+        if ':' in part:
+            w, h = part.split(':')
+            try:
+                verteilung[w.strip()] = float(h.strip())
+            except ValueError:
+                pass
+    return MappingProxyType(verteilung)
+
+
+def hours_to_hhmm(hours):
+    if not hours or math.isnan(hours):
+        return ''
+    h = int(hours)
+    m = int(round((hours - h) * 60))
+    return f"{h:02d}:{m:02d}"
+
+
+def entry_from_row(row):
+    return {field: row.get(field, '') for field in ENTRY_FIELDS}
+
+
+def index_rows(rows):
+    """Entry rows by zero-padded day; rows without a day are skipped, the first row of a day wins."""
+    by_day = {}
+    for row in rows:
+        day = row.get('tag')
+        if day:
+            by_day.setdefault(str(day).zfill(2), row)
+    return by_day
+
+
+def month_entries(rows):
+    """Recorded entries only: {day: entry}."""
+    return {day: entry_from_row(row) for day, row in index_rows(rows).items()}
+
+
+def year_entries(rows):
+    """Recorded entries of a year: {month: {day: entry}}."""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(int(row.get('monat', '0')), []).append(row)
+    return {month: month_entries(month_rows) for month, month_rows in by_month.items()}
+
+
+def build_month_grid(rows, year, month, arbeitszeit_verteilung='', holidays=()):
+    """
+    Every day of the month: the recorded entry, or otherwise the planned hours for that
+    weekday from arbeitszeit_verteilung. Days listed in holidays get no planned hours.
+    """
+    by_day = index_rows(rows)
+    verteilung = parse_verteilung(arbeitszeit_verteilung or '')
+    grid = {}
+    for day, weekday in month_calendar(year, month):
+        row = by_day.get(day)
+        if row is not None:
+            grid[day] = entry_from_row(row)
+            continue
+        hours = 0 if day in holidays else verteilung.get(weekday, 0)
+        entry = dict.fromkeys(ENTRY_FIELDS, '')
+        entry['dauer'] = hours_to_hhmm(hours) if hours else ''
+        grid[day] = entry
+    return grid
@@ -0,0 +1,221 @@
+"""
+Server-side Stundenzettel PDF (layout of Stundenzettel-2024.pdf, one A4 page per employee).
+
+Everything that is the same on every page (frame, table header, signature block, legend,
+footer) is drawn once per document into a ReportLab form XObject, and so is the column of
+calendar days for the month; each page then only adds the employee's own text. Large
+batches are split into chunks rendered in the process pool and merged into one PDF.
+Settings (env):
+- STUNDENZETTEL_PAGES_PER_JOB: employees per worker job; smaller batches render in a thread
+- STUNDENZETTEL_LOGO_PATH: logo drawn top right (default: the frontend's public/pdf-assets/logo.png)
+"""
+import asyncio
+import io
+import os
+import re
+
+from pypdf import PdfWriter
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from starlette.concurrency import run_in_threadpool
+
+from extraction_executor import executor as pdf_executor
+from stundenzettel_grid import month_calendar
+
+STUNDENZETTEL_PAGES_PER_JOB = int(os.getenv("STUNDENZETTEL_PAGES_PER_JOB", "25"))
+STUNDENZETTEL_LOGO_PATH = os.getenv(
+    "STUNDENZETTEL_LOGO_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "public", "pdf-assets", "logo.png"),
+)
+
+MONTH_NAMES = ['', 'Januar', 'Februar', 'März', 'April', 'Mai', 'Juni', 'Juli',
+               'August', 'September', 'Oktober', 'November', 'Dezember']
+LEGEND = [('K', 'Krank'), ('U', 'Urlaub'), ('UU', 'unbezahlter Urlaub'), ('F', 'Feiertag'),
+          ('SA', 'Stundenweise abwesend'), ('SU', 'Stundenweise Urlaub')]
+DEFAULT_BEGINN = '08:30'
+DEFAULT_PAUSE = '1:00'
+HHMM_RE = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+FONT, FONT_BOLD = 'Helvetica', 'Helvetica-Bold'
+GREY = 0.75
+# Table geometry in points from the top of the page, as in Stundenzettel-2024.pdf
+COLUMNS = [70.2, 103.4, 149.3, 195.7, 235.7, 281.9, 304.8, 366.3, 505.6]
+HEADER_TOP, HEADER_BOTTOM = 98.6, 120.0
+ROW_HEIGHT = 16.7
+# 31 days plus one empty row
+GRID_ROWS = 32
+# Header value boxes: (left, right) and the top of each line
+BOX_WIDE = (195.7, 414)
+BOX_PERSNR = (195.7, 235.7)
+BOX_MONTH = (304.8, 414)
+LINE_TOPS = (50, 67, 84)
+
+
+def _y(top):
+    return PAGE_HEIGHT - top
+
+
+def _text(c, x, top, text, size=9, font=FONT, align='left'):
+    c.setFont(font, size)
+    if align == 'center':
+        c.drawCentredString(x, _y(top), text)
+    elif align == 'right':
+        c.drawRightString(x, _y(top), text)
+    else:
+        c.drawString(x, _y(top), text)
+
+
+def _fit(text, width, size=9, font=FONT):
+    """Cut text so it fits into width points."""
+    if stringWidth(text, font, size) <= width:
+        return text
+    while text and stringWidth(text + '…', font, size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def _draw_furniture(c):
+    c.setLineWidth(0.8)
+    _text(c, 72, 42, 'Vorlage zur Dokumentation der täglichen Arbeitszeit', size=9.5)
+    for top, label in zip(LINE_TOPS, ('Firma:', 'Name des Mitarbeiters:', 'Pers.-Nr.:')):
+        _text(c, 72, top + 10, label, font=FONT_BOLD)
+    _text(c, 250, LINE_TOPS[2] + 10, 'Monat/Jahr:')
+    for (left, right), top in ((BOX_WIDE, LINE_TOPS[0]), (BOX_WIDE, LINE_TOPS[1]),
+                               (BOX_PERSNR, LINE_TOPS[2]), (BOX_MONTH, LINE_TOPS[2])):
+        c.rect(left, _y(top + 14), right - left, 14)
+    if os.path.exists(STUNDENZETTEL_LOGO_PATH):
+        c.drawImage(STUNDENZETTEL_LOGO_PATH, 461, _y(78), width=43, height=43,
+                    preserveAspectRatio=True, mask='auto')
+
+    # Table header and grid
+    left, right = COLUMNS[0], COLUMNS[-1]
+    table_bottom = HEADER_BOTTOM + GRID_ROWS * ROW_HEIGHT
+    c.setFillGray(GREY)
+    c.rect(left, _y(HEADER_BOTTOM), right - left, HEADER_BOTTOM - HEADER_TOP, stroke=0, fill=1)
+    c.setFillGray(0)
+    c.rect(left, _y(table_bottom), right - left, table_bottom - HEADER_TOP)
+    for x in COLUMNS[1:-1]:
+        c.line(x, _y(HEADER_TOP), x, _y(table_bottom))
+    for row in range(GRID_ROWS):
+        top = HEADER_BOTTOM + row * ROW_HEIGHT
+        c.line(left, _y(top), right, _y(top))
+    headers = [('Kalen-', 'dertag'), ('Beginn', '(Uhrzeit)'), ('Pause', '(Dauer)'), ('Ende', '(Uhrzeit)'),
+               ('Dauer', '(Summe)'), ('*', ''), ('aufgezeichnet', 'am:'), ('Bemerkungen', '')]
+    for i, (main, sub) in enumerate(headers):
+        center = (COLUMNS[i] + COLUMNS[i + 1]) / 2
+        if sub:
+            _text(c, center, 109, main, size=8.5, font=FONT_BOLD, align='center')
+            _text(c, center, 117.5, sub, size=7.8, align='center')
+        else:
+            _text(c, center, 113, main, size=8.5, font=FONT_BOLD, align='center')
+
+    # Summe with a double underline below the Dauer column
+    _text(c, COLUMNS[4] - 4, 667, 'Summe:', align='right')
+    c.line(COLUMNS[4], _y(669), COLUMNS[5], _y(669))
+    c.line(COLUMNS[4], _y(671), COLUMNS[5], _y(671))
+
+    for line_left, line_right, who in ((103.4, 281.9, 'Arbeitnehmers'), (304.8, 481.9, 'Arbeitgebers')):
+        c.line(line_left, _y(693), line_right, _y(693))
+        _text(c, line_left + 12, 703, 'Datum', size=7.8)
+        _text(c, line_left + 62, 703, f'Unterschrift des {who}', size=7.8)
+
+    _text(c, 72, 719.5, '* Tragen Sie in diese Spalte eines der folgenden Kürzel ein, '
+                        'wenn es für diesen Kalendertag zutrifft:', size=7.8)
+    c.setFillGray(GREY)
+    c.rect(COLUMNS[3], _y(784), COLUMNS[5] - COLUMNS[3], 60, stroke=0, fill=1)
+    c.setFillGray(0)
+    _text(c, (COLUMNS[3] + COLUMNS[5]) / 2, 758, 'Schlüssel', size=7.8, align='center')
+    for i, (code, label) in enumerate(LEGEND):
+        top = 734 + i * 9.9
+        _text(c, COLUMNS[5] + 1.5, top, code, size=7.8)
+        _text(c, COLUMNS[6] + 1.5, top, label, size=7.8)
+
+    _text(c, 55, 840, '© DATEV eG 2015, alle Rechte vorbehalten', size=7)
+    _text(c, 540, 840, 'Stand 01/2015', size=7, align='right')
+
+
+def _draw_days(c, year, month):
+    for row, (day, weekday) in enumerate(month_calendar(year, month)):
+        _text(c, COLUMNS[0] + 4, HEADER_BOTTOM + row * ROW_HEIGHT + 11.5, f'{weekday}, {day}')
+
+
+def _row_cells(weekday, day, entry, holidays):
+    """Cell texts of one day, following the rules of the frontend's StundenzettelPDFDocument."""
+    if weekday == 'So' or day in holidays:
+        return ['', '', '', '', 'F' if day in holidays else '', '', '']
+    dauer = entry.get('dauer') or ''
+    ende = ''
+    match = HHMM_RE.match(dauer)
+    if match:
+        total = 8 * 60 + 30 + 60 + int(match.group(1)) * 60 + int(match.group(2))
+        ende = f'{total // 60:02d}:{total % 60:02d}'
+    return [DEFAULT_BEGINN, DEFAULT_PAUSE, ende, dauer,
+            entry.get('code') or '', str(entry.get('aufgezeichnet_am') or ''), entry.get('bemerkungen') or '']
+
+
+def render_stundenzettel_pdf(employees, year, month, holidays=()):
+    """
+    PDF bytes with one page per employee. employees are dicts as returned by
+    /employees/stundenzettel-pdf-data; holidays are the zero-padded days of the month.
+    """
+    holidays = set(holidays)
+    buffer = io.BytesIO()
+    # invariant: identical input gives identical bytes, so re-generated files dedupe in the blob store
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=1, invariant=1)
+    c.setTitle(f'Stundenzettel {MONTH_NAMES[month]} {year}')
+    c.beginForm('furniture')
+    _draw_furniture(c)
+    c.endForm()
+    c.beginForm('days')
+    _draw_days(c, year, month)
+    c.endForm()
+    days = month_calendar(year, month)
+    for emp in employees:
+        c.doForm('furniture')
+        c.doForm('days')
+        _text(c, (BOX_WIDE[0] + BOX_WIDE[1]) / 2, LINE_TOPS[0] + 10.5, _fit(emp.get('companyName') or '', BOX_WIDE[1] - BOX_WIDE[0] - 8), align='center')
+        _text(c, (BOX_WIDE[0] + BOX_WIDE[1]) / 2, LINE_TOPS[1] + 10.5, _fit(emp.get('employeeName') or '', BOX_WIDE[1] - BOX_WIDE[0] - 8), align='center')
+        _text(c, (BOX_PERSNR[0] + BOX_PERSNR[1]) / 2, LINE_TOPS[2] + 10.5, str(emp.get('employeeNumber') or ''), align='center')
+        _text(c, (BOX_MONTH[0] + BOX_MONTH[1]) / 2, LINE_TOPS[2] + 10.5, f'{MONTH_NAMES[month]} {year}', align='center')
+        entries = emp.get('entries') or {}
+        for row, (day, weekday) in enumerate(days):
+            top = HEADER_BOTTOM + row * ROW_HEIGHT + 11.5
+            for col, value in enumerate(_row_cells(weekday, day, entries.get(day, {}), holidays), start=1):
+                if not value:
+                    continue
+                width = COLUMNS[col + 1] - COLUMNS[col] - 6
+                if col == 7:
+                    _text(c, COLUMNS[col] + 3, top, _fit(value, width))
+                else:
+                    _text(c, (COLUMNS[col] + COLUMNS[col + 1]) / 2, top, _fit(value, width), align='center')
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _merge_pdfs(documents):
+    writer = PdfWriter()
+    for document in documents:
+        writer.append(io.BytesIO(document))
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+async def render_stundenzettel_pdf_batch(employees, year, month, holidays=()):
+    """
+    Like render_stundenzettel_pdf, but batches larger than STUNDENZETTEL_PAGES_PER_JOB are
+    rendered in chunks across the process pool and merged in order (with a single worker
+    the merge would only add cost, so the batch renders in one piece).
+    """
+    holidays = sorted(holidays)
+    step = max(STUNDENZETTEL_PAGES_PER_JOB, 1)
+    if len(employees) <= step or pdf_executor.workers < 2:
+        return await run_in_threadpool(render_stundenzettel_pdf, employees, year, month, holidays)
+    chunks = [employees[i:i + step] for i in range(0, len(employees), step)]
+    documents = await asyncio.gather(*(
+        pdf_executor.run(render_stundenzettel_pdf, chunk, year, month, holidays) for chunk in chunks
+    ))
+    return await run_in_threadpool(_merge_pdfs, documents)
@@ -0,0 +1,67 @@
+"""Bulk Arbeitsvertrag export: input validation, batch limit and the streamed archive."""
+import io
+import zipfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import repositories
+import routes_employees
+from auth import get_current_user
+
+
+@pytest.fixture
+def client(monkeypatch):
+    queries = []
+
+    async def list_arbeitsvertraege_for_export(employee_ids=None, limit=None, **filters):
+        queries.append({"employee_ids": employee_ids, "limit": limit, **filters})
+        rows = [{"id": i, "name": f"Person {i}", "contract_type": "minijob"} for i in employee_ids or range(1, 8)]
+        return rows[:limit]
+
+    monkeypatch.setattr(repositories, "list_arbeitsvertraege_for_export", list_arbeitsvertraege_for_export)
+    monkeypatch.setattr(routes_employees, "_render_arbeitsvertrag_bytes", lambda row: f"docx {row['id']}".encode())
+    monkeypatch.setattr(routes_employees, "ARBEITSVERTRAG_EXPORT_MAX", 5)
+    app = FastAPI()
+    app.include_router(routes_employees.router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "role": "admin", "username": "admin"}
+    client = TestClient(app)
+    client.queries = queries
+    return client
+
+
+def _export(client, body):
+    return client.post("/arbeitsvertrag/download-bulk", json=body)
+
+
+def test_archive_for_ids(client):
+    response = _export(client, {"employee_ids": [3, "4"]})
+    assert response.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(response.content)).namelist()
+    assert names == ["3_Arbeitsvertrag_minijob_Person_3.docx", "4_Arbeitsvertrag_minijob_Person_4.docx"]
+    assert client.queries[0]["employee_ids"] == [3, 4]
+
+
+@pytest.mark.parametrize("body, detail", [
+    ({"employee_ids": "1,2"}, "Liste"),
+    ({"employee_ids": [1, "zwei"]}, "ganze Zahlen"),
+    ({"employee_ids": [1, None]}, "ganze Zahlen"),
+    ({"employee_ids": [1.5]}, "ganze Zahlen"),
+    ({"employee_ids": []}, "leer"),
+    ({"employee_ids": [], "contract_type": "minijob"}, "leer"),
+    ({"employee_ids": list(range(1, 7))}, "Zu viele"),
+    ({}, "Keine Mitarbeiter"),
+])
+def test_invalid_input_is_rejected(client, body, detail):
+    response = _export(client, body)
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+    assert client.queries == []
+
+
+def test_filter_cohort_over_the_limit(client):
+    response = _export(client, {"contract_type": "minijob"})
+    assert response.status_code == 400
+    assert "Mehr als 5" in response.json()["detail"]
+    assert client.queries[0]["limit"] == 6
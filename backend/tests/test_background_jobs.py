@@ -0,0 +1,76 @@
+"""Background-job status endpoint: login required and bulk results only for their owner."""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import background_jobs
+import repositories
+import routes_employees
+from auth import create_access_token
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_revocations(since):
+        return []
+    monkeypatch.setattr(repositories, "list_token_revocations", no_revocations)
+    registry = background_jobs.JobRegistry()
+    monkeypatch.setattr(routes_employees.background_jobs, "jobs", registry)
+    app = FastAPI()
+    app.include_router(routes_employees.router)
+    with TestClient(app) as client:
+        client.registry = registry
+        yield client
+
+
+def _headers(user_id, role="user"):
+    token = create_access_token({"sub": f"user{user_id}", "role": role, "user_id": user_id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _submit(client, owner):
+    async def work(job):
+        return {"created": 1}
+
+    async def submit():
+        job = client.registry.submit("employee_bulk_scan", work, owner=owner, files=1)
+        await asyncio.sleep(0)
+        return job
+    return client.portal.call(submit)
+
+
+def test_status_requires_login(client):
+    job = _submit(client, owner=1)
+    assert client.get(f"/employees/add/jobs/{job.id}").status_code == 401
+
+
+def test_status_only_for_owner_and_admins(client):
+    job = _submit(client, owner=1)
+    owner = client.get(f"/employees/add/jobs/{job.id}", headers=_headers(1))
+    assert owner.status_code == 200
+    assert owner.json()["result"] == {"created": 1}
+    assert "owner" not in owner.json()
+    assert client.get(f"/employees/add/jobs/{job.id}", headers=_headers(2)).status_code == 404
+    assert client.get(f"/employees/add/jobs/{job.id}", headers=_headers(3, "admin")).status_code == 200
+
+
+def test_failed_jobs_report_their_error():
+    async def run():
+        registry = background_jobs.JobRegistry()
+
+        async def expected(job):
+            raise background_jobs.JobFailed("Dokument unlesbar")
+
+        async def crash(job):
+            raise KeyError("boom")
+
+        jobs = [registry.submit("employee_scan", expected), registry.submit("employee_scan", crash)]
+        while any(job.finished_at is None for job in jobs):
+            await asyncio.sleep(0)
+        return [job.as_dict() for job in jobs]
+
+    expected, crash = asyncio.run(run())
+    assert expected["status"] == "failed" and expected["error"] == "Dokument unlesbar"
+    assert crash["status"] == "failed" and crash["error"].startswith("KeyError")
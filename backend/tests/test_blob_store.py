@@ -0,0 +1,187 @@
+"""Blob stores (filesystem and S3 against a stub client), ranged downloads and the file_key startup ensure."""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import blob_store
+import repositories
+from document_response import ranged_response
+
+DATA = bytes(range(256)) * 1000
+
+
+class StubS3Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class StubBody:
+    def __init__(self, data):
+        self.data, self.closed = data, False
+
+    def read(self, size):
+        chunk, self.data = self.data[:size], self.data[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class StubS3:
+    """The head/put/get/delete_object subset of boto3's S3 client, in memory."""
+
+    def __init__(self):
+        self.objects, self.puts, self.bodies = {}, 0, []
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise StubS3Error("NoSuchKey" if self.objects else "404")
+        return self.objects[(Bucket, Key)]
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self._get(Bucket, Key))}
+
+    def put_object(self, Bucket, Key, Body):
+        self.puts += 1
+        self.objects[(Bucket, Key)] = bytes(Body)
+
+    def get_object(self, Bucket, Key, Range):
+        data = self._get(Bucket, Key)
+        first, _, last = Range[len("bytes="):].partition("-")
+        body = StubBody(data[int(first):int(last) + 1 if last else None])
+        self.bodies.append(body)
+        return {"Body": body}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+@pytest.fixture(params=["fs", "s3"])
+def store(request, tmp_path):
+    if request.param == "fs":
+        return blob_store.LocalBlobStore(str(tmp_path / "blobs"))
+    return blob_store.S3BlobStore(StubS3(), "bucket", "stundenzettel/")
+
+
+def test_put_is_content_addressed(store):
+    key = store.put(DATA)
+    assert key == blob_store.blob_key(DATA)
+    assert store.put(DATA) == key
+    assert store.size(key) == len(DATA)
+    assert b"".join(store.iter_range(key)) == DATA
+
+
+def test_ranges_come_in_chunks(store):
+    key = store.put(DATA)
+    chunks = list(store.iter_range(key, 1000, 70_999, chunk_size=16 * 1024))
+    assert b"".join(chunks) == DATA[1000:71_000]
+    assert max(len(c) for c in chunks) <= 16 * 1024
+    assert b"".join(store.iter_range(key, len(DATA) - 10)) == DATA[-10:]
+
+
+def test_missing_and_deleted_blobs(store):
+    key = store.put(DATA)
+    store.delete(key)
+    store.delete(key)
+    with pytest.raises(blob_store.BlobNotFound):
+        store.size(key)
+    with pytest.raises(blob_store.BlobNotFound):
+        list(store.iter_range(key))
+
+
+def test_s3_store_uploads_once_and_closes_bodies():
+    client = StubS3()
+    store = blob_store.S3BlobStore(client, "bucket", "p/")
+    key = store.put(DATA)
+    store.put(DATA)
+    assert client.puts == 1
+    assert ("bucket", f"p/{key}") in client.objects
+    list(store.iter_range(key, 0, 9))
+    assert all(body.closed for body in client.bodies)
+
+
+def test_s3_store_passes_other_errors_through():
+    class Broken(StubS3):
+        def head_object(self, Bucket, Key):
+            raise StubS3Error("AccessDenied")
+    with pytest.raises(StubS3Error):
+        blob_store.S3BlobStore(Broken(), "bucket").put(DATA)
+
+
+def test_local_store_leaves_no_temp_files(tmp_path):
+    store = blob_store.LocalBlobStore(str(tmp_path))
+    key = store.put(DATA)
+    files = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert [p.name for p in files] == [key]
+
+
+@pytest.fixture
+def download(tmp_path):
+    store = blob_store.LocalBlobStore(str(tmp_path))
+    key = store.put(DATA)
+    app = FastAPI()
+
+    @app.get("/file")
+    def get_file(request: Request):
+        return ranged_response(lambda start, end: store.iter_range(key, start, end), store.size(key),
+                               "Stundenzettel.pdf", "application/pdf", request.headers.get("range"))
+
+    return TestClient(app)
+
+
+def test_full_download(download):
+    response = download.get("/file")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(DATA))
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, len(DATA) - 1),
+    ("bytes=-500", len(DATA) - 500, len(DATA) - 1),
+    ("bytes=255990-999999", 255_990, len(DATA) - 1),
+])
+def test_partial_download(download, header, start, end):
+    response = download.get("/file", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=256000-", "bytes=500-100"])
+def test_unsatisfiable_range(download, header):
+    response = download.get("/file", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-9", "items=0-9", "bytes=x-y"])
+def test_unusable_range_serves_the_whole_file(download, header):
+    response = download.get("/file", headers={"Range": header})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+@pytest.mark.parametrize("column, index, expected", [
+    (None, None, ["ALTER TABLE stundenzettel_downloads ADD COLUMN file_key char(64) DEFAULT NULL, ADD KEY file_key (file_key)"]),
+    ({"1": 1}, None, ["ALTER TABLE stundenzettel_downloads ADD KEY file_key (file_key)"]),
+    ({"1": 1}, {"1": 1}, []),
+])
+def test_ensure_stundenzettel_file_key(monkeypatch, column, index, expected):
+    statements = []
+
+    async def fetch_one(query, args=None):
+        return column if "COLUMNS" in query else index
+
+    async def execute(query, args=None):
+        statements.append(query)
+
+    monkeypatch.setattr(repositories, "fetch_one", fetch_one)
+    monkeypatch.setattr(repositories, "execute", execute)
+    asyncio.run(repositories.ensure_stundenzettel_file_key())
+    assert statements == expected
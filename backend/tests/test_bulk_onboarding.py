@@ -0,0 +1,71 @@
+"""_onboard_batch with a fake scanner and repository: one lookup, one insert, per-file results."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import dashboard_stats
+import id_scan
+import repositories
+import routes_employees
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    calls = {"lookups": [], "inserts": []}
+    scans = {
+        b"anna": {"id_number": "A1", "vorname": "Anna"},
+        b"anna-again": {"id_number": "A1", "vorname": "Anna"},
+        b"bernd": {"id_number": "B2", "vorname": "Bernd"},
+        b"known": {"id_number": "K9", "vorname": "Karl"},
+        b"blank": {"id_number": None},
+    }
+
+    async def scan(content, filename, **kwargs):
+        if content == b"broken":
+            raise id_scan.IdScanError("Dokument unlesbar")
+        return dict(scans[content])
+
+    async def find_employees_by_id_numbers(id_numbers):
+        calls["lookups"].append(sorted(id_numbers))
+        return [{"id_number": "K9", "id": 9}]
+
+    async def insert_employees(rows):
+        calls["inserts"].append([row["id_number"] for row in rows])
+        return [{**row, "id": 100 + i} for i, row in enumerate(rows)]
+
+    monkeypatch.setattr(id_scan.scanner, "scan", scan)
+    monkeypatch.setattr(repositories, "find_employees_by_id_numbers", find_employees_by_id_numbers)
+    monkeypatch.setattr(repositories, "insert_employees", insert_employees)
+    monkeypatch.setattr(dashboard_stats, "invalidate", lambda: calls.setdefault("invalidated", True))
+    return calls
+
+
+def _run(uploads):
+    job = SimpleNamespace(status="queued", info={"scanned": 0})
+    return job, asyncio.run(routes_employees._onboard_batch(job, uploads))
+
+
+def test_statuses_and_single_round_trips(fakes):
+    uploads = [(f"{name}.pdf", name.encode()) for name in ("anna", "anna-again", "bernd", "known", "blank", "broken")]
+    job, result = _run(uploads)
+
+    assert job.info["scanned"] == 6
+    assert fakes["lookups"] == [["A1", "B2", "K9"]]
+    assert fakes["inserts"] == [["A1", "B2"]]
+    assert fakes["invalidated"]
+    assert (result["created"], result["duplicate"], result["error"]) == (2, 2, 2)
+    statuses = [(r["filename"], r["status"], r.get("employee_id")) for r in result["results"]]
+    assert statuses == [
+        ("anna.pdf", "created", 100), ("anna-again.pdf", "duplicate", None), ("bernd.pdf", "created", 101),
+        ("known.pdf", "duplicate", 9), ("blank.pdf", "error", None), ("broken.pdf", "error", None),
+    ]
+    assert "Dokument unlesbar" in result["results"][-1]["error"]
+    assert [e["id_number"] for e in result["employees"]] == ["A1", "B2"]
+
+
+def test_nothing_new_skips_the_insert(fakes):
+    _, result = _run([("known.pdf", b"known")])
+    assert fakes["inserts"] == []
+    assert "invalidated" not in fakes
+    assert result["duplicate"] == 1 and result["employees"] == []
@@ -0,0 +1,90 @@
+"""ETag/304 handling of conditional_json, with resource versions and the data source faked."""
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import conditional_get
+import repositories
+
+
+@pytest.fixture
+def app_state(monkeypatch):
+    state = {"versions": {"employees": 1}, "produced": 0, "fail_versions": False}
+
+    async def get_resource_versions(tables):
+        if state["fail_versions"]:
+            raise RuntimeError("no resource_versions table")
+        return {table: state["versions"].get(table, 0) for table in tables}
+
+    monkeypatch.setattr(repositories, "get_resource_versions", get_resource_versions)
+    monkeypatch.setattr(conditional_get, "_bodies", conditional_get._BodyCache(16))
+    return state
+
+
+@pytest.fixture
+def client(app_state):
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items(request: Request, missing: bool = False):
+        async def produce():
+            if missing:
+                raise HTTPException(status_code=404, detail="not found")
+            app_state["produced"] += 1
+            return [{"id": 1, "version": app_state["versions"]["employees"]}]
+        return await conditional_get.conditional_json(request, ("employees",), produce)
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_revalidation_returns_304_without_querying(client, app_state):
+    first = client.get("/items")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/items", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    assert app_state["produced"] == 1
+
+
+def test_other_clients_get_the_cached_body(client, app_state):
+    first = client.get("/items")
+    second = client.get("/items")
+    assert second.json() == first.json()
+    assert app_state["produced"] == 1
+
+
+def test_a_write_changes_the_etag(client, app_state):
+    etag = client.get("/items").headers["etag"]
+    app_state["versions"]["employees"] += 1
+    fresh = client.get("/items", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json() == [{"id": 1, "version": 2}]
+
+
+def test_the_query_string_is_part_of_the_etag(client):
+    assert client.get("/items").headers["etag"] != client.get("/items?x=1").headers["etag"]
+
+
+def test_if_none_match_lists_and_star(client):
+    etag = client.get("/items").headers["etag"]
+    assert client.get("/items", headers={"If-None-Match": f'"other", {etag}'}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": etag.removeprefix("W/")}).status_code == 304
+    assert client.get("/items", headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_errors_pass_through_uncached(client):
+    assert client.get("/items?missing=true").status_code == 404
+    assert client.get("/items?missing=true").status_code == 404
+
+
+def test_without_versions_the_response_has_no_etag(client, app_state):
+    app_state["fail_versions"] = True
+    resp = client.get("/items")
+    assert resp.status_code == 200
+    assert "etag" not in resp.headers
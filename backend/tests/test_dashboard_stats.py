@@ -0,0 +1,68 @@
+"""Dashboard stats: chart months, zero-filled series and the TTL cache with invalidation."""
+import asyncio
+import datetime
+
+import pytest
+
+import dashboard_stats
+import repositories
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_stats(first_month, last_month):
+        calls.append((first_month, last_month))
+        counts = {"total_users": 2, "total_admins": 1, "total_employees": len(calls),
+                  "total_minijobs": 0, "total_fulltime": 0, "total_parttime": 0}
+        return counts, [{"month": last_month, "value": 3}], []
+
+    monkeypatch.setattr(repositories, "dashboard_stats", fake_stats)
+    monkeypatch.setattr(dashboard_stats, "_cached", None)
+    monkeypatch.setattr(dashboard_stats, "DASHBOARD_STATS_TTL", 30)
+    return calls
+
+
+def test_chart_months_cross_the_year():
+    months = dashboard_stats.chart_months(datetime.date(2025, 2, 14), count=4)
+    assert months == ["2024-11", "2024-12", "2025-01", "2025-02"]
+
+
+def test_series_fill_empty_months(calls):
+    stats = asyncio.run(dashboard_stats.get_stats())
+    months = dashboard_stats.chart_months()
+    assert [p["month"] for p in stats["hires_per_month"]] == months
+    assert [p["value"] for p in stats["hires_per_month"]] == [0] * (len(months) - 1) + [3]
+    assert all(p["value"] == 0 for p in stats["payslips_per_month"])
+    assert calls == [(months[0], months[-1])]
+
+
+def test_results_are_reused_until_invalidated(calls):
+    assert asyncio.run(dashboard_stats.get_stats())["total_employees"] == 1
+    assert asyncio.run(dashboard_stats.get_stats())["total_employees"] == 1
+    dashboard_stats.invalidate()
+    assert asyncio.run(dashboard_stats.get_stats())["total_employees"] == 2
+    assert len(calls) == 2
+
+
+def test_concurrent_requests_share_one_computation(calls):
+    async def burst():
+        return await asyncio.gather(*(dashboard_stats.get_stats() for _ in range(10)))
+    results = asyncio.run(burst())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+
+
+def test_result_computed_across_an_invalidation_is_not_kept(calls, monkeypatch):
+    original = repositories.dashboard_stats
+
+    async def slow_stats(first_month, last_month):
+        result = await original(first_month, last_month)
+        # A write lands while the counts are being computed
+        dashboard_stats.invalidate()
+        return result
+
+    monkeypatch.setattr(repositories, "dashboard_stats", slow_stats)
+    asyncio.run(dashboard_stats.get_stats())
+    assert dashboard_stats._cached is None
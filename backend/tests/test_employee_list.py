@@ -0,0 +1,96 @@
+"""/employees/list keyset pagination, run against the real SQL on an in-memory SQLite."""
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import repositories
+import routes_employees
+
+EMPLOYEES = [
+    # (id, vorname, geburtsname, eintrittsdatum, contract_type)
+    (1, "Erika", "Muster", "2023-01-01", "VOLLZEITTÄTIGKEIT"),
+    (2, "Anna", "Beispiel", None, "TEILZEITTÄTIGKEIT"),
+    (3, "Erika", "Zeller", "2022-05-01", "VOLLZEITTÄTIGKEIT"),
+    (4, None, "Ohne", "2024-02-01", None),
+    (5, "Bernd", "Brot", "2023-01-01", "VOLLZEITTÄTIGKEIT"),
+    (6, "Anna", "Alt", "2021-07-15", "TEILZEITTÄTIGKEIT"),
+    (7, "Zoe", "Zett", "2020-01-01", "VOLLZEITTÄTIGKEIT"),
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.create_function("CONCAT_WS", -1, lambda sep, *parts: sep.join(p for p in parts if p is not None))
+    columns = [c for c in repositories.EMPLOYEE_LIST_COLUMNS if c != "id"]
+    conn.execute(f"CREATE TABLE employees (id INTEGER PRIMARY KEY, {', '.join(c + ' TEXT' for c in columns)})")
+    conn.executemany(
+        "INSERT INTO employees (id, vorname, geburtsname, eintrittsdatum, contract_type) VALUES (?, ?, ?, ?, ?)",
+        EMPLOYEES,
+    )
+
+    async def fetch_all(sql, args=None):
+        return [dict(row) for row in conn.execute(sql.replace("%s", "?"), args or ())]
+
+    async def get_resource_versions(tables):
+        return dict.fromkeys(tables, 0)
+
+    monkeypatch.setattr(repositories, "fetch_all", fetch_all)
+    monkeypatch.setattr(repositories, "get_resource_versions", get_resource_versions)
+    app = FastAPI()
+    app.include_router(routes_employees.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def _all_pages(client, limit, **params):
+    ids, cursor = [], None
+    while True:
+        query = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/employees/list", params=query).json()
+        assert len(page["items"]) <= limit
+        ids += [int(row["id"]) for row in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("sort,order", [
+    ("id", "asc"), ("vorname", "asc"), ("vorname", "desc"), ("eintrittsdatum", "desc"), ("contract_type", "asc"),
+])
+def test_pages_match_the_unpaged_list(client, sort, order):
+    unpaged = [int(row["id"]) for row in client.get("/employees/list", params={"sort": sort, "order": order}).json()]
+    assert sorted(unpaged) == list(range(1, 8))
+    for limit in (1, 2, 3, 7):
+        assert _all_pages(client, limit, sort=sort, order=order) == unpaged
+
+
+def test_ties_are_broken_by_id(client):
+    rows = client.get("/employees/list", params={"sort": "vorname"}).json()
+    assert [int(r["id"]) for r in rows] == [4, 2, 6, 5, 1, 3, 7]
+
+
+def test_filters_and_fields(client):
+    rows = client.get("/employees/list", params={
+        "contract_type": "VOLLZEITTÄTIGKEIT", "eintritt_von": "2022-01-01", "fields": "vorname",
+    }).json()
+    assert rows == [
+        {"id": "1", "vorname": "Erika"}, {"id": "3", "vorname": "Erika"}, {"id": "5", "vorname": "Bernd"},
+    ]
+    assert [r["id"] for r in client.get("/employees/list", params={"q": "anna a", "fields": "id"}).json()] == ["6"]
+
+
+def test_null_text_columns_come_back_as_empty_strings(client):
+    row = client.get("/employees/list", params={"q": "Ohne", "fields": "vorname,contract_type"}).json()[0]
+    # land and contract_type keep their raw values
+    assert row == {"id": "4", "vorname": "", "contract_type": None}
+
+
+@pytest.mark.parametrize("params", [
+    {"sort": "iban"}, {"order": "up"}, {"limit": 0}, {"fields": "password"}, {"cursor": "not-a-cursor"},
+])
+def test_invalid_parameters_are_rejected(client, params):
+    assert client.get("/employees/list", params=params).status_code == 400
@@ -0,0 +1,94 @@
+"""Rule-based German holidays and the cached, background-refreshed HolidayCalendar."""
+import asyncio
+import datetime
+
+import pytest
+
+from german_holidays import compute_holidays, easter_sunday
+from holiday_calendar import HolidayCalendar, HolidayStore, holiday_map
+
+
+@pytest.mark.parametrize("year,expected", [
+    (2000, datetime.date(2000, 4, 23)), (2019, datetime.date(2019, 4, 21)),
+    (2024, datetime.date(2024, 3, 31)), (2025, datetime.date(2025, 4, 20)),
+])
+def test_easter_sunday(year, expected):
+    assert easter_sunday(year) == expected
+
+
+def _names(year, state):
+    return {date.isoformat(): name for date, name in compute_holidays(year, state)}
+
+
+def test_saxony_2024():
+    holidays = _names(2024, "sn")
+    assert len(holidays) == 11
+    assert holidays["2024-11-20"] == "Buß- und Bettag"
+    assert holidays["2024-10-31"] == "Reformationstag"
+    assert holidays["2024-05-09"] == "Christi Himmelfahrt"
+    assert "2024-05-30" not in holidays  # Fronleichnam is not a holiday in Saxony
+
+
+def test_state_specific_holidays():
+    assert _names(2024, "by")["2024-05-30"] == "Fronleichnam"
+    assert _names(2024, "by")["2024-01-06"] == "Heilige Drei Könige"
+    assert _names(2025, "be")["2025-05-08"] == "Tag der Befreiung"
+    assert "2018-03-08" not in _names(2018, "be")
+    assert _names(2019, "be")["2019-03-08"] == "Internationaler Frauentag"
+    assert _names(2017, "by")["2017-10-31"] == "Reformationstag"
+
+
+def test_holiday_map_shape():
+    assert holiday_map((("2024-12-25", "x"), ("2024-01-01", "y"))) == {12: {"25": True}, 1: {"01": True}}
+
+
+API_RESULT = (("2024-01-01", "Neujahr"), ("2024-12-24", "Heiligabend (API)"))
+
+
+def _calendar(tmp_path, fetch):
+    return HolidayCalendar(store=HolidayStore(str(tmp_path / "holidays.sqlite3")), api_url="http://api.test/", fetch=fetch)
+
+
+async def _holidays_then_refresh(calendar, year, state):
+    first = await calendar.holidays(year, state)
+    for task in list(calendar._refreshing.values()):
+        await task
+    return first, await calendar.holidays(year, state)
+
+
+def test_answers_from_rules_then_from_the_api(tmp_path):
+    fetched = []
+
+    def fetch(year, state, api_url):
+        fetched.append((year, state))
+        return API_RESULT
+
+    calendar = _calendar(tmp_path, fetch)
+    first, second = asyncio.run(_holidays_then_refresh(calendar, 2024, "sn"))
+    assert dict(first)["2024-11-20"] == "Buß- und Bettag"
+    assert second == API_RESULT
+    assert fetched == [(2024, "sn")]
+
+    # A new process reads the stored API result and does not fetch again
+    restarted = _calendar(tmp_path, fetch)
+    assert asyncio.run(_holidays_then_refresh(restarted, 2024, "sn")) == (API_RESULT, API_RESULT)
+    assert fetched == [(2024, "sn")]
+    asyncio.run(calendar.close())
+    asyncio.run(restarted.close())
+
+
+def test_a_failed_fetch_keeps_the_rules(tmp_path):
+    def fetch(year, state, api_url):
+        raise ConnectionError("offline")
+
+    calendar = _calendar(tmp_path, fetch)
+    first, second = asyncio.run(_holidays_then_refresh(calendar, 2024, "by"))
+    assert first == second
+    assert dict(second)["2024-05-30"] == "Fronleichnam"
+    asyncio.run(calendar.close())
+
+
+def test_month_days(tmp_path):
+    calendar = HolidayCalendar(store=HolidayStore(str(tmp_path / "h.sqlite3")), api_url="")
+    assert asyncio.run(calendar.month_days(2024, 12, "sn")) == {"25", "26"}
+    asyncio.run(calendar.close())
@@ -0,0 +1,112 @@
+"""IdScanner against a fake Mindee client: cache, shared in-flight scans, concurrency limit, errors."""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+import id_scan
+from extraction_cache import ExtractionCache
+
+
+def _field(value):
+    return SimpleNamespace(value=value)
+
+
+def _document(number):
+    prediction = SimpleNamespace(
+        given_names=[_field("ERIKA")], surnames=[_field("MUSTERMANN")], birth_date=_field("1990-08-12"),
+        sex=_field("F"), nationality=_field("DEU"), document_number=_field(number), personal_number=_field(None),
+    )
+    return SimpleNamespace(inference=SimpleNamespace(prediction=prediction))
+
+
+class FakeMindee:
+    """Completes a job after `polls` polls; files named fail*.pdf fail."""
+
+    def __init__(self, polls=2):
+        self.polls = polls
+        self.enqueued = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._jobs = {}
+        self._ids = itertools.count(1)
+
+    def source_from_bytes(self, content, filename):
+        return (content, filename)
+
+    def enqueue(self, product, source):
+        queue_id = str(next(self._ids))
+        self.enqueued.append(source[1])
+        self._jobs[queue_id] = {"source": source, "polls": 0}
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return SimpleNamespace(job=SimpleNamespace(id=queue_id))
+
+    def parse_queued(self, product, queue_id):
+        job = self._jobs[queue_id]
+        job["polls"] += 1
+        if job["polls"] < self.polls:
+            return SimpleNamespace(job=SimpleNamespace(status="processing"), document=None)
+        self.in_flight -= 1
+        content, filename = job["source"]
+        if filename.startswith("fail"):
+            return SimpleNamespace(job=SimpleNamespace(status="failed"), document=None)
+        return SimpleNamespace(job=SimpleNamespace(status="completed"), document=_document("T" + content.decode()))
+
+
+@pytest.fixture
+def make_scanner(tmp_path):
+    def make(client, **kwargs):
+        cache = ExtractionCache(str(tmp_path / "scans.sqlite3"), 100, id_scan.ID_SCAN_VERSION)
+        return id_scan.IdScanner(client=client, poll_interval=0.01, cache=cache, local_mrz=False, **kwargs)
+    return make
+
+
+def test_fields_and_cache(make_scanner):
+    client = FakeMindee()
+    scanner = make_scanner(client)
+    fields = asyncio.run(scanner.scan(b"123", "card.pdf"))
+    assert fields == {
+        "vorname": "ERIKA", "geburtsname": "MUSTERMANN", "geburtsdatum": "1990-08-12", "geschlecht": "weiblich",
+        "staatsangehoerigkeit": "DEU", "id_number": "T123", "personal_number": None,
+    }
+    assert asyncio.run(scanner.scan(b"123", "again.pdf")) == fields
+    assert client.enqueued == ["card.pdf"]
+
+
+def test_concurrent_scans_of_one_file_share_a_call(make_scanner):
+    client = FakeMindee()
+    scanner = make_scanner(client)
+
+    async def burst():
+        return await asyncio.gather(*(scanner.scan(b"42", f"copy{i}.pdf") for i in range(5)))
+    results = asyncio.run(burst())
+    assert len(client.enqueued) == 1
+    assert all(r["id_number"] == "T42" for r in results)
+
+
+def test_concurrency_limit(make_scanner):
+    client = FakeMindee(polls=3)
+    scanner = make_scanner(client, concurrency=2)
+    started = []
+
+    async def burst():
+        return await asyncio.gather(*(
+            scanner.scan(str(i).encode(), f"c{i}.pdf", on_start=lambda: started.append(1)) for i in range(6)
+        ))
+    results = asyncio.run(burst())
+    assert sorted(r["id_number"] for r in results) == [f"T{i}" for i in range(6)]
+    assert client.max_in_flight == 2
+    assert len(started) == 6
+
+
+def test_failed_job(make_scanner):
+    with pytest.raises(id_scan.IdScanError):
+        asyncio.run(make_scanner(FakeMindee()).scan(b"x", "fail.pdf"))
+
+
+def test_timeout(make_scanner):
+    scanner = make_scanner(FakeMindee(polls=10_000), timeout=0.1)
+    with pytest.raises(id_scan.IdScanError, match="nicht innerhalb"):
+        asyncio.run(scanner.scan(b"slow", "slow.pdf"))
@@ -0,0 +1,78 @@
+"""MRZ decoding on the ICAO specimens, rejection of misread zones, PDF text layer and the scanner's local path."""
+import asyncio
+import io
+
+import pytest
+
+import id_scan
+import mrz
+from extraction_cache import ExtractionCache
+
+TD1 = ["IDD<<T220001293<<<<<<<<<<<<<<<", "6408125<2010315D<<<<<<<<<<<<<4", "MUSTERMANN<<ERIKA<<<<<<<<<<<<<"]
+TD3 = ["P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<", "L898902C36UTO7408122F1204159ZE184226B<<<<<10"]
+
+
+def test_check_digit():
+    assert mrz.check_digit("L898902C3") == 6
+    assert mrz.check_digit("740812") == 2
+    assert mrz.check_digit("ZE184226B<<<<<") == 1
+
+
+def test_td1_german_id_card():
+    zone = mrz.find_mrz("\n".join(TD1))
+    assert zone == {
+        "format": "TD1", "document_code": "ID", "issuing_state": "DEU", "document_number": "T22000129",
+        "surnames": "MUSTERMANN", "given_names": "ERIKA", "birth_date": "1964-08-12", "sex": None,
+        "nationality": "DEU", "personal_number": None,
+    }
+
+
+def test_td3_passport_with_noise_and_dropped_fillers():
+    text = "Passport\nUtopia\n" + TD3[0][:-2] + "\n" + " ".join(TD3[1][i:i + 11] for i in range(0, 44, 11))
+    zone = mrz.find_mrz(text)
+    assert zone["format"] == "TD3"
+    assert zone["document_number"] == "L898902C3"
+    assert (zone["surnames"], zone["given_names"]) == ("ERIKSSON", "ANNA MARIA")
+    assert zone["birth_date"] == "1974-08-12"
+    assert zone["sex"] == "F"
+    assert zone["personal_number"] == "ZE184226B"
+
+
+@pytest.mark.parametrize("line, index, char", [(1, 1, "9"), (1, 29, "5"), (0, 10, "4")])
+def test_misread_zone_is_rejected(line, index, char):
+    lines = list(TD1)
+    lines[line] = lines[line][:index] + char + lines[line][index + 1:]
+    assert mrz.find_mrz("\n".join(lines)) is None
+
+
+def _pdf(lines):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.setFont("Courier", 9)
+    for i, line in enumerate(lines):
+        pdf.drawString(40, 200 - 14 * i, line)
+    pdf.save()
+    return buffer.getvalue()
+
+
+def test_read_mrz_from_pdf_text_layer():
+    assert mrz.read_mrz(_pdf(TD1))["document_number"] == "T22000129"
+    assert mrz.read_mrz(_pdf(["no zone here"])) is None
+    assert mrz.read_mrz(b"%PDF-garbage") is None
+
+
+class NoMindee:
+    def source_from_bytes(self, content, filename):
+        raise AssertionError("Mindee must not be called for a locally read zone")
+
+
+def test_scanner_reads_zone_locally(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "scans.sqlite3"), 10, id_scan.ID_SCAN_VERSION)
+    scanner = id_scan.IdScanner(client=NoMindee(), cache=cache, local_mrz=True)
+    fields = asyncio.run(scanner.scan(_pdf(TD1), "ausweis.pdf"))
+    assert fields["id_number"] == "T22000129"
+    assert (fields["vorname"], fields["geburtsname"]) == ("ERIKA", "MUSTERMANN")
+    assert fields["geburtsdatum"] == "1964-08-12"
+    assert fields["staatsangehoerigkeit"] == "DEU"
@@ -0,0 +1,165 @@
+"""Bounded bcrypt pool, cost upgrades on login, and the access/refresh token pair."""
+import asyncio
+import importlib
+import os
+import time
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import repositories
+from password_hashing import HashQueueFull, PasswordHasher, hash_rounds
+from token_cache import RevocationList
+
+
+@pytest.fixture
+def fast_hasher():
+    hasher = PasswordHasher(workers=2, max_pending=8, rounds=4)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(fast_hasher):
+    async def run():
+        hashed = await fast_hasher.hash("geheim")
+        return hashed, await fast_hasher.verify("geheim", hashed), await fast_hasher.verify("falsch", hashed)
+
+    hashed, good, bad = asyncio.run(run())
+    assert hash_rounds(hashed) == 4
+    assert good and not bad
+    assert not fast_hasher.needs_rehash(hashed)
+    assert fast_hasher.needs_rehash(bcrypt.hashpw(b"geheim", bcrypt.gensalt(5)).decode())
+
+
+def test_hash_rounds_of_foreign_values():
+    assert hash_rounds("$2b$12$abcdefghijklmnopqrstuv") == 12
+    assert hash_rounds("plain") is None
+    assert hash_rounds(None) is None
+
+
+def test_queue_bound(fast_hasher):
+    fast_hasher.max_pending = 2
+
+    async def run():
+        return await asyncio.gather(*(fast_hasher.hash("x") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, HashQueueFull) for r in results) == 1
+    assert fast_hasher._pending == 0
+
+
+@pytest.fixture
+def client(monkeypatch, fast_hasher):
+    stored = bcrypt.hashpw(b"geheim", bcrypt.gensalt(5)).decode()
+    users = {7: {"id": 7, "username": "anna", "role": "admin", "password": stored}}
+    rehashed = []
+
+    async def get_user_by_login(login):
+        return next((u for u in users.values() if u["username"] == login), None)
+
+    async def get_user_by_id(user_id):
+        return users.get(int(user_id))
+
+    async def rehash_user_password(user_id, old_hash, new_hash):
+        rehashed.append((user_id, old_hash, new_hash))
+
+    async def get_password_reset(token):
+        return {"user_id": 7, "expires_at": "2999-01-01T00:00:00"} if token == "reset-token" else None
+
+    async def reset_user_password(user_id, hashed, token):
+        users[user_id]["password"] = hashed
+
+    async def update_user(user_id, fields):
+        users[user_id].update(fields)
+
+    async def list_token_revocations(since):
+        return []
+
+    async def revoke_user_tokens(user_id, revoked_at):
+        pass
+
+    # main loads its PDF templates relative to the backend directory
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    main = importlib.import_module("main")
+    monkeypatch.setattr(main, "hasher", fast_hasher)
+    revocations = RevocationList(horizon=3600, sync_interval=60)
+    monkeypatch.setattr(auth, "revocations", revocations)
+    monkeypatch.setattr(main, "revocations", revocations)
+    monkeypatch.setattr(repositories, "get_user_by_login", get_user_by_login)
+    monkeypatch.setattr(repositories, "get_user_by_id", get_user_by_id)
+    monkeypatch.setattr(repositories, "rehash_user_password", rehash_user_password)
+    for fake in (get_password_reset, reset_user_password, update_user, list_token_revocations, revoke_user_tokens):
+        monkeypatch.setattr(repositories, fake.__name__, fake)
+    client = TestClient(main.app)
+    client.users, client.rehashed = users, rehashed
+    return client
+
+
+def _login(client, password="geheim"):
+    return client.post("/login", data={"username": "anna", "password": password})
+
+
+def test_login_issues_both_tokens_and_upgrades_the_cost(client):
+    response = _login(client)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["expires_in"] == auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    assert auth.decode_access_token(body["access_token"])["id"] == 7
+    assert auth.decode_refresh_token(body["refresh_token"])["user_id"] == 7
+    [(user_id, old_hash, new_hash)] = client.rehashed
+    assert user_id == 7 and old_hash == client.users[7]["password"]
+    assert hash_rounds(new_hash) == 4 and bcrypt.checkpw(b"geheim", new_hash.encode())
+
+    assert _login(client, "falsch").status_code == 400
+
+
+def test_refresh_reads_the_user_again(client):
+    refresh_token = _login(client).json()["refresh_token"]
+    client.users[7]["role"] = "user"
+    response = client.post("/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    assert response.json()["role"] == "user"
+    assert auth.decode_access_token(response.json()["access_token"])["role"] == "user"
+
+    del client.users[7]
+    assert client.post("/refresh", json={"refresh_token": refresh_token}).status_code == 401
+
+
+def test_token_types_are_not_interchangeable(client):
+    tokens = _login(client).json()
+    with pytest.raises(auth.HTTPException) as refused:
+        auth.decode_access_token(tokens["refresh_token"])
+    assert refused.value.status_code == 401
+    assert client.post("/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+    assert client.post("/refresh", json={}).status_code == 400
+
+
+def _refresh(client, refresh_token):
+    return client.post("/refresh", json={"refresh_token": refresh_token})
+
+
+def test_password_reset_ends_existing_sessions(client):
+    old = _login(client).json()
+    time.sleep(0.01)
+    assert client.post("/reset-password", json={"token": "reset-token", "password": "neu"}).status_code == 200
+
+    response = _refresh(client, old["refresh_token"])
+    assert response.status_code == 401 and response.json()["detail"] == "Refresh token revoked"
+    headers = {"Authorization": f"Bearer {old['access_token']}"}
+    assert client.patch("/users/7", json={"email": "a@b.de"}, headers=headers).status_code == 401
+
+    time.sleep(0.01)
+    assert _login(client, "geheim").status_code == 400
+    assert _refresh(client, _login(client, "neu").json()["refresh_token"]).status_code == 200
+
+
+def test_password_change_revokes_but_other_edits_do_not(client):
+    tokens = _login(client).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.patch("/users/7", json={"email": "a@b.de"}, headers=headers).status_code == 200
+    assert _refresh(client, tokens["refresh_token"]).status_code == 200
+
+    assert client.patch("/users/7", json={"password": "neu"}, headers=headers).status_code == 200
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
@@ -0,0 +1,74 @@
+"""Page-by-page payslip extraction: early stop per layout, cross-page labels, rules run once per page."""
+import glob
+import os
+
+import pytest
+
+import pdf_extract_utils
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _sample(prefix):
+    return glob.glob(os.path.join(BACKEND, prefix + '*.pdf'))[0]
+
+
+@pytest.fixture
+def decoded_pages(monkeypatch):
+    """Records the pages iter_pdf_pages actually decodes."""
+    pages = []
+    real = pdf_extract_utils.iter_pdf_pages
+
+    def counting(pdf_path):
+        for page in real(pdf_path):
+            pages.append(page)
+            yield page
+    monkeypatch.setattr(pdf_extract_utils, 'iter_pdf_pages', counting)
+    return pages
+
+
+def _full_read(path):
+    lines, page_words = pdf_extract_utils.read_pdf_document(path)
+    return pdf_extract_utils.extract_fields_from_lines(lines, page_words)
+
+
+def test_buergergeld_form_stops_before_the_last_page(decoded_pages):
+    path = _sample('206_B')
+    expected = _full_read(path)
+    page_count = len(decoded_pages)
+    decoded_pages.clear()
+
+    fields = pdf_extract_utils.extract_einkommensbescheinigung_fields(path)
+    assert page_count > 1
+    assert len(decoded_pages) == 1
+    assert fields == expected
+
+
+def _fake_pages(monkeypatch, pages):
+    calls = []
+    real_index = pdf_extract_utils.index_lines
+    monkeypatch.setattr(pdf_extract_utils, 'iter_pdf_pages', lambda path: iter([(lines, []) for lines in pages]))
+    monkeypatch.setattr(pdf_extract_utils, 'index_lines', lambda lines: calls.append(len(lines)) or real_index(lines))
+    return calls
+
+
+def test_label_at_page_foot_finds_value_on_next_page(monkeypatch):
+    _fake_pages(monkeypatch, [
+        ['Abrechnung für Oktober 2024', 'Steuer-ID'],
+        ['12345678901', 'Netto-Verdienst'],
+        ['1.234,56'],
+    ])
+    fields = pdf_extract_utils.extract_einkommensbescheinigung_fields('unused.pdf')
+    assert (fields['monat'], fields['jahr']) == ('10', '2024')
+    assert fields['Steuer-ID'] == '12345678901'
+    assert fields['Netto'] == '1234,56'
+
+
+def test_first_page_wins_and_rules_see_each_page_once(monkeypatch):
+    pages = [['Steuer-ID 11111111111']] + [['Steuer-ID 22222222222', f'filler {i}'] for i in range(40)]
+    calls = _fake_pages(monkeypatch, pages)
+    fields = pdf_extract_utils.extract_einkommensbescheinigung_fields('unused.pdf')
+    assert fields['Steuer-ID'] == '11111111111'
+    page_lines = sum(len(page) for page in pages)
+    # One empty pass for the defaults, then each page with at most PAGE_CONTEXT_LINES carried over
+    assert sum(calls) <= page_lines + pdf_extract_utils.PAGE_CONTEXT_LINES * len(pages)
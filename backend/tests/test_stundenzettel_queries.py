@@ -0,0 +1,133 @@
+"""
+The Stundenzettel endpoints load employees, company and entries in a fixed number of
+queries, however many employees are requested, and take their holidays from the holiday
+calendar, also while the holiday API is down.
+
+    cd backend && python -m pytest -q
+"""
+import contextlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import holiday_calendar
+import repositories
+import routes_employees
+from auth import get_current_user
+
+
+class CountingDb:
+    """Stands in for db_async: counts the read queries and answers from fixed rows."""
+
+    def __init__(self):
+        self.queries = []
+        self.writes = []
+
+    async def fetch_all(self, sql, args=None):
+        self.queries.append(sql)
+        if "FROM employees" in sql:
+            return [
+                {"id": employee_id, "vorname": "Erika", "geburtsname": f"Muster{employee_id}",
+                 "personal_number": str(employee_id), "arbeitszeit_verteilung": "Mo:8,Di:8,Mi:8,Do:8,Fr:8"}
+                for employee_id in args
+            ]
+        return []
+
+    async def fetch_one(self, sql, args=None):
+        self.queries.append(sql)
+        if "FROM employees" in sql:
+            return {"id": args[0], "vorname": "Erika", "geburtsname": "Muster", "personal_number": "7",
+                    "arbeitszeit_verteilung": "Mo:8,Di:8,Mi:8,Do:8,Fr:8"}
+        if "FROM company" in sql:
+            return {"id": 1, "name": "Musterfirma"}
+        return None
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        self.queries.append("transaction")
+        yield None
+
+    async def execute(self, sql, args=None):
+        self.writes.append(sql)
+        return 1, len(self.writes)
+
+
+class MemoryStore:
+    def put(self, data):
+        return "test-key"
+
+
+def _holiday_api_down(year, state, api_url):
+    raise ConnectionError("holiday API unreachable")
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    calendar = holiday_calendar.HolidayCalendar(
+        store=holiday_calendar.HolidayStore(str(tmp_path / "holidays.sqlite3")), fetch=_holiday_api_down)
+    monkeypatch.setattr(holiday_calendar, "calendar", calendar)
+    db = CountingDb()
+    for name in ("fetch_all", "fetch_one", "transaction", "execute"):
+        monkeypatch.setattr(repositories, name, getattr(db, name))
+    monkeypatch.setattr(routes_employees.blob_store, "get_store", lambda: MemoryStore())
+    return db
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes_employees.router)
+    app.dependency_overrides[get_current_user] = lambda: {"id": 1, "role": "admin", "username": "admin"}
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("count", [1, 5, 40])
+def test_pdf_data_query_count(db, client, count):
+    body = {"employee_ids": list(range(1, count + 1)), "month": 3, "year": 2025}
+    resp = client.post("/employees/stundenzettel-pdf-data", json=body)
+    assert resp.status_code == 200
+    assert len(resp.json()["employees"]) == count
+    assert len(db.queries) == 3
+
+
+@pytest.mark.parametrize("count", [1, 5, 40])
+def test_pdf_query_count(db, client, monkeypatch, count):
+    # Render in this process; the worker pool has nothing to do with the query count
+    monkeypatch.setattr(routes_employees.stundenzettel_pdf, "STUNDENZETTEL_PAGES_PER_JOB", 1000)
+    body = {"employee_ids": list(range(1, count + 1)), "month": 3, "year": 2025, "holidays": []}
+    resp = client.post("/employees/stundenzettel-pdf", json=body)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/pdf"
+    assert len(db.queries) == 3
+    # Plus the download log, which is a write
+    assert len(db.writes) == 1
+
+
+def test_pdf_data_leaves_holidays_unplanned(db, client):
+    body = {"employee_ids": [1], "month": 12, "year": 2025}
+    resp = client.post("/employees/stundenzettel-pdf-data", json=body)
+    assert resp.status_code == 200
+    assert resp.json()["holidays"] == {"12": {"25": True, "26": True}}
+    entries = resp.json()["employees"][0]["entries"]
+    assert entries["24"]["dauer"] and entries["29"]["dauer"]
+    assert entries["25"]["dauer"] == entries["26"]["dauer"] == ""
+
+
+def test_pdf_data_state_and_client_holidays(db, client):
+    body = {"employee_ids": [1], "month": 10, "year": 2025}
+    # Reformationstag is a holiday in Saxony, not in Bavaria
+    assert client.post("/employees/stundenzettel-pdf-data", json=body).json()["holidays"] == {"10": {"03": True, "31": True}}
+    assert client.post("/employees/stundenzettel-pdf-data", json={**body, "state": "by"}).json()["holidays"] == {"10": {"03": True}}
+    assert client.post("/employees/stundenzettel-pdf-data", json={**body, "holidays": [1]}).json()["holidays"] == {"10": {"01": True}}
+    assert client.post("/employees/stundenzettel-pdf-data", json={**body, "state": "xx"}).status_code == 400
+
+
+def test_year_data_carries_the_holiday_map(db, client):
+    resp = client.get("/employees/stundenzettel-data/1", params={"year": 2025})
+    assert resp.status_code == 200
+    holidays = resp.json()["holidays"]
+    assert holidays["1"] == {"01": True}
+    assert holidays["12"] == {"25": True, "26": True}
+    assert client.get("/employees/stundenzettel-data/1", params={"year": 2025, "state": "xx"}).status_code == 400
@@ -0,0 +1,110 @@
+"""Verified-token cache and revocation list behind auth.get_current_user."""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+import repositories
+from token_cache import RevocationList, VerifiedTokenCache
+
+
+@pytest.fixture
+def db(monkeypatch):
+    state = {"rows": [], "syncs": 0, "writes": []}
+
+    async def list_token_revocations(since):
+        state["syncs"] += 1
+        return [row for row in state["rows"] if row["revoked_at"] >= since]
+
+    async def revoke_user_tokens(user_id, revoked_at):
+        state["writes"].append((user_id, revoked_at))
+
+    monkeypatch.setattr(repositories, "list_token_revocations", list_token_revocations)
+    monkeypatch.setattr(repositories, "revoke_user_tokens", revoke_user_tokens)
+    return state
+
+
+def test_cache_is_lru_and_respects_expiry():
+    cache = VerifiedTokenCache(max_entries=2)
+    now = time.time()
+    cache.put("a", {"exp": now + 60})
+    cache.put("b", {"exp": now + 60})
+    cache.get("a")
+    cache.put("c", {"exp": now + 60})
+    assert cache.get("b") is None and cache.get("a") and cache.get("c")
+
+    cache.put("old", {"exp": now - 1})
+    assert cache.get("old") is None
+    disabled = VerifiedTokenCache(max_entries=0)
+    disabled.put("a", {"exp": now + 60})
+    assert disabled.get("a") is None
+
+
+def test_cached_token_skips_decoding(monkeypatch, db):
+    monkeypatch.setattr(auth, "verified_tokens", VerifiedTokenCache())
+    monkeypatch.setattr(auth, "revocations", RevocationList(horizon=3600, sync_interval=60))
+    decodes = []
+    real_decode = auth.decode_access_token
+    monkeypatch.setattr(auth, "decode_access_token", lambda token: decodes.append(token) or real_decode(token))
+    token = auth.create_access_token({"sub": "anna", "role": "admin", "user_id": 7})
+
+    users = [asyncio.run(auth.get_current_user(token)) for _ in range(3)]
+    assert users == [{"id": 7, "role": "admin", "username": "anna"}] * 3
+    assert len(decodes) == 1
+    assert db["syncs"] == 1
+
+
+def test_revocation_refuses_only_older_tokens(monkeypatch, db):
+    revocations = RevocationList(horizon=3600, sync_interval=60)
+    monkeypatch.setattr(auth, "revocations", revocations)
+    monkeypatch.setattr(auth, "verified_tokens", VerifiedTokenCache())
+    old = auth.create_access_token({"sub": "anna", "role": "admin", "user_id": 7})
+    other = auth.create_access_token({"sub": "bernd", "role": "user", "user_id": 8})
+    asyncio.run(auth.get_current_user(old))
+
+    asyncio.run(revocations.revoke(7))
+    assert [user_id for user_id, _ in db["writes"]] == [7]
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(auth.get_current_user(old))
+    assert refused.value.detail == "Token revoked"
+    assert asyncio.run(auth.get_current_user(other))["id"] == 8
+
+    time.sleep(0.01)
+    new = auth.create_access_token({"sub": "anna", "role": "user", "user_id": 7})
+    assert asyncio.run(auth.get_current_user(new))["role"] == "user"
+
+
+def test_sync_picks_up_other_workers_and_keeps_local_revocations(db):
+    revocations = RevocationList(horizon=3600, sync_interval=0)
+    now = time.time()
+    db["rows"] = [{"user_id": 3, "revoked_at": now}, {"user_id": 4, "revoked_at": now - 7200}]
+    asyncio.run(revocations.revoke(5))
+    asyncio.run(revocations.sync_if_stale())
+
+    assert revocations.is_revoked(3, now - 1)
+    assert not revocations.is_revoked(3, now + 1)
+    assert not revocations.is_revoked(4, now - 7201)
+    assert revocations.is_revoked(5, now)
+
+
+def test_failed_sync_keeps_the_last_list(monkeypatch, db):
+    revocations = RevocationList(horizon=3600, sync_interval=0)
+    db["rows"] = [{"user_id": 3, "revoked_at": time.time()}]
+    asyncio.run(revocations.sync_if_stale())
+
+    async def broken(since):
+        raise ConnectionError("database down")
+    monkeypatch.setattr(repositories, "list_token_revocations", broken)
+    asyncio.run(revocations.sync_if_stale())
+    assert revocations.is_revoked(3, 0)
+
+
+def test_concurrent_requests_share_one_sync(db):
+    revocations = RevocationList(horizon=3600, sync_interval=60)
+
+    async def burst():
+        await asyncio.gather(*(revocations.sync_if_stale() for _ in range(5)))
+    asyncio.run(burst())
+    assert db["syncs"] == 1
@@ -0,0 +1,102 @@
+"""
+Verified-token cache and revocation list for auth.get_current_user.
+
+A token whose signature was checked once is remembered by its SHA-256 digest until it
+expires, so repeated requests with the same token skip jwt.decode. Access and refresh
+tokens of a user that was deleted or whose role or password changed are refused when they
+were issued before that change:
+the change is written to the token_revocations table and every worker reloads the recent
+rows at most every TOKEN_REVOCATION_SYNC seconds; the worker that made the change applies
+it at once. Settings (env):
+- TOKEN_CACHE_MAX_ENTRIES: verified tokens kept in memory (default 4096, 0 disables the cache)
+- TOKEN_REVOCATION_SYNC: seconds between reloads of the revocation list (default 5)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import repositories
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "4096"))
+TOKEN_REVOCATION_SYNC = float(os.getenv("TOKEN_REVOCATION_SYNC", "5"))
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    """LRU of token digest -> decoded claims; entries are dropped once the token expires."""
+
+    def __init__(self, max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, token):
+        digest = token_digest(token)
+        claims = self._entries.get(digest)
+        if claims is None:
+            return None
+        if claims.get('exp', 0) <= time.time():
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def put(self, token, claims):
+        if self.max_entries <= 0:
+            return
+        digest = token_digest(token)
+        self._entries[digest] = claims
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class RevocationList:
+    """user id -> time of the last deletion, role or password change; older tokens of that user are refused."""
+
+    def __init__(self, horizon, sync_interval=TOKEN_REVOCATION_SYNC):
+        # Revocations older than the longest token lifetime cannot match a live token
+        self.horizon = horizon
+        self.sync_interval = sync_interval
+        self._revoked = {}
+        self._synced_at = None
+        self._syncing = None
+
+    def is_revoked(self, user_id, issued_at):
+        revoked_at = self._revoked.get(str(user_id))
+        return revoked_at is not None and (issued_at or 0) < revoked_at
+
+    async def sync_if_stale(self):
+        if self._synced_at is not None and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        if self._syncing is None:
+            self._syncing = asyncio.ensure_future(self._sync())
+        await asyncio.shield(self._syncing)
+
+    async def _sync(self):
+        try:
+            cutoff = time.time() - self.horizon
+            rows = await repositories.list_token_revocations(cutoff)
+            revoked = {str(row['user_id']): float(row['revoked_at']) for row in rows}
+            # Keep local revocations the database read may have raced with
+            for user_id, revoked_at in self._revoked.items():
+                if revoked_at > max(revoked.get(user_id, 0), cutoff):
+                    revoked[user_id] = revoked_at
+            self._revoked = revoked
+        except Exception as e:
+            # Keep the last known list; the next request after sync_interval tries again
+            logging.warning(f"Token revocation sync failed: {e}")
+        finally:
+            self._synced_at = time.monotonic()
+            self._syncing = None
+
+    async def revoke(self, user_id):
+        """Refuse every token of the user issued until now, in this worker at once and in others after the next sync."""
+        revoked_at = time.time()
+        self._revoked[str(user_id)] = revoked_at
+        await repositories.revoke_user_tokens(user_id, revoked_at)
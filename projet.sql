@@ -64,6 +64,7 @@ CREATE TABLE `einkommensbescheinigung` (
   `netto` varchar(20) DEFAULT NULL,
   `monat` varchar(2) DEFAULT NULL,
   `jahr` varchar(4) DEFAULT NULL,
+  `content_hash` char(64) DEFAULT NULL,
   `created_at` timestamp NOT NULL DEFAULT current_timestamp()
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
@@ -307,6 +308,28 @@ INSERT INTO `password_resets` (`id`, `user_id`, `token`, `expires_at`) VALUES
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `resource_versions`
+--
+
+CREATE TABLE `resource_versions` (
+  `name` varchar(64) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
+--
+-- Table structure for table `token_revocations`
+--
+
+CREATE TABLE `token_revocations` (
+  `user_id` int(11) NOT NULL,
+  `revoked_at` double NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `stundenzettel_downloads`
 --
@@ -320,7 +343,8 @@ CREATE TABLE `stundenzettel_downloads` (
   `year` int(11) DEFAULT NULL,
   `download_date` datetime DEFAULT NULL,
   `file_blob` longblob DEFAULT NULL,
-  `filename` varchar(255) DEFAULT NULL
+  `filename` varchar(255) DEFAULT NULL,
+  `file_key` char(64) DEFAULT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
 --
@@ -394,7 +418,9 @@ ALTER TABLE `company`
 --
 ALTER TABLE `einkommensbescheinigung`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `employee_id` (`employee_id`);
+  ADD KEY `employee_id` (`employee_id`),
+  ADD KEY `content_hash` (`content_hash`),
+  ADD KEY `jahr_monat` (`jahr`, `monat`);
 
 --
 -- Indexes for table `employees`
@@ -417,11 +443,24 @@ ALTER TABLE `password_resets`
   ADD PRIMARY KEY (`id`),
   ADD UNIQUE KEY `token` (`token`);
 
+--
+-- Indexes for table `resource_versions`
+--
+ALTER TABLE `resource_versions`
+  ADD PRIMARY KEY (`name`);
+
+--
+-- Indexes for table `token_revocations`
+--
+ALTER TABLE `token_revocations`
+  ADD PRIMARY KEY (`user_id`);
+
 --
 -- Indexes for table `stundenzettel_downloads`
 --
 ALTER TABLE `stundenzettel_downloads`
-  ADD PRIMARY KEY (`id`);
+  ADD PRIMARY KEY (`id`),
+  ADD KEY `file_key` (`file_key`);
 
 --
 -- Indexes for table `users`
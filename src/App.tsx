@@ -65,6 +65,7 @@ function LoginModal({ onLogin }) {
     try {
       const res = await login({ username, password });
       localStorage.setItem('token', res.access_token);
+      localStorage.setItem('refresh_token', res.refresh_token);
       localStorage.setItem('role', res.role);
       localStorage.setItem('username', res.username);
       onLogin();
@@ -122,6 +123,8 @@ function Dashboard() {
     { label: 'Admins', value: stats.total_admins },
     { label: 'Employees', value: stats.total_employees },
   ];
+  const hiresBarData = (stats.hires_per_month || []).map(d => ({ label: d.month, value: d.value }));
+  const payslipsBarData = (stats.payslips_per_month || []).map(d => ({ label: d.month, value: d.value }));
   return (
     <main className="flex-1 p-4 md:p-6 animate-fade-in">
       <div className="grid grid-cols-2 sm:grid-cols-3 lg:grid-cols-6 gap-2 md:gap-4 mt-2 md:mt-4">
@@ -142,6 +145,14 @@ function Dashboard() {
           <div className="font-bold text-blue-900 mb-4 text-lg">Users / Admins / Employees</div>
           <ChartSection barData={userBarData} />
         </div>
+        <div className="bg-white rounded-2xl shadow-xl border border-blue-100 p-8 flex flex-col items-center min-h-[320px]">
+          <div className="font-bold text-blue-900 mb-4 text-lg">Hires per Month</div>
+          <ChartSection barData={hiresBarData} />
+        </div>
+        <div className="bg-white rounded-2xl shadow-xl border border-blue-100 p-8 flex flex-col items-center min-h-[320px]">
+          <div className="font-bold text-blue-900 mb-4 text-lg">Payslips per Month</div>
+          <ChartSection barData={payslipsBarData} />
+        </div>
       </div>
     </main>
   );
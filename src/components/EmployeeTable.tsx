@@ -11,6 +11,10 @@ import { useCallback } from 'react';
 import ReactModal from 'react-modal';
 import { saveAs } from 'file-saver';
 
+// Polling of an ID-scan job stops after this long, or as soon as the add modal is closed
+const SCAN_POLL_INTERVAL_MS = 1000;
+const SCAN_POLL_DEADLINE_MS = 3 * 60 * 1000;
+
 function getDaysInMonth(year, month) {
   const days = [];
   const date = new Date(year, month - 1, 1);
@@ -134,22 +138,14 @@ function useStundenzettelData(employeeId, year) {
   return { data, loading, error };
 }
 
-function getHolidaysForYear(year, state = 'sn') {
-  // Use backend proxy endpoint to avoid CORS
-  return axios.get(`${API_BASE_URL}/holidays/${year}?state=${state}`)
-    .then(res => res.data);
-}
-
 function StundenzettelPDFDownload({ employeeId, year, emp }) {
   const { data, loading } = useStundenzettelData(employeeId, year);
-  const [holidays, setHolidays] = React.useState({});
+  // Holidays come with the data, from the same calendar as the server-side PDF
+  const holidays = data?.holidays || {};
   const [pdfUrl, setPdfUrl] = React.useState(null);
   const [generating, setGenerating] = React.useState(false);
-  React.useEffect(() => {
-    getHolidaysForYear(year, 'sn').then(setHolidays);
-  }, [year]);
   // Always show the icon, but disable if not ready
-  const notReady = loading || Object.keys(holidays).length === 0 || !data;
+  const notReady = loading || !data;
   // Build entries prop for PDF for all 12 months
   const entries = {};
   const verteilung = data ? parseVerteilungHours(data.arbeitszeitVerteilung) : {};
@@ -224,6 +220,7 @@ function StundenzettelPDFDownload({ employeeId, year, emp }) {
 export default function EmployeeTable() {
   const [employees, setEmployees] = useState([]);
   const [modal, setModal] = useState(false);
+  const modalOpen = React.useRef(false);
   const [confirmDelete, setConfirmDelete] = useState<{ open: boolean; id?: number }>({ open: false });
   const [file, setFile] = useState<File | null>(null);
   const [loading, setLoading] = useState(false);
@@ -305,8 +302,7 @@ export default function EmployeeTable() {
           year: h.year,
         }
       );
-      const { employees } = res.data;
-      const holidays = await axios.get(`${API_BASE_URL}/holidays/${h.year}?state=sn`).then(r => r.data);
+      const { employees, holidays } = res.data;
       const doc = <StundenzettelPDFDocument employees={employees} month={h.month} year={h.year} holidays={holidays} />;
       const blob = await pdf(doc).toBlob();
       saveAs(blob, h.filename || `Stundenzettel_${h.year}_${h.month}.pdf`);
@@ -356,9 +352,14 @@ export default function EmployeeTable() {
 
   const openAdd = () => {
     setFile(null);
+    modalOpen.current = true;
     setModal(true);
   };
-  const closeModal = () => setModal(false);
+  const closeModal = () => {
+    modalOpen.current = false;
+    setModal(false);
+  };
+  useEffect(() => () => { modalOpen.current = false; }, []);
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
       setFile(e.target.files[0]);
@@ -375,10 +376,24 @@ export default function EmployeeTable() {
       try {
         const formData = new FormData();
         formData.append('file', file);
-        const res = await axios.post(`${API_BASE_URL}/employees/add`, formData, {
+        let job = (await axios.post(`${API_BASE_URL}/employees/add`, formData, {
           headers: { 'Content-Type': 'multipart/form-data' },
-        });
-        const emp = res.data.employee;
+        })).data;
+        // The scan runs in the background; poll until it is done
+        const deadline = Date.now() + SCAN_POLL_DEADLINE_MS;
+        while (job.status !== 'done' && job.status !== 'failed') {
+          await new Promise(resolve => setTimeout(resolve, SCAN_POLL_INTERVAL_MS));
+          if (!modalOpen.current) {
+            setLoading(false);
+            return;
+          }
+          if (Date.now() > deadline) {
+            throw { response: { data: { detail: 'Scan is taking too long, please try again later' } } };
+          }
+          job = (await axios.get(`${API_BASE_URL}/employees/add/jobs/${job.job_id}`)).data;
+        }
+        if (job.status === 'failed') throw { response: { data: { detail: job.error } } };
+        const emp = job.result.employee;
       setEmployees(emps => [...emps, emp]);
         setToast({ message: 'Employee added from scan!', type: 'success' });
         closeModal();
@@ -510,8 +525,7 @@ export default function EmployeeTable() {
           year: currentYear,
         }
       );
-      const { employees } = res.data;
-      const holidays = await axios.get(`${API_BASE_URL}/holidays/${currentYear}?state=sn`).then(r => r.data);
+      const { employees, holidays } = res.data;
       const doc = <StundenzettelPDFDocument employees={employees} month={selectedMonth} year={currentYear} holidays={holidays} />;
       const blob = await pdf(doc).toBlob();
       saveAs(blob, `Stundenzettel_${currentYear}_${selectedMonth}.pdf`);
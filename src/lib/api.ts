@@ -12,6 +12,34 @@ axios.interceptors.request.use(config => {
   return config;
 });
 
+let refreshing: Promise<string> | null = null;
+
+// Access tokens are short-lived: on a 401, renew once with the refresh token and retry
+axios.interceptors.response.use(undefined, async error => {
+  const config = error.config;
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (error.response?.status !== 401 || !refreshToken || !config || config._retried
+      || config.url?.endsWith('/login') || config.url?.endsWith('/refresh')) {
+    return Promise.reject(error);
+  }
+  config._retried = true;
+  refreshing = refreshing || axios.post(`${API_BASE_URL}/refresh`, { refresh_token: refreshToken })
+    .then(res => {
+      localStorage.setItem('token', res.data.access_token);
+      localStorage.setItem('refresh_token', res.data.refresh_token);
+      localStorage.setItem('role', res.data.role);
+      localStorage.setItem('username', res.data.username);
+      return res.data.access_token;
+    })
+    .finally(() => { refreshing = null; });
+  try {
+    await refreshing;
+  } catch {
+    return Promise.reject(error);
+  }
+  return axios(config);
+});
+
 export async function login({ username, password }) {
   const params = new URLSearchParams();
   params.append('username', username);